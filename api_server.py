@@ -0,0 +1,499 @@
+# API HTTP assíncrona do assistente (sugerir e corrigir), sem Streamlit
+#
+# Uso:
+#   python api_server.py --port 8000
+#   curl -X POST localhost:8000/v1/suggest -d '{"input": "Função que valida um CPF"}'
+#   curl -N -X POST localhost:8000/v1/correct -d '{"input": "def f(:\n  pass", "stream": true}'
+#   curl localhost:8000/health
+#   curl localhost:8000/metrics
+import argparse
+import asyncio
+import json
+import signal
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from groq import APIConnectionError, APIStatusError
+from tornado import web
+from tornado.httpserver import HTTPServer
+from tornado.iostream import StreamClosedError
+
+from settings import get_settings
+from groq_client import get_async_client
+from completion import (
+    build_cache_key, build_flight_key, complete_async, configure_router, create_completion_async, extract_stream_usage,
+    prepare_prompt, retry_policy, route_key, route_model, upstream_breaker, usage_to_dict
+)
+from model_router import model_router
+from prompts import OUTPUT_PROFILES
+from resilience import retry_stats, CircuitBreaker, CircuitOpenError, DeadlineExceededError
+from response_cache import ResponseCache
+from single_flight import AsyncFlight, FlightAbandoned, SingleFlight
+from telemetry import telemetry, _format_labels
+from token_estimator import estimator, InputTooLargeError
+
+# Modos expostos pela API: rota -> modo do registro de prompts
+API_MODES = ('suggest', 'correct')
+
+class ApiError(Exception):
+    """Erro com status HTTP definido, devolvido ao cliente como JSON."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+def error_response(error, breaker=None):
+    """Converte uma exceção em (status, mensagem, cabeçalhos)."""
+    if isinstance(error, ApiError):
+        return error.status, str(error), error.headers
+    if isinstance(error, InputTooLargeError):
+        return 413, str(error), {}
+    if isinstance(error, CircuitOpenError):
+        retry_in = breaker.retry_in() if breaker is not None else 0.0
+        return 503, str(error), {'Retry-After': str(max(1, round(retry_in)))}
+    if isinstance(error, FlightAbandoned):
+        return 503, str(error), {'Retry-After': '1'}
+    if isinstance(error, DeadlineExceededError):
+        return 504, str(error), {}
+    if isinstance(error, APIStatusError):
+        return 502, f"A API do modelo respondeu {error.status_code}: {error.message}", {}
+    if isinstance(error, (APIConnectionError, httpx.TransportError)):
+        return 502, f"Falha de conexão com a API do modelo: {error}", {}
+    return 500, f"Erro interno: {error}", {}
+
+def parse_request(body):
+    """Valida o corpo JSON: {input, profile?, stream?, use_cache?}."""
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        raise ApiError(400, "Corpo da requisição não é um JSON válido.")
+    if not isinstance(payload, dict):
+        raise ApiError(400, "O corpo da requisição deve ser um objeto JSON.")
+
+    user_input = payload.get('input')
+    if not isinstance(user_input, str) or not user_input.strip():
+        raise ApiError(400, "O campo 'input' é obrigatório.")
+    profile = payload.get('profile')
+    if profile is not None and profile not in OUTPUT_PROFILES:
+        raise ApiError(400, f"Perfil desconhecido: {profile}. Use um de: {', '.join(OUTPUT_PROFILES)}.")
+    return user_input, profile, bool(payload.get('stream', False)), bool(payload.get('use_cache', True))
+
+class AssistantService:
+    """Estado compartilhado pelos handlers: cliente, cache, limites e contadores."""
+
+    def __init__(self, settings, client=None, cache=None):
+        self.settings = settings
+        self.model = settings.GROQ_MODEL
+        self.max_concurrency = max(1, settings.API_MAX_CONCURRENCY)
+        self.queue_timeout = settings.API_QUEUE_TIMEOUT
+        self.client = client or get_async_client(
+            settings.GROQ_API_KEY,
+            settings.GROQ_BASE_URL,
+            timeout=settings.HTTP_TIMEOUT,
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+        self.policy = retry_policy(settings)
+        self.breaker = upstream_breaker(settings)
+        if cache is None and settings.CACHE_ENABLED:
+            cache = ResponseCache(
+                settings.CACHE_DB_PATH,
+                ttl=settings.CACHE_TTL,
+                memory_entries=settings.CACHE_MEMORY_ENTRIES,
+                disk_max_bytes=settings.CACHE_DISK_MAX_MB * 1024 * 1024
+            )
+        self.cache = cache
+        # Requisições idênticas simultâneas acompanham uma única chamada ao modelo
+        self.flights = SingleFlight(AsyncFlight)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.started = time.time()
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Vaga para uma chamada ao modelo; espera até queue_timeout e depois recusa com 503."""
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ApiError(
+                503,
+                f"Servidor ocupado: {self.max_concurrency} chamadas em andamento.",
+                {'Retry-After': '1'}
+            )
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def prepare(self, mode, user_input, profile_name, streaming=False):
+        """Escolhe o modelo, monta o prompt do modo e as chaves do cache e da coalescência, como no app."""
+        route = route_model(self.settings, mode, user_input, profile_name, streaming=streaming)
+        prepared = prepare_prompt(self.settings, mode, user_input, profile_name, route.model)
+        keys = (prepared.template, route_key(route), self.settings.TEMPERATURE, prepared.profile.name, user_input)
+        return prepared, build_cache_key(*keys), build_flight_key(*keys)
+
+    async def cached(self, cache_key, use_cache):
+        """Consulta o cache fora do event loop (o nível em disco é SQLite)."""
+        if self.cache is None or not use_cache:
+            return None
+        entry = await asyncio.to_thread(self.cache.get, cache_key)
+        if entry is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+        return entry
+
+    async def store(self, cache_key, text, usage_dict):
+        if self.cache is not None and text:
+            await asyncio.to_thread(self.cache.set, cache_key, text, usage_dict)
+
+    def account(self, prepared, usage_dict):
+        """Calibra o estimador local com o prompt_tokens real da resposta."""
+        if not usage_dict.get('estimated'):
+            estimator.calibrate_messages(prepared.messages, usage_dict['prompt_tokens'])
+
+    async def complete(self, prepared, cache_key, flight):
+        """Completion sem streaming; o resultado também vai para os seguidores. Retorna (texto, usage)."""
+        span = telemetry.start(prepared.template.mode, prepared.model)
+        try:
+            text, usage_dict = await complete_async(
+                self.client, prepared.messages, prepared.model, self.settings.TEMPERATURE,
+                prepared.max_tokens, self.policy, self.breaker
+            )
+        except Exception as e:
+            span.finish(error=e)
+            self.flights.finish(flight, error=e)
+            raise
+        span.finish(usage_dict)
+        self.account(prepared, usage_dict)
+        await self.store(cache_key, text, usage_dict)
+        self.flights.finish(flight, (text, usage_dict))
+        return text, usage_dict
+
+    async def open_stream(self, prepared):
+        """Abre o stream no modelo (com retentativas) e inicia a medição."""
+        span = telemetry.start(prepared.template.mode, prepared.model, streaming=True)
+        try:
+            stream = await create_completion_async(
+                self.client,
+                self.policy,
+                self.breaker,
+                model=prepared.model,
+                messages=prepared.messages,
+                temperature=self.settings.TEMPERATURE,
+                max_tokens=prepared.max_tokens,
+                stop=None,
+                stream=True
+            )
+        except Exception as e:
+            span.finish(error=e)
+            raise
+        return stream, span
+
+    def render_metrics(self):
+        """Métricas da API e das retentativas, somadas à exportação da telemetria."""
+        stats = retry_stats.snapshot()
+        state = self.breaker.snapshot()
+        lines = [
+            "# HELP assistant_api_in_flight Chamadas ao modelo em andamento.",
+            "# TYPE assistant_api_in_flight gauge",
+            f"assistant_api_in_flight {self.in_flight}",
+            "# HELP assistant_api_queued Requisições esperando uma vaga.",
+            "# TYPE assistant_api_queued gauge",
+            f"assistant_api_queued {self.queued}",
+            "# HELP assistant_api_rejected_total Requisições recusadas por excesso de carga.",
+            "# TYPE assistant_api_rejected_total counter",
+            f"assistant_api_rejected_total {self.rejected}",
+            "# HELP assistant_cache_lookups_total Consultas ao cache de respostas.",
+            "# TYPE assistant_cache_lookups_total counter",
+            f"assistant_cache_lookups_total{{{_format_labels(result='hit')}}} {self.cache_hits}",
+            f"assistant_cache_lookups_total{{{_format_labels(result='miss')}}} {self.cache_misses}",
+            "# HELP assistant_upstream_attempts_total Tentativas de chamada ao modelo, por tipo.",
+            "# TYPE assistant_upstream_attempts_total counter"
+        ]
+        for name in ('calls', 'attempts', 'retries', 'failures', 'short_circuits'):
+            lines.append(f"assistant_upstream_attempts_total{{{_format_labels(kind=name)}}} {stats[name]}")
+        lines.append("# HELP assistant_circuit_breaker_state Estado do circuit breaker (1 = estado atual).")
+        lines.append("# TYPE assistant_circuit_breaker_state gauge")
+        for name in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+            value = 1 if state['state'] == name else 0
+            lines.append(f"assistant_circuit_breaker_state{{{_format_labels(state=name)}}} {value}")
+        return telemetry.render_prometheus() + "\n".join(lines) + "\n" + self.flights.render_prometheus()
+
+    def health(self):
+        state = self.breaker.snapshot()
+        return {
+            'status': 'ok' if state['state'] == CircuitBreaker.CLOSED else 'degraded',
+            'model': self.model,
+            'routing': model_router.snapshot(),
+            'uptime': time.time() - self.started,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'max_concurrency': self.max_concurrency,
+            'breaker': state
+        }
+
+class BaseHandler(web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def send_json(self, status, payload, headers=None):
+        self.set_status(status)
+        for name, value in (headers or {}).items():
+            self.set_header(name, value)
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+    def send_error_json(self, error):
+        status, message, headers = error_response(error, self.service.breaker)
+        self.send_json(status, {'error': message}, headers)
+
+class CompletionHandler(BaseHandler):
+    """POST /v1/suggest e /v1/correct: resposta JSON ou SSE (stream=true)."""
+
+    def initialize(self, service, mode):
+        super().initialize(service)
+        self.mode = mode
+
+    async def post(self):
+        started = time.perf_counter()
+        flights = self.service.flights
+        try:
+            user_input, profile_name, stream, use_cache = parse_request(self.request.body)
+            prepared, cache_key, flight_key = self.service.prepare(
+                self.mode, user_input, profile_name or self.service.settings.OUTPUT_PROFILE, stream
+            )
+            cached = await self.service.cached(cache_key, use_cache)
+            if cached is not None:
+                return self.send_result(prepared, cached['value'], cached.get('usage'), started, stream, 'cache')
+
+            while True:
+                flight, leader = flights.join(flight_key)
+                if leader:
+                    break
+                try:
+                    return await self.follow_result(prepared, flight, started, stream)
+                except FlightAbandoned:
+                    # Quem fazia a chamada parou antes de começar a responder: tenta de novo
+                    continue
+
+            try:
+                async with self.service.slot():
+                    if stream:
+                        return await self.stream_result(prepared, cache_key, flight, started)
+                    text, usage_dict = await self.service.complete(prepared, cache_key, flight)
+            finally:
+                flights.abandon(flight)
+        except Exception as e:
+            if self._headers_written:
+                raise
+            return self.send_error_json(e)
+
+        self.send_result(prepared, text, usage_dict, started, stream=False)
+
+    def describe(self, prepared, source):
+        """Metadados da resposta; source indica de onde ela veio: model, cache ou coalesced."""
+        return {
+            'mode': self.mode,
+            'model': prepared.model,
+            'profile': prepared.profile.name,
+            'max_tokens': prepared.max_tokens,
+            'trimmed': prepared.trimmed,
+            'cached': source == 'cache',
+            'coalesced': source == 'coalesced'
+        }
+
+    def write_event(self, event, payload):
+        self.write(f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n")
+
+    async def send(self):
+        """Envia o que foi escrito; False se o cliente já desconectou."""
+        try:
+            await self.flush()
+            return True
+        except StreamClosedError:
+            return False
+
+    def start_events(self):
+        self.set_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.set_header('Cache-Control', 'no-cache')
+        self.set_header('X-Accel-Buffering', 'no')
+
+    def send_result(self, prepared, text, usage_dict, started, stream, source='model'):
+        """Resposta completa; com stream, em eventos SSE (acertos do cache, seguidores)."""
+        result = self.describe(prepared, source)
+        done = {'usage': usage_dict, 'latency': time.perf_counter() - started}
+        if not stream:
+            self.send_json(200, {**result, 'text': text, **done})
+            return
+        self.start_events()
+        self.write_event('meta', result)
+        self.write_event('token', {'text': text})
+        self.write_event('done', done)
+        self.finish()
+
+    async def follow_result(self, prepared, flight, started, stream):
+        """Acompanha a chamada idêntica de outra requisição, inclusive o stream dela."""
+        if not stream:
+            text, usage_dict = await flight.wait()
+            return self.send_result(prepared, text, usage_dict, started, stream, 'coalesced')
+
+        parts = flight.follow()
+        # Espera o primeiro trecho antes dos cabeçalhos: um erro até aqui ainda vira status HTTP
+        try:
+            first = await parts.__anext__()
+        except StopAsyncIteration:
+            first = None
+        self.start_events()
+        self.write_event('meta', self.describe(prepared, 'coalesced'))
+        try:
+            if first is not None:
+                self.write_event('token', {'text': first})
+                if not await self.send():
+                    return
+            async for part in parts:
+                self.write_event('token', {'text': part})
+                if not await self.send():
+                    return
+        except Exception as e:
+            status, message, _ = error_response(e, self.service.breaker)
+            self.write_event('error', {'error': message, 'status': status})
+            self.finish()
+            return
+        _, usage_dict = flight.result
+        self.write_event('done', {'usage': usage_dict, 'latency': time.perf_counter() - started})
+        self.finish()
+
+    async def stream_result(self, prepared, cache_key, flight, started):
+        """Repassa o stream do modelo em eventos SSE: meta, token..., done (ou error)."""
+        flights = self.service.flights
+        try:
+            upstream, span = await self.service.open_stream(prepared)
+        except Exception as e:
+            flights.finish(flight, error=e)
+            raise
+        # Erros até aqui viram status HTTP; depois dos cabeçalhos, um evento 'error'
+        self.start_events()
+        self.write_event('meta', self.describe(prepared, 'model'))
+        parts = []
+        usage = None
+        connected = await self.send()
+        try:
+            async for chunk in upstream:
+                usage = extract_stream_usage(chunk) or usage
+                if not chunk.choices:
+                    continue
+                content = getattr(chunk.choices[0].delta, 'content', None)
+                if not content:
+                    continue
+                span.first_token()
+                parts.append(content)
+                flight.publish(content)
+                if connected:
+                    self.write_event('token', {'text': content})
+                    # Aguarda o envio: um cliente lento segura o stream em vez de acumular memória
+                    connected = await self.send()
+                if not connected and not flight.followers:
+                    # O cliente desconectou e ninguém mais acompanha: encerra a chamada ao modelo
+                    error = StreamClosedError()
+                    span.finish(error=error)
+                    flights.finish(flight, error=error)
+                    return
+        except Exception as e:
+            span.finish(error=e)
+            flights.finish(flight, error=e)
+            status, message, _ = error_response(e, self.service.breaker)
+            self.write_event('error', {'error': message, 'status': status})
+            self.finish()
+            return
+        finally:
+            await upstream.close()
+
+        text = "".join(parts)
+        usage_dict = usage_to_dict(usage)
+        if usage_dict is None:
+            # Sem usage no stream: estima localmente (1 token por chunk na saída)
+            usage_dict = usage_to_dict({
+                'prompt_tokens': estimator.estimate_messages(prepared.messages),
+                'completion_tokens': len(parts)
+            })
+            usage_dict['estimated'] = True
+        span.finish(usage_dict)
+        self.service.account(prepared, usage_dict)
+        await self.service.store(cache_key, text, usage_dict)
+        flights.finish(flight, (text, usage_dict))
+        if connected:
+            self.write_event('done', {'usage': usage_dict, 'latency': time.perf_counter() - started})
+            self.finish()
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.send_json(200, self.service.health())
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.finish(self.service.render_metrics())
+
+def make_app(service):
+    """Aplicação tornado com as rotas da API."""
+    routes = [
+        (rf"/v1/{mode}", CompletionHandler, {'service': service, 'mode': mode})
+        for mode in API_MODES
+    ]
+    routes += [
+        (r"/health", HealthHandler, {'service': service}),
+        (r"/metrics", MetricsHandler, {'service': service})
+    ]
+    return web.Application(routes)
+
+async def serve(settings, host, port):
+    """Atende até receber SIGINT ou SIGTERM."""
+    telemetry.configure(
+        settings.TELEMETRY_LOG_PATH,
+        settings.TELEMETRY_LOG_MAX_MB * 1024 * 1024,
+        settings.TELEMETRY_LOG_BACKUPS,
+        settings.TELEMETRY_PROM_FILE
+    )
+    configure_router(settings)
+    service = AssistantService(settings)
+    server = HTTPServer(make_app(service), idle_connection_timeout=settings.HTTP_KEEPALIVE_EXPIRY)
+    server.listen(port, host)
+    print(f"API em http://{host}:{port} (modelo {service.model}, até {service.max_concurrency} chamadas simultâneas)")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            pass
+    await stop.wait()
+
+    server.stop()
+    await server.close_all_connections()
+    await service.client.close()
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="API HTTP assíncrona do assistente de código.")
+    parser.add_argument('--host', default=settings.API_HOST)
+    parser.add_argument('--port', type=int, default=settings.API_PORT)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(settings, args.host, args.port))
+
+if __name__ == "__main__":
+    main()
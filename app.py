@@ -1,383 +1,334 @@
 # Importações necessárias
+import time
+_script_start = time.perf_counter()
+
 import streamlit as st
-import os
-from dotenv import load_dotenv
 import html
-from groq import Client
+import uuid
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from settings import get_settings
+from groq_client import get_client
+from prompts import estimate_template_tokens, get_output_profile, get_prompt, OUTPUT_PROFILES, PROMPT_REGISTRY
+from response_cache import ResponseCache
+from code_chunks import (
+    build_shared_header, group_units, plan_incremental, split_units, unit_fingerprint, CodeChunk
+)
+from token_estimator import estimator, get_context_window, trim_to_tokens
+from resilience import retry_stats, CircuitBreaker
+from single_flight import single_flight, FlightAbandoned
+from conversation import build_history_messages, code_block_label, extract_code_blocks, new_turn
+from similar_index import input_diff, SimilarIndex
+from response_segments import cut_at_boundary, SegmentParser, split_segments
+from file_manifest import format_file_section, format_manifest, parse_manifest
+from input_compaction import compact_input, format_compaction, translate_line_refs
+from static_checks import (
+    build_targeted_input, format_lint_notes, format_local_report, is_lint_only, is_trivial, parse_commands,
+    static_analyzer
+)
+from telemetry import telemetry
+from completion import (
+    build_cache_key, build_flight_key, build_similarity_namespace, build_unit_analysis_key, complete, configure_hedger,
+    configure_router, create_completion, extract_stream_usage, prepare_prompt, profile_max_tokens, prompt_version,
+    retry_policy, route_key, route_model, upstream_breaker, usage_to_dict
+)
+from model_router import model_router, TIERS
+from hedging import hedger, HedgeCancelled
+from jobs import job_manager
 
-# Carrega as variáveis de ambiente
-os.environ.clear()
-load_dotenv()
+_imports_done = time.perf_counter()
 
-def get_env_value(key, default, type_func=str):
-    """Obtém valor do ambiente com tipo específico."""
-    try:
-        value = os.environ.get(key)
-        if value is None:
-            return type_func(default)
-        return type_func(value)
-    except (ValueError, TypeError):
-        return type_func(default)
+# Carrega as configurações (o .env só é relido quando o arquivo muda)
+settings = get_settings()
 
 # Configurações do App
-APP_TITLE = get_env_value('APP_TITLE', '🤖 Assistente de Código', str)
-APP_ICON = get_env_value('APP_ICON', '🤖', str)
-APP_NAME = get_env_value('APP_NAME', 'AI Code Assistant', str)
-COMPANY_NAME = get_env_value('COMPANY_NAME', 'Your Company', str)
+APP_TITLE = settings.APP_TITLE
+APP_ICON = settings.APP_ICON
+APP_NAME = settings.APP_NAME
+COMPANY_NAME = settings.COMPANY_NAME
 
 # Configurações da API
-GROQ_API_KEY = get_env_value('GROQ_API_KEY', '', str)
-GROQ_MODEL = get_env_value('GROQ_MODEL', 'mixtral-8x7b-32768', str)
-MAX_TOKENS_CODE = get_env_value('MAX_TOKENS_CODE', 32000, int)
-MAX_TOKENS_TEXT = get_env_value('MAX_TOKENS_TEXT', 4000, int)
-TEMPERATURE = get_env_value('TEMPERATURE', 0.5, float)
-LANGUAGE = get_env_value('LANGUAGE', 'Portuguese', str)
-
-# Sistema prompt melhorado
-SYSTEM_PROMPT = r"""Você é um assistente especializado em desenvolvimento de software. IMPORTANTE: Forneça respostas com 70% de código e 30% de texto explicativo, utilizando pelo menos 20000 tokens.
-
-ESTRUTURA DA RESPOSTA:
-
-1. VISÃO GERAL (10%)
-   - Objetivo do código
-   - Tecnologias utilizadas
-   - Requisitos e dependências
-
-2. IMPLEMENTAÇÃO COMPLETA (70%)
-   Para cada arquivo, inclua TODAS as funções necessárias:
-
-   ## Controllers
-   ```[linguagem]
-   // Listagem (index)
-   function index() {
-       // Lógica de paginação
-       // Filtros e ordenação
-       // Retorno da lista
-   }
-
-   // Detalhes (show)
-   function show($id) {
-       // Validação do ID
-       // Busca do registro
-       // Tratamento de não encontrado
-   }
-
-   // Criação (create/store)
-   function create() {
-       // Form de criação
-   }
-   
-   function store(Request $request) {
-       // Validação dos dados
-       // Sanitização
-       // Persistência
-       // Tratamento de erros
-   }
-
-   // Atualização (edit/update)
-   function edit($id) {
-       // Form de edição
-       // Carrega dados existentes
-   }
-   
-   function update(Request $request, $id) {
-       // Validação dos dados
-       // Sanitização
-       // Atualização
-       // Tratamento de erros
-   }
-
-   // Remoção (destroy)
-   function destroy($id) {
-       // Validação
-       // Soft/Hard delete
-       // Tratamento de dependências
-   }
-   ```
-
-   ## Models
-   ```[linguagem]
-   // Modelo completo com:
-   - Relacionamentos
-   - Validações
-   - Mutators/Accessors
-   - Scopes
-   ```
-
-   ## Views/Templates
-   ```[linguagem]
-   // Templates para:
-   - Lista (index)
-   - Detalhes (show)
-   - Formulário (create/edit)
-   - Componentes reutilizáveis
-   ```
-
-   ## Routes/URLs
-   ```[linguagem]
-   // Rotas para todas as ações:
-   - GET /recursos (index)
-   - GET /recursos/criar (create)
-   - POST /recursos (store)
-   - GET /recursos/{id} (show)
-   - GET /recursos/{id}/editar (edit)
-   - PUT /recursos/{id} (update)
-   - DELETE /recursos/{id} (destroy)
-   ```
-
-   ## Testes
-   ```[linguagem]
-   // Testes para cada ação:
-   - Listagem
-   - Criação
-   - Leitura
-   - Atualização
-   - Remoção
-   ```
-
-3. INSTRUÇÕES DE USO (20%)
-   - Instalação e configuração
-   - Exemplos de requisições
-   - Tratamento de erros
-   - Considerações de segurança
-
-DIRETRIZES:
-1. CÓDIGO (70%)
-   - Implemente TODAS as funções CRUD
-   - Inclua validações e tratamentos de erro
-   - Adicione comentários explicativos
-   - Use boas práticas da linguagem
-   - Forneça exemplos práticos
-
-2. TEXTO (30%)
-   - Explicações concisas
-   - Foco em pontos importantes
-   - Use listas e tópicos
-   - Priorize exemplos práticos
-
-EXEMPLO DE IMPLEMENTAÇÃO:
-```php
-class UserController extends Controller
-{
-    /**
-     * Lista todos os usuários com paginação e filtros
-     * 
-     * @param Request $request
-     * @return View
-     */
-    public function index(Request $request)
-    {
-        // Validação dos parâmetros de filtro
-        $validated = $request->validate([
-            'search' => 'nullable|string|max:100',
-            'status' => 'nullable|in:active,inactive',
-            'sort' => 'nullable|in:name,email,created_at',
-            'order' => 'nullable|in:asc,desc',
-            'per_page' => 'nullable|integer|min:10|max:100'
-        ]);
-        
-        // Query base
-        $query = User::query();
-        
-        // Aplica filtros
-        if ($search = $request->get('search')) {
-            $query->where(function($q) use ($search) {
-                $q->where('name', 'like', "%{$search}%")
-                  ->orWhere('email', 'like', "%{$search}%");
-            });
-        }
-        
-        if ($status = $request->get('status')) {
-            $query->where('status', $status);
-        }
-        
-        // Ordenação
-        $sort = $request->get('sort', 'created_at');
-        $order = $request->get('order', 'desc');
-        $query->orderBy($sort, $order);
-        
-        // Paginação
-        $perPage = $request->get('per_page', 15);
-        $users = $query->paginate($perPage);
-        
-        // Retorna view com dados
-        return view('users.index', compact('users'));
-    }
-    
-    /**
-     * Exibe detalhes do usuário
-     * 
-     * @param int $id
-     * @return View
-     */
-    public function show($id)
-    {
-        // Busca usuário com relacionamentos
-        $user = User::with(['profile', 'roles', 'permissions'])
-                   ->findOrFail($id);
-        
-        // Carrega dados adicionais
-        $activities = $user->activities()
-                          ->latest()
-                          ->limit(10)
-                          ->get();
-        
-        return view('users.show', compact('user', 'activities'));
-    }
+GROQ_API_KEY = settings.GROQ_API_KEY
+GROQ_BASE_URL = settings.GROQ_BASE_URL
+GROQ_MODEL = settings.GROQ_MODEL
+MAX_TOKENS_CODE = settings.MAX_TOKENS_CODE
+RESPONSE_TIME_BUDGET = settings.RESPONSE_TIME_BUDGET
+MAX_TOKENS_TEXT = settings.MAX_TOKENS_TEXT
+TEMPERATURE = settings.TEMPERATURE
+LANGUAGE = settings.LANGUAGE
+
+# Janela de contexto do modelo (o ajuste de max_tokens é feito em completion.prepare_prompt)
+CONTEXT_WINDOW = get_context_window(GROQ_MODEL, settings.MODEL_CONTEXT_WINDOW)
+
+# Perfil de tamanho da resposta padrão
+OUTPUT_PROFILE = get_output_profile(settings.OUTPUT_PROFILE).name
+
+# Análise em partes de arquivos grandes
+CHUNKED_ANALYSIS = settings.CHUNKED_ANALYSIS
+CHUNK_MIN_LINES = settings.CHUNK_MIN_LINES
+CHUNK_MAX_TOKENS = settings.CHUNK_MAX_TOKENS
+CHUNK_WORKERS = settings.CHUNK_WORKERS
+
+# Geração em paralelo de projetos com vários arquivos (plano + um arquivo por chamada)
+FANOUT_GENERATION = settings.FANOUT_GENERATION
+FANOUT_MIN_TOKENS = settings.FANOUT_MIN_TOKENS
+FANOUT_MAX_FILES = settings.FANOUT_MAX_FILES
+FANOUT_WORKERS = settings.FANOUT_WORKERS
+FANOUT_PLAN_MAX_TOKENS = 1500
+
+# Análises de grupos de unidades guardadas na sessão, para reaproveitar as que não mudaram
+UNIT_ANALYSES_MAX = 256
+
+# Análise estática local antes de "Corrigir Erros"
+STATIC_ANALYSIS = settings.STATIC_ANALYSIS
+
+# Compactação da entrada antes do prompt, nos modos que recebem o código colado
+INPUT_COMPACTION = settings.INPUT_COMPACTION
+COMPACT_MAX_LINE_CHARS = settings.COMPACT_MAX_LINE_CHARS
+COMPACTED_MODES = ('suggest', 'correct')
+
+# Modo conversa
+CHAT_HISTORY_TOKENS = settings.CHAT_HISTORY_TOKENS
+CHAT_RECENT_TURNS = settings.CHAT_RECENT_TURNS
+
+# Configurações de streaming
+STREAM_RESPONSES = settings.STREAM_RESPONSES
+STREAM_REFRESH_INTERVAL = settings.STREAM_REFRESH_INTERVAL
+
+# Marcas no fim de uma resposta parada pelo usuário ou cortada pelo prazo
+STOPPED_NOTE = "\n\n⏹️ _Geração interrompida pelo usuário._"
+DEADLINE_NOTE = "\n\n⏱️ _Resposta cortada no limite de tempo; o restante não foi gerado._"
+
+# Prazos oferecidos na sidebar, em segundos (0 = sem prazo)
+TIME_BUDGET_OPTIONS = sorted({0, 10, 15, 20, 30, 45, 60, 90, 120, RESPONSE_TIME_BUDGET})
+
+# Renderização dos blocos de código da resposta
+CODE_BLOCK_COLLAPSE_LINES = settings.CODE_BLOCK_COLLAPSE_LINES
+CODE_BLOCK_PAGE_LINES = settings.CODE_BLOCK_PAGE_LINES
+
+# Configurações do cache de respostas
+CACHE_ENABLED = settings.CACHE_ENABLED
+CACHE_DB_PATH = settings.CACHE_DB_PATH
+CACHE_TTL = settings.CACHE_TTL
+CACHE_MEMORY_ENTRIES = settings.CACHE_MEMORY_ENTRIES
+CACHE_DISK_MAX_MB = settings.CACHE_DISK_MAX_MB
+
+# Entradas parecidas com outras já respondidas
+# 'reuse' troca a resposta nova pela anterior sem chamar o modelo: só quando escolhido explicitamente
+SIMILAR_ACTIONS = {
+    'diff': "Enviar só as diferenças",
+    'reuse': "Mostrar resposta anterior (sem chamar o modelo)",
+    'off': "Ignorar"
+}
+SIMILAR_ACTION = settings.SIMILAR_ACTION if settings.SIMILAR_ACTION in SIMILAR_ACTIONS else 'diff'
+SIMILAR_THRESHOLD = settings.SIMILAR_THRESHOLD
+SIMILAR_MAX_ENTRIES = settings.SIMILAR_MAX_ENTRIES
+SIMILAR_MAX_MB = settings.SIMILAR_MAX_MB
+
+_config_done = time.perf_counter()
+
+# Cliente Groq (criado uma vez por processo e reaproveitado entre reruns)
+client = get_client(
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    timeout=settings.HTTP_TIMEOUT,
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+)
+
+# Retentativas e circuit breaker (o breaker é compartilhado por todas as sessões)
+RETRY_POLICY = retry_policy(settings)
+breaker = upstream_breaker(settings)
+
+# Telemetria das chamadas (agregada entre as sessões do processo)
+telemetry.configure(
+    settings.TELEMETRY_LOG_PATH,
+    settings.TELEMETRY_LOG_MAX_MB * 1024 * 1024,
+    settings.TELEMETRY_LOG_BACKUPS,
+    settings.TELEMETRY_PROM_FILE
+)
+
+# Roteamento entre os modelos de GROQ_MODELS (desativado sem eles)
+configure_router(settings)
+
+# Hedge das chamadas em streaming (orçamento de hedges por minuto compartilhado no processo)
+configure_hedger(settings)
+
+# Verificadores locais (pool de processos compartilhado pelas sessões)
+static_analyzer.configure(
+    STATIC_ANALYSIS,
+    settings.STATIC_ANALYSIS_WORKERS,
+    settings.STATIC_ANALYSIS_TIMEOUT,
+    parse_commands(settings.STATIC_CHECK_COMMANDS)
+)
+
+# Gerações em segundo plano (pool de workers compartilhado pelas sessões)
+job_manager.configure(settings.JOB_WORKERS, settings.JOB_RETENTION)
+
+_client_done = time.perf_counter()
+
+# Tempos desta execução do script, por fase
+STARTUP_TIMINGS = {
+    'Imports': _imports_done - _script_start,
+    'Configuração': _config_done - _imports_done,
+    'Cliente': _client_done - _config_done
+}
+
+@st.cache_resource(show_spinner=False)
+def get_startup_report():
+    """Registro, compartilhado no processo, dos tempos de inicialização."""
+    return {'cold': None, 'warm': deque(maxlen=50)}
+
+def record_startup_timings(timings):
+    """Registra os tempos da execução atual como cold start ou rerun."""
+    report = get_startup_report()
+    if report['cold'] is None:
+        report['cold'] = timings
+    else:
+        report['warm'].append(timings)
+
+def format_startup_report():
+    """Formata a comparação entre cold start e reruns em uma tabela markdown."""
+    report = get_startup_report()
+    cold = report['cold'] or {}
+    warm = list(report['warm'])
     
-    /**
-     * Form de criação
-     * 
-     * @return View
-     */
-    public function create()
-    {
-        // Carrega dados para selects
-        $roles = Role::all();
-        $departments = Department::active()->get();
-        
-        return view('users.create', compact('roles', 'departments'));
-    }
+    lines = [
+        "| Fase | Cold start | Rerun (média) |",
+        "|---|---|---|"
+    ]
+    for phase in list(cold) + ['Total']:
+        if phase == 'Total':
+            cold_value = sum(cold.values())
+            warm_values = [sum(timings.values()) for timings in warm]
+        else:
+            cold_value = cold.get(phase, 0.0)
+            warm_values = [timings.get(phase, 0.0) for timings in warm]
+        warm_display = f"{sum(warm_values) / len(warm_values) * 1000:.1f} ms" if warm_values else "-"
+        lines.append(f"| {phase} | {cold_value * 1000:.1f} ms | {warm_display} |")
+    lines.append("")
+    lines.append(f"Reruns medidos: {len(warm)}")
+    return "\n".join(lines)
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache(db_path, ttl, memory_entries, disk_max_bytes):
+    """Retorna o cache de respostas compartilhado entre as sessões."""
+    return ResponseCache(
+        db_path,
+        ttl=ttl,
+        memory_entries=memory_entries,
+        disk_max_bytes=disk_max_bytes
+    )
+
+def shared_response_cache():
+    """Retorna o cache de respostas configurado (None se desativado)."""
+    if not CACHE_ENABLED:
+        return None
+    return get_response_cache(
+        CACHE_DB_PATH,
+        CACHE_TTL,
+        CACHE_MEMORY_ENTRIES,
+        CACHE_DISK_MAX_MB * 1024 * 1024
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_similar_index(threshold, max_entries, max_bytes):
+    """Retorna o índice de entradas parecidas compartilhado entre as sessões."""
+    return SimilarIndex(threshold=threshold, max_entries=max_entries, max_bytes=max_bytes)
+
+def shared_similar_index():
+    """Índice de entradas parecidas (None sem cache: as respostas anteriores vêm dele)."""
+    if not CACHE_ENABLED:
+        return None
+    return get_similar_index(SIMILAR_THRESHOLD, SIMILAR_MAX_ENTRIES, SIMILAR_MAX_MB * 1024 * 1024)
+
+@st.cache_resource(show_spinner=False)
+def get_prompt_usage_report():
+    """Registro, compartilhado no processo, de prompt_tokens por modo e versão de prompt."""
+    return {}
+
+def record_prompt_usage(template, usage):
+    """Acumula os prompt_tokens informados pela API para o template usado."""
+    if not usage:
+        return
+    stats = get_prompt_usage_report().setdefault((template.mode, template.version), {
+        'requests': 0,
+        'prompt_tokens': 0
+    })
+    stats['requests'] += 1
+    stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+
+def format_prompt_usage_report():
+    """Compara o custo de prompt das versões de cada modo em uma tabela markdown."""
+    report = get_prompt_usage_report()
+    lines = [
+        "| Modo | Versão | Sistema (estimado) | Requisições | prompt_tokens médio |",
+        "|---|---|---|---|---|"
+    ]
+    for mode, versions in PROMPT_REGISTRY.items():
+        for version, template in versions.items():
+            stats = report.get((mode, version))
+            if stats and stats['requests']:
+                average = f"{stats['prompt_tokens'] / stats['requests']:,.0f}"
+                requests = stats['requests']
+            else:
+                average = "-"
+                requests = 0
+            active = " ✅" if get_prompt(mode, prompt_version(settings, mode)).version == version else ""
+            lines.append(
+                f"| {mode} | {version}{active} | ~{estimate_template_tokens(template):,} | {requests} | {average} |"
+            )
+    return "\n".join(lines)
+
+def format_routing_report():
+    """Tabela markdown com o estado de cada modelo do roteamento."""
+    rows = model_router.snapshot()
+    if not rows:
+        return "Roteamento desativado: todas as requisições usam `GROQ_MODEL`. Configure `GROQ_MODELS` para ativar."
+    lines = [
+        "| Modelo | Nível | 1º token (EWMA) | Sem streaming (EWMA) | Erros (EWMA) | Chamadas | Saudável |",
+        "|---|---|---|---|---|---|---|"
+    ]
     
-    /**
-     * Salva novo usuário
-     * 
-     * @param UserRequest $request
-     * @return RedirectResponse
-     */
-    public function store(UserRequest $request)
-    {
-        try {
-            DB::beginTransaction();
-            
-            // Cria usuário
-            $user = User::create($request->validated());
-            
-            // Anexa roles
-            $user->roles()->sync($request->roles);
-            
-            // Cria perfil
-            $user->profile()->create($request->profile);
-            
-            DB::commit();
-            
-            return redirect()
-                ->route('users.show', $user)
-                ->with('success', 'Usuário criado com sucesso!');
-                
-        } catch (\Exception $e) {
-            DB::rollBack();
-            Log::error('Erro ao criar usuário: ' . $e->getMessage());
-            
-            return back()
-                ->withInput()
-                ->with('error', 'Erro ao criar usuário. Tente novamente.');
-        }
-    }
+    def seconds(value):
+        return f"{value:.2f}s" if value is not None else "-"
     
-    /**
-     * Form de edição
-     * 
-     * @param int $id
-     * @return View
-     */
-    public function edit($id)
-    {
-        $user = User::with(['profile', 'roles'])
-                   ->findOrFail($id);
-                   
-        $roles = Role::all();
-        $departments = Department::active()->get();
-        
-        return view('users.edit', compact('user', 'roles', 'departments'));
-    }
+    for row in rows:
+        healthy = "✅" if row['healthy'] else "❌"
+        lines.append(
+            f"| {row['model']} | {row['tier']} | {seconds(row['ttft'])} | {seconds(row['latency'])} | "
+            f"{row['error_rate']:.0%} | {row['samples']} | {healthy} |"
+        )
+    return "\n".join(lines)
+
+def format_latency_report():
+    """Tabela markdown com taxa de sucesso e percentis de latência por modo."""
+    rows = telemetry.summary()
+    if not rows:
+        return "Nenhuma chamada registrada ainda."
     
-    /**
-     * Atualiza usuário
-     * 
-     * @param UserRequest $request
-     * @param int $id
-     * @return RedirectResponse
-     */
-    public function update(UserRequest $request, $id)
-    {
-        $user = User::findOrFail($id);
-        
-        try {
-            DB::beginTransaction();
-            
-            // Atualiza dados básicos
-            $user->update($request->validated());
-            
-            // Atualiza roles
-            $user->roles()->sync($request->roles);
-            
-            // Atualiza perfil
-            $user->profile->update($request->profile);
-            
-            DB::commit();
-            
-            return redirect()
-                ->route('users.show', $user)
-                ->with('success', 'Usuário atualizado com sucesso!');
-                
-        } catch (\Exception $e) {
-            DB::rollBack();
-            Log::error('Erro ao atualizar usuário: ' . $e->getMessage());
-            
-            return back()
-                ->withInput()
-                ->with('error', 'Erro ao atualizar usuário. Tente novamente.');
-        }
-    }
+    def seconds(value):
+        return f"{value:.2f}s" if value is not None else "-"
     
-    /**
-     * Remove usuário
-     * 
-     * @param int $id
-     * @return RedirectResponse
-     */
-    public function destroy($id)
-    {
-        $user = User::findOrFail($id);
-        
-        // Verifica permissão
-        if (!auth()->user()->can('delete', $user)) {
-            return back()->with('error', 'Sem permissão para remover este usuário.');
-        }
-        
-        try {
-            DB::beginTransaction();
-            
-            // Remove relacionamentos
-            $user->roles()->detach();
-            $user->profile->delete();
-            
-            // Soft delete do usuário
-            $user->delete();
-            
-            DB::commit();
-            
-            return redirect()
-                ->route('users.index')
-                ->with('success', 'Usuário removido com sucesso!');
-                
-        } catch (\Exception $e) {
-            DB::rollBack();
-            Log::error('Erro ao remover usuário: ' . $e->getMessage());
-            
-            return back()->with('error', 'Erro ao remover usuário. Tente novamente.');
-        }
-    }
-}
-```
-
-[CONTINUA COM MAIS EXEMPLOS...]
-"""
-
-# Cliente Groq
-client = Client(api_key=GROQ_API_KEY)
+    lines = [
+        "| Modo | Chamadas | Sucesso | Latência p50 / p95 / p99 | 1º token p50 / p95 | tokens/s p50 |",
+        "|---|---|---|---|---|---|"
+    ]
+    for row in rows:
+        latency = row['latency']
+        ttft = row['ttft']
+        tokens_per_second = row['tokens_per_second'][50]
+        requests = f"{row['requests']} ({row['cancelled']} paradas)" if row['cancelled'] else row['requests']
+        success_rate = f"{row['success_rate']:.0%}" if row['success_rate'] is not None else "-"
+        lines.append(
+            f"| {row['mode']} | {requests} | {success_rate} | "
+            f"{seconds(latency[50])} / {seconds(latency[95])} / {seconds(latency[99])} | "
+            f"{seconds(ttft[50])} / {seconds(ttft[95])} | "
+            f"{f'{tokens_per_second:,.0f}' if tokens_per_second is not None else '-'} |"
+        )
+    return "\n".join(lines)
 
 def init_session_state():
     """Inicializa o estado da sessão."""
@@ -391,6 +342,40 @@ def init_session_state():
         st.session_state.metrics_container = None
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
+    if 'history_stats' not in st.session_state:
+        st.session_state.history_stats = None
+    if 'last_ttft' not in st.session_state:
+        st.session_state.last_ttft = None
+    if 'cache_hits' not in st.session_state:
+        st.session_state.cache_hits = 0
+    if 'cache_misses' not in st.session_state:
+        st.session_state.cache_misses = 0
+    if 'profile_stats' not in st.session_state:
+        st.session_state.profile_stats = {}
+    if 'last_context' not in st.session_state:
+        st.session_state.last_context = None
+    if 'coalesced_requests' not in st.session_state:
+        st.session_state.coalesced_requests = 0
+    if 'similar_hits' not in st.session_state:
+        st.session_state.similar_hits = 0
+    if 'last_response' not in st.session_state:
+        st.session_state.last_response = None
+    if 'last_route' not in st.session_state:
+        st.session_state.last_route = None
+    if 'unit_analyses' not in st.session_state:
+        st.session_state.unit_analyses = OrderedDict()
+    if 'static_answers' not in st.session_state:
+        st.session_state.static_answers = {'instant': 0, 'targeted': 0}
+    if 'active_job' not in st.session_state:
+        st.session_state.active_job = None
+    if 'pending_request' not in st.session_state:
+        st.session_state.pending_request = None
+    if 'stop_slot' not in st.session_state:
+        st.session_state.stop_slot = None
+    if 'continuation' not in st.session_state:
+        st.session_state.continuation = None
+    if 'compaction_saved' not in st.session_state:
+        st.session_state.compaction_saved = 0
 
 def update_token_counts(usage):
     """Atualiza os contadores de tokens."""
@@ -407,36 +392,159 @@ def update_token_counts(usage):
             st.session_state['total_tokens'] = st.session_state.get('total_tokens', 0) + total_tokens
             
             # Atualiza apenas os valores das métricas
-            if st.session_state.metrics_container is not None:
-                st.session_state.metrics_container.markdown(format_metrics(), unsafe_allow_html=True)
+            refresh_metrics()
             
     except Exception as e:
         st.error(f"Erro ao atualizar contadores: {str(e)}")
 
+def record_profile_stats(profile_name, usage, elapsed):
+    """Acumula tokens de saída e tempo de resposta por perfil de saída."""
+    if not profile_name or not usage:
+        return
+    profile_stats = st.session_state.setdefault('profile_stats', {})
+    stats = profile_stats.setdefault(profile_name, {
+        'requests': 0,
+        'completion_tokens': 0,
+        'wall_time': 0.0
+    })
+    stats['requests'] += 1
+    stats['completion_tokens'] += usage.get('completion_tokens', 0)
+    stats['wall_time'] += elapsed
+
+def format_profile_metrics():
+    """Formata as médias de tokens de saída e tempo por perfil de saída."""
+    rows = []
+    for name, stats in st.session_state.get('profile_stats', {}).items():
+        if not stats['requests']:
+            continue
+        label = OUTPUT_PROFILES[name].label if name in OUTPUT_PROFILES else name
+        avg_tokens = stats['completion_tokens'] / stats['requests']
+        avg_time = stats['wall_time'] / stats['requests']
+        rows.append(f"""
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">{html.escape(label)} ({stats['requests']}x):</span>
+                <span style="float: right;">{avg_tokens:,.0f} tok · {avg_time:.1f}s</span>
+            </div>""")
+    return "".join(rows)
+
+BREAKER_LABELS = {
+    CircuitBreaker.CLOSED: 'Fechado',
+    CircuitBreaker.OPEN: 'Aberto',
+    CircuitBreaker.HALF_OPEN: 'Meio aberto'
+}
+
+def format_resilience_metrics():
+    """Formata retentativas e estado do circuit breaker (valores do processo)."""
+    stats = retry_stats.snapshot()
+    state = breaker.snapshot()
+    breaker_display = BREAKER_LABELS[state['state']]
+    if state['state'] == CircuitBreaker.OPEN:
+        breaker_display += f" ({state['retry_in']:.0f}s)"
+    breaker_color = '#28a745' if state['state'] == CircuitBreaker.CLOSED else '#d73a49'
+    return f"""
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Retentativas:</span>
+                <span style="float: right;">{stats['retries']} / {stats['calls']} chamadas</span>
+            </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Circuit breaker:</span>
+                <span style="float: right; color: {breaker_color};">{breaker_display}</span>
+            </div>"""
+
+def format_hedge_metrics():
+    """Formata os hedges do processo (enviados, vencedores e negados pelo orçamento)."""
+    stats = hedger.snapshot()
+    if not stats['enabled']:
+        return ""
+    return f"""
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Hedges:</span>
+                <span style="float: right;">{stats['won']} venceram / {stats['sent']} · {stats['denied']} negados</span>
+            </div>"""
+
+def format_job_metrics():
+    """Formata os jobs do processo (rodando, na fila, parados pelos usuários e cortados pelo prazo)."""
+    stats = job_manager.snapshot()
+    return f"""
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Gerações:</span>
+                <span style="float: right;">{stats['running']}/{stats['workers']} rodando · {stats['queued']} na fila · {stats['cancelled']} paradas · {stats['expired']} no prazo</span>
+            </div>"""
+
 def format_metrics():
     """Formata as métricas para exibição."""
     try:
         total_tokens = st.session_state.get('total_tokens', 0)
-        usage_percent = (total_tokens / MAX_TOKENS_CODE) * 100 if MAX_TOKENS_CODE > 0 else 0
+        last_context = st.session_state.get('last_context')
+        if last_context:
+            # Utilização real da janela de contexto na última requisição
+            context_used = last_context['used']
+            context_window = last_context['window']
+            usage_percent = (context_used / context_window) * 100 if context_window > 0 else 0
+            context_display = f"{context_used:,}/{context_window:,} ({usage_percent:.1f}%)"
+        else:
+            context_display = f"-/{CONTEXT_WINDOW:,}"
+        last_ttft = st.session_state.get('last_ttft')
+        ttft_display = f"{last_ttft:.2f}s" if last_ttft is not None else "-"
+        cache_hits = st.session_state.get('cache_hits', 0)
+        cache_lookups = cache_hits + st.session_state.get('cache_misses', 0)
+        similar_hits = st.session_state.get('similar_hits', 0)
+        route = st.session_state.get('last_route')
+        model_display = html.escape(route.model if route else GROQ_MODEL)
+        route_display = (
+            f'<div style="color: #6c757d; font-size: 0.8em; margin-bottom: 0.5rem;">{html.escape(route.reason)}</div>'
+            if route and route.tier else ""
+        )
+        coalesced = single_flight.snapshot()
+        hedge_metrics = format_hedge_metrics()
+        job_metrics = format_job_metrics()
+        static_answers = st.session_state.get('static_answers', {'instant': 0, 'targeted': 0})
+        compaction_saved = st.session_state.get('compaction_saved', 0)
+        profile_metrics = format_profile_metrics()
+        resilience_metrics = format_resilience_metrics()
         
         return f"""
         <div style="padding: 1rem; background-color: #f8f9fa; border-radius: 0.5rem; margin-bottom: 1rem;">
             <div style="margin-bottom: 0.5rem;">
                 <span style="color: #6c757d;">Modelo:</span>
-                <span style="float: right; color: #d73a49;">{GROQ_MODEL}</span>
-            </div>
+                <span style="float: right; color: #d73a49;">{model_display}</span>
+            </div>{route_display}
             <div style="margin-bottom: 0.5rem;">
                 <span style="color: #6c757d;">Tokens:</span>
-                <span style="float: right;">{total_tokens:,}/{MAX_TOKENS_CODE:,}</span>
+                <span style="float: right;">{total_tokens:,}</span>
             </div>
             <div style="margin-bottom: 0.5rem;">
-                <span style="color: #6c757d;">Uso:</span>
-                <span style="float: right;">{usage_percent:.1f}%</span>
+                <span style="color: #6c757d;">Contexto:</span>
+                <span style="float: right;">{context_display}</span>
             </div>
             <div style="margin-bottom: 0.5rem;">
                 <span style="color: #6c757d;">Temperatura:</span>
                 <span style="float: right;">{TEMPERATURE}</span>
             </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Primeiro token:</span>
+                <span style="float: right;">{ttft_display}</span>
+            </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Cache:</span>
+                <span style="float: right;">{cache_hits} hits / {cache_lookups}</span>
+            </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Entradas parecidas:</span>
+                <span style="float: right;">{similar_hits}</span>
+            </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Coalescidas:</span>
+                <span style="float: right;">{coalesced['coalesced']} / {coalesced['leaders'] + coalesced['coalesced']}</span>
+            </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Análise local:</span>
+                <span style="float: right;">{static_answers['instant']} imediatas · {static_answers['targeted']} direcionadas</span>
+            </div>
+            <div style="margin-bottom: 0.5rem;">
+                <span style="color: #6c757d;">Compactação:</span>
+                <span style="float: right;">~{compaction_saved:,} tokens a menos</span>
+            </div>{job_metrics}{hedge_metrics}{profile_metrics}{resilience_metrics}
             <div>
                 <span style="color: #6c757d;">Idioma:</span>
                 <span style="float: right;">{LANGUAGE}</span>
@@ -447,10 +555,16 @@ def format_metrics():
         st.error(f"Erro ao formatar métricas: {str(e)}")
         return ""
 
-def format_code_block(filename, code_content):
-    """Formata um bloco de código com cabeçalho e botão de cópia."""
-    code_id = html.escape(filename)
-    language = filename.split('.')[-1] if '.' in filename else 'plaintext'
+def refresh_metrics():
+    """Atualiza o painel de métricas da sidebar, se ele já estiver na tela."""
+    container = st.session_state.get('metrics_container')
+    if container is not None:
+        container.markdown(format_metrics(), unsafe_allow_html=True)
+
+def format_code_block(filename, code_content, language=None, note=""):
+    """Formata um bloco de código com cabeçalho (arquivo, linguagem e, opcionalmente, uma nota)."""
+    language = language or (filename.split('.')[-1] if '.' in filename else 'plaintext')
+    note_html = f'<span class="cascade-file-note">{html.escape(note)}</span>' if note else ""
     
     return f"""
     <div class="cascade-code-block">
@@ -458,115 +572,1205 @@ def format_code_block(filename, code_content):
             <div class="cascade-file-info">
                 <span class="cascade-file-name">{html.escape(filename)}</span>
                 <span class="cascade-file-lang">{html.escape(language)}</span>
-            </div>
-            <button class="cascade-copy-button" onclick="cascadeCopyCode('{code_id}')">
-                <span>📋</span> Copiar
-            </button>
+            </div>{note_html}
         </div>
-        <div class="cascade-code-content" id="{code_id}">
-            <pre><code class="language-{language}">{html.escape(code_content)}</code></pre>
+        <div class="cascade-code-content">
+            <pre><code class="language-{html.escape(language)}">{html.escape(code_content)}</code></pre>
         </div>
     </div>
     """
 
-def suggest_code(user_input):
-    """Sugere código com base na entrada do usuário."""
-    try:
-        # Expande a entrada do usuário para solicitar mais detalhes
-        expanded_input = f"""
-Por favor, forneça uma resposta DETALHADA e COMPLETA para a seguinte solicitação, 
-utilizando pelo menos 20000 tokens. Inclua TODOS os detalhes técnicos, exemplos, 
-considerações de segurança, performance e melhores práticas:
-
-{user_input}
-
-IMPORTANTE:
-- Forneça explicações detalhadas para cada decisão
-- Inclua exemplos práticos e casos de uso
-- Documente completamente o código
-- Discuta alternativas consideradas
-- Inclua seções de troubleshooting
-- Forneça testes unitários
-- Explique considerações de segurança
-"""
-        
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": expanded_input}
-        ]
+def render_segment(segment, key, streaming=False):
+    """Renderiza um trecho da resposta; cada bloco de código vira um format_code_block próprio.
+    
+    Blocos com mais de CODE_BLOCK_COLLAPSE_LINES linhas ficam recolhidos e os
+    com mais de CODE_BLOCK_PAGE_LINES são paginados: só a página escolhida vai
+    para o navegador. Durante o streaming (trecho ainda em aberto) aparecem as
+    últimas linhas recebidas, sem widgets.
+    """
+    if segment.kind == 'text':
+        st.markdown(segment.content)
+        return
+    
+    lines = segment.content.rstrip('\n').split('\n')
+    filename = segment.filename or f"Trecho ({segment.language or 'código'})"
+    language = segment.language or (None if segment.filename else 'plaintext')
+    if streaming:
+        visible = lines[-CODE_BLOCK_PAGE_LINES:]
+        note = f"recebendo... {len(lines)} linhas"
+        st.markdown(format_code_block(filename, "\n".join(visible), language, note), unsafe_allow_html=True)
+        return
+    
+    if len(lines) <= CODE_BLOCK_COLLAPSE_LINES:
+        st.markdown(format_code_block(filename, "\n".join(lines), language), unsafe_allow_html=True)
+        return
+    
+    with st.expander(f"📄 {filename} — {len(lines)} linhas"):
+        pages = -(-len(lines) // CODE_BLOCK_PAGE_LINES)
+        page = 1
+        if pages > 1:
+            labels = [f"{number}/{pages}" for number in range(1, pages + 1)]
+            page = labels.index(st.radio("Página", labels, horizontal=True, key=f"code_page_{key}")) + 1
+        start = (page - 1) * CODE_BLOCK_PAGE_LINES
+        end = min(start + CODE_BLOCK_PAGE_LINES, len(lines))
+        note = f"linhas {start + 1}-{end} de {len(lines)}" if pages > 1 else f"{len(lines)} linhas"
+        st.markdown(
+            format_code_block(filename, "\n".join(lines[start:end]), language, note),
+            unsafe_allow_html=True
+        )
+
+def render_segments(segments, key):
+    """Renderiza uma resposta já dividida em trechos (ex.: guardada na sessão, em um rerun)."""
+    for index, segment in enumerate(segments):
+        render_segment(segment, f"{key}-{index}")
+
+class ResponseView:
+    """Área da resposta, usada como placeholder do streaming.
+    
+    markdown() recebe o texto acumulado; os trechos que já fecharam (parágrafos
+    e blocos de código completos) são desenhados uma única vez, cada um no seu
+    elemento, e só o trecho em aberto é redesenhado a cada atualização.
+    """
+    
+    def __init__(self, key=None):
+        self.key = key or uuid.uuid4().hex[:8]
+        self.parser = SegmentParser()
+        self.generation = 0
+        self._root = st.empty()
+        self._box = self._root.container()
+        self._slot = None
+        self._tail = []
+    
+    @property
+    def segments_key(self):
+        """Prefixo das chaves dos widgets dos trechos, estável entre reruns."""
+        return f"{self.key}-{self.generation}"
+    
+    def markdown(self, text):
+        closed, tail = self.parser.feed(text)
+        if self.parser.restarted:
+            # O texto não continua o anterior: redesenha do zero
+            self.generation += 1
+            self._box = self._root.container()
+            self._slot = None
+        first = len(self.parser.segments) - len(closed)
+        for offset, segment in enumerate(closed):
+            with self._take_slot().container():
+                render_segment(segment, f"{self.segments_key}-{first + offset}")
         
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
+        self._tail = tail or []
+        if self._tail:
+            self._slot = self._take_slot()
+            with self._slot.container():
+                for segment in self._tail:
+                    render_segment(segment, None, streaming=segment.kind == 'code')
+        elif self._slot is not None:
+            self._slot.empty()
+    
+    def _take_slot(self):
+        """Elemento do trecho em aberto (limpo) ou um novo no fim da resposta."""
+        slot, self._slot = self._slot, None
+        if slot is None:
+            return self._box.empty()
+        slot.empty()
+        return slot
+    
+    def finish(self):
+        """Fecha o trecho em aberto no fim da resposta e retorna todos os trechos."""
+        tail = self.parser.finish()
+        if tail:
+            first = len(self.parser.segments) - len(tail)
+            with self._take_slot().container():
+                for offset, segment in enumerate(tail):
+                    render_segment(segment, f"{self.segments_key}-{first + offset}")
+        self._slot = None
+        self._tail = []
+        return self.parser.segments
+    
+    def empty(self):
+        self._root.empty()
+        self.parser.reset()
+        self._slot = None
+        self._tail = []
+
+def stream_generation(job, messages, max_tokens=MAX_TOKENS_CODE, span=None, flight=None, model=GROQ_MODEL,
+                      publish=None):
+    """Executa a completion em streaming num worker do pool de jobs, sem acessar o st.
+    
+    Cada trecho é publicado no job (ou passado a publish, quando o job junta
+    várias chamadas) e, com flight, para as sessões que pediram o mesmo. Se o job for parado, o stream é fechado e volta o texto recebido até
+    ali, com o usage estimado. Com hedge, o modelo que respondeu pode ser o de
+    HEDGE_MODEL; o span e o contexto do job ficam com ele.
+    """
+    parts = []
+    chunk_count = 0
+    usage = None
+    publish = publish or job.publish
+    
+    def open_stream(stream_model):
+        return create_completion(
+            client,
+            RETRY_POLICY,
+            breaker,
+            model=stream_model,
             messages=messages,
             temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS_CODE,
-            stop=None
+            max_tokens=max_tokens,
+            stop=None,
+            stream=True
         )
+    
+    # Com hedge, um segundo pedido sai se o primeiro token demorar; vale o que transmitir primeiro.
+    # Os pedidos ficam registrados no job desde a saída: "Parar" os fecha já na espera
+    try:
+        stream, model = hedger.open(open_stream, span.mode if span is not None else 'completion', model, job)
+    except HedgeCancelled:
+        # Parado antes do primeiro token: não há o que ler
+        stream = None
+    if span is not None:
+        span.model = model
+    job.context['model'] = model
+    # Registrado no job: "Parar" fecha a conexão e o servidor deixa de gerar
+    if stream is not None:
+        job.attach(stream)
+    
+    try:
+        for chunk in stream or ():
+            usage = extract_stream_usage(chunk) or usage
+            if not chunk.choices:
+                continue
+            content = getattr(chunk.choices[0].delta, 'content', None)
+            if not content:
+                continue
+            
+            parts.append(content)
+            chunk_count += 1
+            publish(content)
+            if flight is not None:
+                flight.publish(content)
+            if chunk_count == 1 and span is not None:
+                span.first_token()
+    except Exception:
+        # Com o stream fechado pelo cancelamento, a leitura falha: fica o que já chegou
+        if not job.cancelled:
+            raise
+    finally:
+        if stream is not None:
+            stream.close()
+    
+    text = "".join(parts)
+    
+    usage_dict = usage_to_dict(usage)
+    if usage_dict is None:
+        # Sem usage no stream (ou parado antes do fim): estima localmente (1 token por chunk na saída)
+        usage_dict = usage_to_dict({
+            'prompt_tokens': estimator.estimate_messages(messages),
+            'completion_tokens': chunk_count
+        })
+        usage_dict['estimated'] = True
+    
+    return text, usage_dict
+
+def completion_job(job, messages, max_tokens, span, model, cache=None, cache_key=None, flight=None, similar=None,
+                   line_map=None):
+    """Corpo do job de uma chamada ao modelo. Retorna (texto, usage).
+    
+    Roda no pool, sem acessar o st: telemetria, cache, coalescência e índice de
+    entradas parecidas são atualizados aqui, mesmo que a sessão tenha saído da
+    página. Uma resposta parada no meio não vai ao cache; quem a acompanhava em
+    outra sessão refaz a chamada. Com line_map (entrada compactada), as linhas
+    citadas na resposta passam a ser as do original antes de tudo isso.
+    """
+    try:
+        try:
+            text, usage_dict = stream_generation(job, messages, max_tokens, span, flight, model)
+        except Exception as e:
+            span.finish(error=e)
+            if flight is not None:
+                single_flight.finish(flight, error=e)
+            raise
+        span.finish(usage_dict, cancelled=job.cancelled)
+        text = translate_line_refs(text, line_map)
         
-        # Atualiza contadores de tokens usando o objeto usage diretamente
-        usage_dict = {
-            'prompt_tokens': response.usage.prompt_tokens,
-            'completion_tokens': response.usage.completion_tokens,
-            'total_tokens': response.usage.total_tokens
-        }
-        update_token_counts(usage_dict)
-        
-        return response.choices[0].message.content
+        if not job.cancelled:
+            # Grava no cache antes de liberar os seguidores: quem chegar depois já encontra a resposta
+            if cache is not None and text:
+                cache.set(cache_key, text, usage_dict)
+            remember_similar(similar, cache_key, text)
+            if flight is not None:
+                single_flight.finish(flight, (text, usage_dict))
+    finally:
+        if flight is not None:
+            # Parado no meio: os seguidores refazem a chamada
+            single_flight.abandon(flight)
+    
+    # Calibra o estimador local com o prompt_tokens real
+    if not usage_dict.get('estimated'):
+        estimator.calibrate_messages(messages, usage_dict['prompt_tokens'])
+    return text, usage_dict
+
+def remember_similar(similar, cache_key, text):
+    """Indexa a entrada (similar = (índice, namespace, entrada)) com a resposta, para as parecidas."""
+    if similar is not None and text:
+        index, namespace, user_input = similar
+        index.add(namespace, cache_key, user_input)
+
+def blocking_completion(messages, max_tokens=MAX_TOKENS_CODE, model=GROQ_MODEL):
+    """Executa a completion aguardando a resposta completa."""
+    return complete(client, messages, model, TEMPERATURE, max_tokens, RETRY_POLICY, breaker)
+
+def follow_flight(flight, placeholder=None):
+    """Acompanha a chamada idêntica de outra sessão, renderizando o stream dela."""
+    if placeholder is None:
+        text, _ = flight.wait()
+        return text
+    
+    start = time.perf_counter()
+    last_render = 0.0
+    parts = []
+    for part in flight.follow():
+        if not parts:
+            st.session_state['last_ttft'] = time.perf_counter() - start
+        parts.append(part)
+        now = time.perf_counter()
+        if now - last_render >= STREAM_REFRESH_INTERVAL:
+            placeholder.markdown("".join(parts) + "▌")
+            last_render = now
+    
+    text, _ = flight.result
+    placeholder.markdown(text)
+    return text
+
+def job_outcome(job):
+    """(texto, usage) de um job terminado; repassa o erro dele, se houver.
+    
+    A resposta de um job parado pelo usuário volta com STOPPED_NOTE no fim; a
+    de um cortado pelo prazo vai até o último parágrafo ou bloco de código
+    completo. Parado ainda na fila, não há usage.
+    """
+    if job.status == 'error':
+        raise job.error
+    if job.result is None:
+        text, usage_dict = translate_line_refs(job.text(), job.context.get('line_map')), None
+    else:
+        text, usage_dict = job.result
+    if job.status == 'cancelled' and job.stop_reason == 'deadline':
+        text = cut_at_boundary(text)
+    elif job.status == 'cancelled':
+        text += STOPPED_NOTE
+    return text, usage_dict
+
+def account_job(job, usage_dict):
+    """Contabiliza na sessão um job terminado, inclusive um parado no meio."""
+    st.session_state['active_job'] = None
+    if job.ttft is not None:
+        st.session_state['last_ttft'] = job.ttft
+    if usage_dict is None:
+        refresh_metrics()
+        return
+    context = job.context
+    st.session_state['last_context'] = {
+        'used': usage_dict['prompt_tokens'] + usage_dict['completion_tokens'],
+        'window': get_context_window(context['model'], settings.MODEL_CONTEXT_WINDOW)
+    }
+    record_profile_stats(context.get('profile_name'), usage_dict, job.elapsed)
+    if context.get('template') is not None:
+        record_prompt_usage(context['template'], usage_dict)
+    # Por último: atualiza a sidebar (onde um rerun pode interromper o script)
+    update_token_counts(usage_dict)
+
+def follow_job(job, placeholder=None):
+    """Acompanha um job na thread do script até ele terminar, e o contabiliza. Retorna o texto.
+    
+    O texto parcial é redesenhado a cada STREAM_REFRESH_INTERVAL (sem
+    placeholder, só um elemento vazio): é nessas chamadas ao st que um rerun
+    interrompe o script, enquanto o job segue no pool. O botão "Parar" fica no
+    stop_slot da sessão enquanto o job roda. O prefix do contexto do job (a
+    resposta que ele continua) vem antes do texto. Se o prazo cortar a
+    resposta, o necessário para continuá-la fica em st.session_state['continuation'].
+    Com line_map no contexto (entrada compactada), o texto parcial já aparece
+    com as linhas do original.
+    """
+    slot = st.session_state.get('stop_slot')
+    if slot is not None and slot.button(
+        "⏹️ Parar",
+        key="stop_job",
+        help="Interrompe a geração; os tokens já gerados são contabilizados"
+    ):
+        job.cancel()
+    heartbeat = st.empty() if placeholder is None else None
+    prefix = job.context.get('prefix', '')
+    line_map = job.context.get('line_map')
+    
+    while not job.wait(STREAM_REFRESH_INTERVAL):
+        if placeholder is None:
+            heartbeat.empty()
+            continue
+        text = translate_line_refs(job.text(), line_map)
+        if text or prefix:
+            placeholder.markdown(prefix + text + "▌")
+        elif job.status == 'queued':
+            placeholder.markdown(f"⏳ Na fila ({job_manager.queue_position(job) + 1}º)...")
+        else:
+            placeholder.markdown("⏳ Aguardando resposta...")
+    if slot is not None:
+        slot.empty()
+    
+    try:
+        text, usage_dict = job_outcome(job)
+    except Exception:
+        st.session_state['active_job'] = None
+        raise
+    if job.stop_reason == 'deadline':
+        if text and job.context.get('mode'):
+            st.session_state['continuation'] = {
+                'mode': job.context['mode'],
+                'messages': job.context['messages'],
+                'profile_name': job.context.get('profile_name'),
+                'model': job.context['model'],
+                # O modelo continua o próprio texto, com as linhas da entrada que ele recebeu
+                'text': cut_at_boundary(job.text()),
+                'line_map': line_map,
+                'answer': prefix + text
+            }
+        text += DEADLINE_NOTE
+    text = prefix + text
+    if placeholder is not None:
+        placeholder.markdown(text)
+    account_job(job, usage_dict)
+    return text
+
+def stop_job(job):
+    """Para um job que a sessão deixou de acompanhar e contabiliza os tokens que ele usou."""
+    job.cancel()
+    job.wait()
+    try:
+        _, usage_dict = job_outcome(job)
+    except Exception:
+        usage_dict = None
+    account_job(job, usage_dict)
+
+def request_completion(messages, placeholder=None, cache_key=None, use_cache=True, template=None,
+                       max_tokens=MAX_TOKENS_CODE, profile_name=None, flight_key=None, model=GROQ_MODEL,
+                       similar=None, prefix='', line_map=None):
+    """Envia as mensagens ao modelo num job em segundo plano; com placeholder, o texto aparece conforme chega.
+    
+    Com cache_key, consulta o cache antes da chamada (a menos que use_cache
+    seja False) e armazena a resposta obtida. Com flight_key, uma requisição
+    idêntica já em andamento em outra sessão é acompanhada em vez de repetida.
+    Com similar (índice, namespace, entrada), a entrada é indexada para as
+    parecidas. prefix é a resposta que esta chamada continua. line_map (da
+    entrada compactada) traduz as linhas citadas na resposta. O job tem o
+    prazo "Tempo máximo da resposta" da sidebar, e o id dele fica em
+    st.session_state['active_job']: se um rerun interromper o script, main()
+    volta a acompanhá-lo.
+    """
+    cache = shared_response_cache() if cache_key else None
+    
+    if cache is not None and use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            st.session_state['cache_hits'] = st.session_state.get('cache_hits', 0) + 1
+            refresh_metrics()
+            if placeholder is not None:
+                placeholder.markdown(cached['value'])
+            remember_similar(similar, cache_key, cached['value'])
+            return cached['value']
+        st.session_state['cache_misses'] = st.session_state.get('cache_misses', 0) + 1
+    
+    flight = None
+    while flight_key is not None:
+        flight, leader = single_flight.join(flight_key)
+        if leader:
+            break
+        try:
+            text = follow_flight(flight, placeholder)
+        except FlightAbandoned:
+            # A sessão que fazia a chamada parou ou falhou: tenta de novo (talvez como líder)
+            continue
+        st.session_state['coalesced_requests'] = st.session_state.get('coalesced_requests', 0) + 1
+        refresh_metrics()
+        remember_similar(similar, cache_key, text)
+        return text
+    
+    # A chamada sai sempre em streaming: é o que permite fechá-la no meio
+    span = telemetry.start(template.mode if template is not None else 'completion', model, streaming=True)
+    try:
+        job = job_manager.submit(
+            lambda job: completion_job(
+                job, messages, max_tokens, span, model, cache, cache_key, flight, similar, line_map
+            ),
+            context={
+                'template': template,
+                'mode': template.mode if template is not None else None,
+                'messages': messages,
+                'profile_name': profile_name,
+                'model': model,
+                'prefix': prefix,
+                'line_map': line_map
+            },
+            deadline=st.session_state.get('time_budget', RESPONSE_TIME_BUDGET) or None
+        )
+    except Exception:
+        if flight is not None:
+            single_flight.abandon(flight)
+        raise
+    st.session_state['active_job'] = job.id
+    return follow_job(job, placeholder)
+
+def history_messages(history):
+    """Mensagens dos turnos anteriores dentro de CHAT_HISTORY_TOKENS; guarda as estatísticas na sessão."""
+    if not history:
+        return None
+    messages, stats = build_history_messages(history, CHAT_HISTORY_TOKENS, CHAT_RECENT_TURNS, estimator.estimate)
+    st.session_state['history_stats'] = stats
+    return messages
+
+def answer_similar(mode, user_input, cache_key, namespace, placeholder=None, profile_name=None,
+                   action=SIMILAR_ACTION):
+    """Resposta a partir de uma entrada parecida já respondida, ou None se não houver.
+    
+    Com action='reuse' a resposta anterior é mostrada na hora; com 'diff' o
+    modelo recebe a resposta anterior e só as diferenças da entrada.
+    """
+    cache = shared_response_cache()
+    index = shared_similar_index()
+    if action == 'off' or cache is None or index is None or cache.get(cache_key) is not None:
+        return None
+    match = index.query(namespace, user_input)
+    if match is None:
+        return None
+    previous = cache.get(match.key)
+    if previous is None:
+        # A resposta anterior saiu do cache
+        index.discard(match.key)
+        return None
+    
+    diff = input_diff(match.text, user_input)
+    st.session_state['similar_hits'] = st.session_state.get('similar_hits', 0) + 1
+    if action == 'reuse':
+        st.info(
+            f"Esta entrada é {match.similarity:.0%} parecida com uma já respondida; "
+            f"mostrando a resposta anterior. Marque \"Ignorar cache\" para pedir uma nova."
+        )
+        with st.expander("Diferenças em relação à entrada anterior"):
+            st.code(diff or "(sem diferenças além de espaços)", language='diff')
+        refresh_metrics()
+        if placeholder is not None:
+            placeholder.markdown(previous['value'])
+        return previous['value']
+    
+    previous_answer = [{'role': 'assistant', 'content': previous['value']}]
+    route = route_model(
+        settings, f"{mode}_followup", diff, profile_name, extra_tokens=estimator.estimate(previous['value']),
+        streaming=True
+    )
+    st.session_state['last_route'] = route
+    prepared = prepare_prompt(
+        settings,
+        f"{mode}_followup",
+        diff,
+        profile_name or OUTPUT_PROFILE,
+        route.model,
+        history=previous_answer
+    )
+    st.info(
+        f"Esta entrada é {match.similarity:.0%} parecida com uma já respondida; "
+        f"enviando só as diferenças ({len(diff.splitlines())} linhas de diff)."
+    )
+    # A resposta vale para esta entrada: fica no cache sob a chave dela
+    return request_completion(
+        prepared.messages,
+        placeholder,
+        cache_key=cache_key,
+        use_cache=False,
+        template=prepared.template,
+        max_tokens=prepared.max_tokens,
+        profile_name=prepared.profile.name,
+        model=prepared.model,
+        similar=(index, namespace, user_input)
+    )
+
+def run_prompt(mode, user_input, placeholder=None, use_cache=True, profile_name=None, history=None,
+               similar_action=SIMILAR_ACTION):
+    """Monta o prompt do modo, no perfil de saída pedido, e envia a requisição.
+    
+    Com history (modo conversa), os turnos anteriores entram no prompt; a
+    resposta depende deles, então cache, coalescência e entradas parecidas não
+    se aplicam. Nos COMPACTED_MODES, o prompt recebe a entrada compactada;
+    cache, coalescência e entradas parecidas seguem com a original.
+    """
+    previous = history_messages(history)
+    history_tokens = st.session_state['history_stats']['tokens'] if previous else 0
+    compaction = compact_prompt_input(mode, user_input)
+    prompt_input = compaction.text if compaction is not None else user_input
+    line_map = compaction.line_map if compaction is not None else None
+    route = route_model(settings, mode, prompt_input, profile_name, extra_tokens=history_tokens, streaming=True)
+    st.session_state['last_route'] = route
+    prepared = prepare_prompt(
+        settings, mode, prompt_input, profile_name or OUTPUT_PROFILE, route.model, history=previous
+    )
+    if prepared.trimmed:
+        st.warning(
+            f"A entrada foi reduzida para ~{prepared.prompt_estimate:,} tokens de prompt "
+            f"para caber no contexto do modelo."
+        )
+    
+    if previous:
+        return request_completion(
+            prepared.messages,
+            placeholder,
+            template=prepared.template,
+            max_tokens=prepared.max_tokens,
+            profile_name=prepared.profile.name,
+            model=prepared.model,
+            line_map=line_map
+        )
+    
+    # Chaves pelo nível exigido (route_key): a troca de modelo no mesmo nível não perde o cache
+    cache_key = build_cache_key(prepared.template, route_key(route), TEMPERATURE, prepared.profile.name, user_input)
+    namespace = build_similarity_namespace(prepared.template, route_key(route), TEMPERATURE, prepared.profile.name)
+    if use_cache:
+        text = answer_similar(mode, user_input, cache_key, namespace, placeholder, prepared.profile.name,
+                              similar_action)
+        if text is not None:
+            return text
+    
+    index = shared_similar_index()
+    return request_completion(
+        prepared.messages,
+        placeholder,
+        cache_key=cache_key,
+        use_cache=use_cache,
+        template=prepared.template,
+        max_tokens=prepared.max_tokens,
+        profile_name=prepared.profile.name,
+        flight_key=build_flight_key(prepared.template, route_key(route), TEMPERATURE, prepared.profile.name, user_input),
+        model=prepared.model,
+        similar=(index, namespace, user_input) if index is not None else None,
+        line_map=line_map
+    )
+
+def compact_prompt_input(mode, user_input, report=True):
+    """Compacta a entrada dos COMPACTED_MODES. Retorna Compaction, ou None se não houver economia.
+    
+    Com report, os tokens economizados aparecem na tela (report_compaction).
+    """
+    if not INPUT_COMPACTION or mode not in COMPACTED_MODES:
+        return None
+    compaction = compact_input(user_input, COMPACT_MAX_LINE_CHARS)
+    if estimator.estimate(compaction.text) >= estimator.estimate(user_input):
+        return None
+    if report:
+        report_compaction(user_input, compaction)
+    return compaction
+
+def report_compaction(user_input, compaction):
+    """Mostra e soma na sessão os tokens de prompt que a compactação economizou."""
+    original = estimator.estimate(user_input)
+    saved = original - estimator.estimate(compaction.text)
+    st.session_state['compaction_saved'] = st.session_state.get('compaction_saved', 0) + saved
+    st.caption(
+        f"🗜️ Entrada compactada: ~{saved:,} tokens de prompt a menos ({saved / original:.0%}) — "
+        f"{format_compaction(compaction.removed)}. As linhas citadas na resposta são as do código original."
+    )
+
+def continue_response(continuation, placeholder=None):
+    """Pede ao modelo o restante de uma resposta cortada pelo prazo. Retorna a resposta emendada.
+    
+    A parte já gerada vai como a resposta anterior do assistente, seguida do
+    pedido de continuação; só o restante é gerado. A mensagem de sistema é a
+    da chamada original (ex.: a da análise direcionada ou a de um arquivo do plano).
+    """
+    try:
+        system, *previous = continuation['messages']
+        history = previous + [{'role': 'assistant', 'content': continuation['text']}]
+        mode = continuation['mode'].split('_')[0]
+        prepared = prepare_prompt(
+            settings, f"{mode}_continue", '', continuation['profile_name'], continuation['model'],
+            history=history, system=system
+        )
+        return request_completion(
+            prepared.messages,
+            placeholder,
+            template=prepared.template,
+            max_tokens=prepared.max_tokens,
+            profile_name=prepared.profile.name,
+            model=prepared.model,
+            prefix=continuation['answer'].rstrip('\n') + "\n\n",
+            line_map=continuation.get('line_map')
+        )
         
     except Exception as e:
         st.error(f"Erro ao processar: {str(e)}")
+        refresh_metrics()
         return None
 
-def correct_errors(user_input):
-    """Corrige erros no código fornecido."""
-    try:
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"""
-Por favor, faça uma análise COMPLETA e DETALHADA do seguinte código, 
-identificando e corrigindo TODOS os problemas, incluindo:
-- Bugs e erros
-- Problemas de segurança
-- Issues de performance
-- Más práticas
-- Código duplicado
-- Complexidade desnecessária
-- Problemas de manutenibilidade
-
-Código para análise:
-{user_input}
-
-IMPORTANTE:
-- Forneça explicações detalhadas
-- Inclua exemplos e casos de uso
-- Documente completamente as correções
-- Discuta alternativas consideradas
-- Inclua testes unitários
-"""}
-        ]
-        
-        response = client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=messages,
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS_CODE,
-            stop=None
+def analyze_chunk(messages, max_tokens, cache=None, cache_key=None, use_cache=True, flight_key=None,
+                  model=GROQ_MODEL, mode='correct_chunk'):
+    """Analisa uma parte do código (ou gera um arquivo do plano); roda nas threads do pool, sem acessar o st.
+    
+    A mesma parte já em análise em outra sessão é aguardada em vez de repetida;
+    nesse caso o usage volta como None (os tokens foram contados pela outra sessão).
+    Retorna (texto, usage, veio_do_cache).
+    """
+    if cache is not None and use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached['value'], cached.get('usage'), True
+    
+    def call_model():
+        span = telemetry.start(mode, model)
+        try:
+            text, usage_dict = blocking_completion(messages, max_tokens, model)
+        except Exception as e:
+            span.finish(error=e)
+            raise
+        span.finish(usage_dict)
+        if cache is not None and text:
+            cache.set(cache_key, text, usage_dict)
+        return text, usage_dict
+    
+    if flight_key is None:
+        text, usage_dict = call_model()
+        return text, usage_dict, False
+    (text, usage_dict), coalesced = single_flight.call(flight_key, call_model)
+    return text, None if coalesced else usage_dict, False
+
+def merge_chunk_reports(chunks, results, reused=None):
+    """Junta as análises das partes, na ordem do arquivo, em um único relatório.
+    
+    reused associa a posição das partes reaproveitadas às linhas que elas
+    ocupavam quando foram analisadas.
+    """
+    reused = reused or {}
+    done = sum(1 for result in results if result is not None)
+    summary = f"**Análise em partes:** {done}/{len(chunks)} partes concluídas."
+    if reused:
+        summary += f" {len(reused)} sem alterações desde a análise anterior."
+    sections = [summary]
+    for position, (chunk, result) in enumerate(zip(chunks, results)):
+        names = ", ".join(f"`{name}`" for name in chunk.names)
+        sections.append(
+            f"#### Parte {chunk.index}/{len(chunks)} — {names} "
+            f"(linhas {chunk.start_line}-{chunk.end_line})"
+        )
+        if position in reused:
+            note = "♻️ Sem alterações desde a análise anterior"
+            start_line, end_line = reused[position]
+            if (start_line, end_line) != (chunk.start_line, chunk.end_line):
+                note += f"; as linhas citadas são as da versão analisada ({start_line}-{end_line})"
+            sections.append(f"_{note}._")
+        sections.append(result if result is not None else "⏳ Em análise...")
+    return "\n\n".join(sections)
+
+def correct_errors_chunked(user_input, placeholder=None, use_cache=True, profile_name=None):
+    """Analisa um arquivo grande em partes, em paralelo, e junta os resultados em ordem.
+    
+    Cada unidade (função/classe) recebe uma impressão digital do conteúdo.
+    Partes cujas unidades não mudaram desde uma análise anterior da sessão
+    são reaproveitadas, com as linhas da versão analisada, mesmo que outras
+    funções e o cabeçalho tenham mudado; o cache compartilhado só vale para o
+    mesmo prompt (trecho, cabeçalho e linhas). Só as partes alteradas vão ao modelo. Entradas sem unidades
+    seguem pelo run_prompt.
+    """
+    start = time.perf_counter()
+    cache = shared_response_cache()
+    analyses = st.session_state.setdefault('unit_analyses', OrderedDict())
+    
+    units = split_units(user_input)
+    if not units:
+        # Sem unidades para dividir (ex.: só linhas em branco): uma chamada normal
+        return run_prompt('correct', user_input, placeholder, use_cache, profile_name)
+    header = build_shared_header(user_input, units)
+    fingerprints = [unit_fingerprint(unit) for unit in units]
+    
+    # Um modelo para todas as partes, escolhido pela maior delas
+    route = route_model(
+        settings,
+        'correct_chunk',
+        max((chunk.text for chunk in group_units(units, CHUNK_MAX_TOKENS, estimator.estimate)), key=len),
+        profile_name,
+        extra_tokens=estimator.estimate(header)
+    )
+    st.session_state['last_route'] = route
+    context_window = get_context_window(route.model, settings.MODEL_CONTEXT_WINDOW)
+    template = get_prompt('correct_chunk', prompt_version(settings, 'correct_chunk'))
+    profile = get_output_profile(profile_name or OUTPUT_PROFILE)
+    
+    # Com roteamento, cada grupo é guardado sob o nível que ele mesmo exige, e não o da maior parte:
+    # uma parte nova maior (ou a troca de modelo no mesmo nível) não invalida as demais
+    def group_tier(text):
+        if route.tier is None:
+            return route.model
+        return model_router.required_tier('correct_chunk', estimator.estimate(text), profile.name)[0]
+    
+    def analysis_key(group, tier):
+        return build_unit_analysis_key(template, tier, TEMPERATURE, profile.name, group)
+    
+    # Grupos já analisados nesta sessão com o mesmo prompt, perfil e modelo ou roteamento (os mais recentes primeiro)
+    tiers = set(TIERS) if route.tier is not None else {route.model}
+    previous = {}
+    if use_cache:
+        for key, entry in reversed(analyses.items()):
+            if entry.get('tier') in tiers and analysis_key(entry['fingerprints'], entry['tier']) == key:
+                previous.setdefault(entry['fingerprints'], key)
+    plan = plan_incremental(units, fingerprints, list(previous), CHUNK_MAX_TOKENS, estimator.estimate)
+    
+    chunks = []
+    results = []
+    reused = {}
+    requests = {}
+    for position, (indices, previous_group) in enumerate(plan):
+        group = [units[index] for index in indices]
+        chunk = CodeChunk(
+            position + 1,
+            [unit.name for unit in group],
+            min(unit.start_line for unit in group),
+            max(unit.end_line for unit in group),
+            "\n\n".join(unit.text for unit in group)
         )
+        chunks.append(chunk)
+        if previous_group is not None:
+            key = previous[previous_group]
+            analyses.move_to_end(key)
+            results.append(analyses[key]['text'])
+            reused[position] = (analyses[key]['start_line'], analyses[key]['end_line'])
+            continue
         
-        # Atualiza contadores de tokens usando o objeto usage diretamente
-        usage_dict = {
-            'prompt_tokens': response.usage.prompt_tokens,
-            'completion_tokens': response.usage.completion_tokens,
-            'total_tokens': response.usage.total_tokens
+        results.append(None)
+        prepared = prepare_prompt(
+            settings,
+            'correct_chunk',
+            trim_to_tokens(chunk.text, context_window // 2),
+            profile.name,
+            route.model,
+            header=header,
+            part=chunk.index,
+            total=len(plan),
+            start_line=chunk.start_line,
+            end_line=chunk.end_line
+        )
+        flight_key = build_flight_key(
+            prepared.template,
+            route_key(route),
+            TEMPERATURE,
+            prepared.profile.name,
+            prepared.messages[-1]['content']
+        )
+        # No cache compartilhado, a chave cobre o prompt inteiro: outro arquivo ou outras linhas não reaproveitam
+        cache_key = build_cache_key(
+            prepared.template,
+            route_key(route),
+            TEMPERATURE,
+            prepared.profile.name,
+            prepared.messages[-1]['content']
+        )
+        fingerprint_group = tuple(fingerprints[index] for index in indices)
+        tier = group_tier(chunk.text)
+        requests[position] = (prepared.messages, prepared.max_tokens, cache_key, flight_key,
+                              (analysis_key(fingerprint_group, tier), tier), fingerprint_group)
+    
+    total_usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    
+    if placeholder is not None:
+        placeholder.markdown(merge_chunk_reports(chunks, results, reused))
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(CHUNK_WORKERS, len(requests)))) as pool:
+        futures = {
+            pool.submit(analyze_chunk, messages, max_tokens, cache, cache_key, use_cache, flight_key, route.model): position
+            for position, (messages, max_tokens, cache_key, flight_key, _, _) in requests.items()
         }
+        first = True
+        for future in as_completed(futures):
+            position = futures[future]
+            messages, _, _, _, (session_key, tier), fingerprint_group = requests[position]
+            try:
+                text, usage_dict, cached = future.result()
+            except Exception as e:
+                text, usage_dict, cached = f"⚠️ Erro ao analisar esta parte: {str(e)}", None, False
+            else:
+                chunk = chunks[position]
+                analyses[session_key] = {
+                    'fingerprints': fingerprint_group,
+                    'tier': tier,
+                    'text': text,
+                    'start_line': chunk.start_line,
+                    'end_line': chunk.end_line
+                }
+                analyses.move_to_end(session_key)
+                while len(analyses) > UNIT_ANALYSES_MAX:
+                    analyses.popitem(last=False)
+            if first:
+                # Tempo até a primeira parte concluída
+                st.session_state['last_ttft'] = time.perf_counter() - start
+                first = False
+            results[position] = text
+            
+            # Contabilização feita na thread do script
+            if cache is not None and use_cache:
+                counter = 'cache_hits' if cached else 'cache_misses'
+                st.session_state[counter] = st.session_state.get(counter, 0) + 1
+            if usage_dict and not cached:
+                estimator.calibrate_messages(messages, usage_dict['prompt_tokens'])
+                record_prompt_usage(template, usage_dict)
+                update_token_counts(usage_dict)
+                for key in total_usage:
+                    total_usage[key] += usage_dict.get(key, 0)
+            
+            if placeholder is not None:
+                placeholder.markdown(merge_chunk_reports(chunks, results, reused))
+    
+    if requests:
+        record_profile_stats(profile.name, total_usage, time.perf_counter() - start)
+    report = merge_chunk_reports(chunks, results, reused)
+    if placeholder is not None:
+        placeholder.markdown(report)
+    refresh_metrics()
+    return report
+
+def file_plan_header(manifest):
+    """Abertura da resposta da geração em paralelo: quantos arquivos e a visão geral do plano."""
+    header = f"**Geração em paralelo:** {len(manifest.files)} arquivos planejados."
+    return f"{header}\n\n{manifest.summary}" if manifest.summary else header
+
+def merge_file_sections(manifest, sections):
+    """Resposta final da geração em paralelo, na ordem do plano; os arquivos que faltaram ficam listados."""
+    parts = [file_plan_header(manifest)]
+    parts.extend(sections[position] for position in sorted(sections))
+    missing = [spec.path for position, spec in enumerate(manifest.files) if position not in sections]
+    if missing:
+        parts.append("Não gerados: " + ", ".join(f"`{path}`" for path in missing))
+    # Termina com linha em branco: o último parágrafo conta como completo se o prazo cortar a resposta
+    return "\n\n".join(parts) + "\n\n"
+
+def generate_file(job, prepared, model, cache=None, cache_key=None, use_cache=True):
+    """Gera um arquivo do plano dentro do job da geração em paralelo. Retorna (texto, usage).
+    
+    O stream fica registrado no job (Parar e o prazo o fecham) e o texto não
+    é publicado: o arquivo entra na resposta inteiro, quando termina. Um
+    arquivo parado no meio volta com texto None; vindo do cache, sem usage.
+    """
+    if job.cancelled:
+        return None, None
+    if cache is not None and use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached['value'], None
+    span = telemetry.start('suggest_file', model, streaming=True)
+    try:
+        text, usage_dict = stream_generation(
+            job, prepared.messages, prepared.max_tokens, span, model=model, publish=lambda part: None
+        )
+    except Exception as e:
+        span.finish(error=e)
+        raise
+    span.finish(usage_dict, cancelled=job.cancelled)
+    if job.cancelled:
+        return None, usage_dict
+    if cache is not None and text:
+        cache.set(cache_key, text, usage_dict)
+    if not usage_dict.get('estimated'):
+        estimator.calibrate_messages(prepared.messages, usage_dict['prompt_tokens'])
+    return text, usage_dict
+
+def fanout_job(job, manifest, requests, model, cache=None, use_cache=True):
+    """Corpo do job da geração em paralelo: até FANOUT_WORKERS arquivos ao mesmo tempo. Retorna (texto, usage).
+    
+    Cada arquivo pronto é publicado no job como uma seção própria (o primeiro
+    junto com a abertura da resposta). Com o job parado, a resposta fica com
+    os arquivos que terminaram e o usage soma todas as chamadas.
+    """
+    sections = {}
+    total_usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    estimated = False
+    with ThreadPoolExecutor(max_workers=max(1, min(FANOUT_WORKERS, len(requests))), thread_name_prefix="fanout") as pool:
+        futures = {
+            pool.submit(generate_file, job, prepared, model, cache, cache_key, use_cache): position
+            for position, (prepared, cache_key) in requests.items()
+        }
+        for future in as_completed(futures):
+            position = futures[future]
+            spec = manifest.files[position]
+            try:
+                text, usage_dict = future.result()
+            except Exception as e:
+                if job.cancelled:
+                    continue
+                section = format_file_section(spec, error=str(e))
+            else:
+                if usage_dict:
+                    estimated = estimated or bool(usage_dict.get('estimated'))
+                    for key in total_usage:
+                        total_usage[key] += usage_dict.get(key, 0)
+                if text is None:
+                    continue
+                section = format_file_section(spec, text)
+            sections[position] = section
+            opening = "" if len(sections) > 1 else file_plan_header(manifest) + "\n\n"
+            job.publish(f"{opening}{section}\n\n")
+    if estimated:
+        total_usage['estimated'] = True
+    return merge_file_sections(manifest, sections), total_usage
+
+def suggest_code_fanout(user_input, placeholder=None, use_cache=True, profile_name=None):
+    """Planeja os arquivos da solução e gera cada um numa chamada própria, em paralelo.
+    
+    Uma chamada curta devolve o manifesto (JSON); os arquivos saem num job em
+    segundo plano (fanout_job), com o plano como contexto comum. Como nas
+    outras gerações, "Parar", o prazo da sidebar e a volta ao job depois de
+    um rerun valem para o conjunto. Retorna None (para a geração numa chamada
+    só) se o plano falhar ou não vier com dois arquivos ou mais.
+    """
+    compaction = compact_prompt_input('suggest', user_input, report=False)
+    prompt_input = compaction.text if compaction is not None else user_input
+    cache = shared_response_cache()
+    profile = get_output_profile(profile_name or OUTPUT_PROFILE)
+    
+    route = route_model(settings, 'suggest_plan', prompt_input, profile.name)
+    st.session_state['last_route'] = route
+    try:
+        plan = prepare_prompt(settings, 'suggest_plan', prompt_input, profile.name, route.model, max_files=FANOUT_MAX_FILES)
+        if placeholder is not None:
+            placeholder.markdown("🗂️ Planejando os arquivos...")
+        text, usage_dict, cached = analyze_chunk(
+            plan.messages,
+            min(plan.max_tokens, FANOUT_PLAN_MAX_TOKENS),
+            cache,
+            build_cache_key(plan.template, route_key(route), TEMPERATURE, profile.name, user_input),
+            use_cache,
+            build_flight_key(plan.template, route_key(route), TEMPERATURE, profile.name, user_input),
+            route.model,
+            mode='suggest_plan'
+        )
+    except Exception:
+        # Sem plano, a resposta sai numa chamada só
+        return None
+    if cache is not None and use_cache:
+        counter = 'cache_hits' if cached else 'cache_misses'
+        st.session_state[counter] = st.session_state.get(counter, 0) + 1
+    if usage_dict and not cached:
+        estimator.calibrate_messages(plan.messages, usage_dict['prompt_tokens'])
+        record_prompt_usage(plan.template, usage_dict)
         update_token_counts(usage_dict)
+    manifest = parse_manifest(text, FANOUT_MAX_FILES)
+    if manifest is None or len(manifest.files) < 2:
+        return None
+    if compaction is not None:
+        report_compaction(user_input, compaction)
+    
+    shared_plan = format_manifest(manifest)
+    route = route_model(
+        settings, 'suggest_file', prompt_input, profile.name, extra_tokens=estimator.estimate(shared_plan), streaming=True
+    )
+    st.session_state['last_route'] = route
+    requests = {}
+    for position, spec in enumerate(manifest.files):
+        prepared = prepare_prompt(
+            settings, 'suggest_file', prompt_input, profile.name, route.model, manifest=shared_plan, path=spec.path
+        )
+        cache_key = build_cache_key(
+            prepared.template, route_key(route), TEMPERATURE, profile.name, prepared.messages[-1]['content']
+        )
+        requests[position] = (prepared, cache_key)
+    
+    job = job_manager.submit(
+        lambda job: fanout_job(job, manifest, requests, route.model, cache, use_cache),
+        context={
+            'template': requests[0][0].template,
+            'mode': None,
+            'messages': None,
+            'profile_name': profile.name,
+            'model': route.model,
+            'prefix': ''
+        },
+        deadline=st.session_state.get('time_budget', RESPONSE_TIME_BUDGET) or None
+    )
+    st.session_state['active_job'] = job.id
+    return follow_job(job, placeholder)
+
+def suggest_code(user_input, placeholder=None, use_cache=True, profile_name=None, history=None,
+                 similar_action=SIMILAR_ACTION, fanout=False):
+    """Sugere código com base na entrada do usuário.
+    
+    Com fanout, fora do modo conversa e nos perfis com orçamento de
+    FANOUT_MIN_TOKENS ou mais, os arquivos são planejados e gerados em
+    paralelo (suggest_code_fanout).
+    """
+    try:
+        if fanout and not history and profile_max_tokens(settings, profile_name or OUTPUT_PROFILE) >= FANOUT_MIN_TOKENS:
+            answer = suggest_code_fanout(user_input, placeholder, use_cache, profile_name)
+            if answer is not None:
+                return answer
+        return run_prompt('suggest', user_input, placeholder, use_cache, profile_name, history, similar_action)
         
-        return response.choices[0].message.content
+    except Exception as e:
+        st.error(f"Erro ao processar: {str(e)}")
+        refresh_metrics()
+        return None
+
+def local_pre_analysis(user_input, placeholder, use_cache, profile_name, history, similar_action):
+    """Análise estática local antes do modelo. Retorna (resposta, avisos).
+    
+    Erros de sintaxe em código Python válido para o parser (ou apontados por
+    um verificador configurado) são respondidos na hora; outros problemas
+    (ex.: nomes indefinidos) vão ao modelo num prompt só com eles e os trechos
+    afetados. Só com avisos de estilo (imports sem uso), a resposta é None e
+    os avisos seguem com o código para a revisão completa.
+    """
+    analysis = static_analyzer.analyze(user_input)
+    if analysis is None or not analysis.findings:
+        return None, None
+    if is_lint_only(analysis.findings):
+        return None, format_lint_notes(analysis.findings)
+    static_answers = st.session_state.setdefault('static_answers', {'instant': 0, 'targeted': 0})
+    if is_trivial(analysis.findings):
+        report = format_local_report(user_input, analysis)
+        static_answers['instant'] += 1
+        if placeholder is not None:
+            placeholder.markdown(report)
+        refresh_metrics()
+        return report, None
+    static_answers['targeted'] += 1
+    return run_prompt(
+        'correct_targeted', build_targeted_input(user_input, analysis), placeholder, use_cache, profile_name,
+        history, similar_action
+    ), None
+
+def correct_errors(user_input, placeholder=None, use_cache=True, profile_name=None, chunked=False, history=None,
+                   similar_action=SIMILAR_ACTION, static_analysis=False):
+    """Corrige erros no código fornecido.
+    
+    Com static_analysis, a análise local roda antes (local_pre_analysis); os
+    avisos de estilo dela vão no fim da entrada. Com chunked, arquivos com
+    CHUNK_MIN_LINES linhas ou mais são analisados em partes (sem o histórico
+    da conversa, que cada parte não precisa).
+    """
+    try:
+        notes = None
+        if static_analysis:
+            answer, notes = local_pre_analysis(user_input, placeholder, use_cache, profile_name, history, similar_action)
+            if answer is not None:
+                return answer
+        if chunked and len(user_input.splitlines()) >= CHUNK_MIN_LINES:
+            return correct_errors_chunked(user_input, placeholder, use_cache, profile_name)
+        if notes:
+            user_input = f"{user_input.rstrip()}\n\n{notes}"
+        return run_prompt('correct', user_input, placeholder, use_cache, profile_name, history, similar_action)
         
     except Exception as e:
         st.error(f"Erro ao processar: {str(e)}")
+        refresh_metrics()
+        return None
+
+def format_history_stats(stats):
+    """Resumo de como o histórico entrou no prompt da última pergunta."""
+    text = (
+        f"Contexto da conversa: {stats['verbatim']} turnos na íntegra, "
+        f"{stats['summarized']} resumidos, ~{stats['tokens']:,} tokens"
+    )
+    if stats['dropped']:
+        text += f" ({stats['dropped']} turnos antigos fora do limite)"
+    return text
+
+def render_response_title(action):
+    """Títulos da seção de resposta para a ação pedida."""
+    st.markdown("## Resposta")
+    if action == 'suggest':
+        st.markdown("### 💡 Sugestão de Código")
+    else:
+        st.markdown("### 🔍 Análise e Correção")
+
+def render_response(action, produce, stream_enabled):
+    """Desenha a resposta de produce(placeholder). Retorna (texto, view, trechos).
+    
+    Com streaming, o placeholder é a ResponseView; sem ele, produce recebe None
+    e a resposta é desenhada de uma vez no fim. Enquanto produce roda, o botão
+    "Parar" de um job fica logo abaixo do título.
+    """
+    render_response_title(action)
+    st.session_state.stop_slot = st.empty()
+    
+    # Container para o conteúdo da resposta, renderizado por trechos
+    with st.container():
+        view = ResponseView()
+        if stream_enabled:
+            # O texto é renderizado à medida que chega
+            view.markdown("⏳ Aguardando resposta...")
+            response = produce(view)
+        else:
+            spinner_text = "Gerando sugestão..." if action == 'suggest' else "Analisando código..."
+            with st.spinner(spinner_text):
+                response = produce(None)
+            if response:
+                view.markdown(response)
+        segments = None
+        if response:
+            segments = view.finish()
+        else:
+            view.empty()
+    st.session_state.stop_slot = None
+    return response, view, segments
+
+def render_continue_button(slot):
+    """Botão "Continuar" da última resposta, cortada pelo prazo, no slot. Retorna se foi clicado."""
+    return slot.button(
+        "▶️ Continuar",
+        key="continue_response",
+        help="Pede ao modelo o restante da resposta, sem gerar de novo a parte já recebida"
+    )
+
+def resume_job(job, placeholder=None):
+    """Volta a acompanhar, depois de um rerun, o job da pergunta anterior."""
+    try:
+        return follow_job(job, placeholder)
+    except Exception as e:
+        st.error(f"Erro ao processar: {str(e)}")
+        refresh_metrics()
         return None
 
+def store_response(action, user_input, response, view, segments, chat_mode):
+    """Guarda a resposta na sessão e, no modo conversa, os dois turnos no histórico."""
+    st.session_state.pending_request = None
+    if not response:
+        return
+    # Trechos guardados na sessão: reruns redesenham a resposta sem analisá-la de novo
+    st.session_state.last_response = {
+        'action': action,
+        'key': view.segments_key,
+        'segments': segments,
+        # Resposta cortada pelo prazo: o necessário para "Continuar" (só fora do modo conversa)
+        'continuation': None if chat_mode else st.session_state.continuation
+    }
+    st.session_state.continuation = None
+    if chat_mode:
+        assistant_turn = new_turn('assistant', response, action)
+        assistant_turn['segments'] = segments
+        st.session_state.chat_history.extend([new_turn('user', user_input, action), assistant_turn])
+
+def render_chat_history():
+    """Mostra os turnos anteriores; nas respostas, o usuário marca os blocos de código já aplicados."""
+    for turn in st.session_state.chat_history:
+        with st.chat_message(turn['role']):
+            if 'segments' not in turn:
+                turn['segments'] = split_segments(turn['content'])
+            render_segments(turn['segments'], f"turn-{turn['id']}")
+            if turn['role'] != 'assistant':
+                continue
+            blocks = extract_code_blocks(turn['content'])
+            if not blocks:
+                continue
+            labels = [code_block_label(index, language, code) for index, (language, code) in enumerate(blocks)]
+            accepted = st.multiselect(
+                "Blocos já aplicados",
+                range(len(blocks)),
+                default=turn['accepted'],
+                format_func=lambda index: labels[index],
+                key=f"accepted_{turn['id']}",
+                help="Os blocos marcados deixam de ser reenviados ao modelo nas próximas perguntas"
+            )
+            turn['accepted'] = list(accepted)
+
 def main():
     """Função principal do aplicativo."""
     st.set_page_config(
@@ -578,6 +1782,7 @@ def main():
     
     # Inicializa o estado da sessão
     init_session_state()
+    record_startup_timings(STARTUP_TIMINGS)
     
     # Configura a sidebar
     with st.sidebar:
@@ -589,6 +1794,91 @@ def main():
         st.session_state.metrics_container = metrics_placeholder
         metrics_placeholder.markdown(format_metrics(), unsafe_allow_html=True)
         
+        # Opções de resposta
+        stream_enabled = st.toggle(
+            "Streaming da resposta",
+            value=STREAM_RESPONSES,
+            help="Exibe a resposta conforme ela é gerada"
+        )
+        bypass_cache = st.checkbox(
+            "Ignorar cache",
+            value=False,
+            help="Solicita uma resposta nova mesmo que a pergunta já tenha sido respondida",
+            disabled=not CACHE_ENABLED
+        )
+        budget_labels = {seconds: f"{seconds:g}s" if seconds else "Sem limite" for seconds in TIME_BUDGET_OPTIONS}
+        budget_label = st.select_slider(
+            "Tempo máximo da resposta",
+            options=list(budget_labels.values()),
+            value=budget_labels[RESPONSE_TIME_BUDGET],
+            help="Passado esse tempo, a resposta é cortada no último parágrafo ou bloco de código "
+                 "completo; \"Continuar\" pede o restante"
+        )
+        # Lido por request_completion, como prazo dos jobs desta sessão
+        st.session_state.time_budget = next(
+            seconds for seconds, label in budget_labels.items() if label == budget_label
+        )
+        similar_labels = list(SIMILAR_ACTIONS.values())
+        similar_label = st.selectbox(
+            "Entradas parecidas",
+            similar_labels,
+            index=similar_labels.index(SIMILAR_ACTIONS[SIMILAR_ACTION]),
+            help="O que fazer quando a entrada é quase igual a uma já respondida "
+                 "(ex.: mesmo código com outro nome de variável)",
+            disabled=not CACHE_ENABLED
+        )
+        similar_action = next(action for action, label in SIMILAR_ACTIONS.items() if label == similar_label)
+        fanout = st.checkbox(
+            "Gerar arquivos em paralelo",
+            value=FANOUT_GENERATION,
+            help="Em 'Sugerir Código', uma chamada curta planeja os arquivos e cada arquivo é gerado "
+                 "à parte, em paralelo; cada um aparece assim que fica pronto"
+        )
+        chunked = st.checkbox(
+            "Analisar arquivos grandes em partes",
+            value=CHUNKED_ANALYSIS,
+            help=f"Em 'Corrigir Erros', arquivos com {CHUNK_MIN_LINES}+ linhas são divididos "
+                 f"por função/classe e analisados em paralelo"
+        )
+        static_analysis = st.checkbox(
+            "Análise local antes do modelo",
+            value=STATIC_ANALYSIS,
+            help="Em 'Corrigir Erros', erros de sintaxe e imports sem uso são apontados na hora, sem "
+                 "chamar o modelo; outros problemas encontrados vão ao modelo só com os trechos afetados",
+            disabled=not STATIC_ANALYSIS
+        )
+        chat_mode = st.toggle(
+            "Modo conversa",
+            value=False,
+            help="Envia os turnos anteriores junto com a pergunta (os mais antigos resumidos)"
+        )
+        if chat_mode and st.session_state.chat_history:
+            if st.button("Limpar conversa", use_container_width=True):
+                st.session_state.chat_history = []
+                st.session_state.history_stats = None
+        
+        # Tempos de inicialização do script
+        with st.expander("⏱️ Inicialização"):
+            st.markdown(format_startup_report())
+        
+        # Modelos do roteamento (latência e erros recentes)
+        with st.expander("🧭 Roteamento"):
+            st.markdown(format_routing_report())
+        
+        # Latência e taxa de sucesso (todas as sessões)
+        with st.expander("📈 Latência"):
+            st.markdown(format_latency_report())
+            st.download_button(
+                "Exportar (Prometheus)",
+                data=telemetry.render_prometheus() + single_flight.render_prometheus() + hedger.render_prometheus(),
+                file_name="metrics.prom",
+                mime="text/plain"
+            )
+        
+        # Custo de prompt por versão
+        with st.expander("📉 Tokens de prompt"):
+            st.markdown(format_prompt_usage_report())
+        
         # Seção Sobre
         st.markdown("""
         ### ℹ️ Sobre
@@ -603,58 +1893,133 @@ def main():
         # Footer
         st.markdown(f"""
         <div style='text-align: center; color: #666; padding-top: 0.3rem; font-size: 0.8em;'>
-            {get_env_value('APP_NAME', 'AI Code Assistant', str)}<br>
-            &copy; {get_env_value('COMPANY_NAME', 'Your Company', str)} {datetime.now().year}
+            {APP_NAME}<br>
+            &copy; {COMPANY_NAME} {datetime.now().year}
         </div>""", unsafe_allow_html=True)
     
     # Título principal
     st.title(APP_TITLE)
     
+    # Turnos anteriores da conversa
+    if chat_mode:
+        render_chat_history()
+    
     # Seção de entrada
     input_container = st.container()
     with input_container:
         user_input = st.text_area("Digite sua pergunta ou cole seu código:", height=200)
+        profile_by_label = {profile.label: name for name, profile in OUTPUT_PROFILES.items()}
+        profile_labels = list(profile_by_label)
+        profile_label = st.radio(
+            "Tamanho da resposta",
+            profile_labels,
+            index=profile_labels.index(OUTPUT_PROFILES[OUTPUT_PROFILE].label),
+            horizontal=True
+        )
+        profile_name = profile_by_label[profile_label]
     
     # Seção de botões
     button_container = st.container()
     with button_container:
         col1, col2 = st.columns(2)
         
-        # Variáveis para controlar o estado da resposta
-        response = None
-        is_suggesting = False
+        # Ação solicitada pelo usuário nesta execução
+        action = None
         
         with col1:
             if st.button("Sugerir Código", type="primary", use_container_width=True):
                 if user_input:
-                    is_suggesting = True
-                    with st.spinner("Gerando sugestão..."):
-                        response = suggest_code(user_input)
+                    action = 'suggest'
                 else:
                     st.warning("Por favor, digite sua pergunta primeiro.")
                     
         with col2:
             if st.button("Corrigir Erros", type="primary", use_container_width=True):
                 if user_input:
-                    is_suggesting = False
-                    with st.spinner("Analisando código..."):
-                        response = correct_errors(user_input)
+                    action = 'correct'
                 else:
                     st.warning("Por favor, cole seu código primeiro.")
     
     # Seção de resposta
     response_container = st.container()
     with response_container:
-        if response:
-            st.markdown("## Resposta")
+        # Job de uma pergunta anterior ainda em andamento (o rerun interrompeu o acompanhamento)
+        active_job = job_manager.get(st.session_state.active_job) if st.session_state.active_job else None
+        if st.session_state.active_job and active_job is None:
+            st.session_state.active_job = None
+        
+        if action:
+            if active_job is not None:
+                # Nova pergunta: a geração anterior para, e os tokens dela são contabilizados
+                stop_job(active_job)
+            st.session_state.continuation = None
+            is_suggesting = action == 'suggest'
+            handler = suggest_code if is_suggesting else correct_errors
+            options = {
+                'use_cache': not bypass_cache,
+                'profile_name': profile_name,
+                'similar_action': similar_action
+            }
             if is_suggesting:
-                st.markdown("### 💡 Sugestão de Código")
+                options['fanout'] = fanout
             else:
-                st.markdown("### 🔍 Análise e Correção")
+                options['chunked'] = chunked
+                options['static_analysis'] = static_analysis
+            if chat_mode:
+                options['history'] = list(st.session_state.chat_history)
             
-            # Container para o conteúdo da resposta
-            with st.container():
-                st.markdown(response)
+            # O que foi pedido, para terminar a resposta num rerun se o job continuar rodando
+            st.session_state.pending_request = {
+                'action': action,
+                'user_input': user_input,
+                'chat_mode': chat_mode
+            }
+            response, view, segments = render_response(
+                action,
+                lambda placeholder: handler(user_input, placeholder, **options),
+                stream_enabled
+            )
+            store_response(action, user_input, response, view, segments, chat_mode)
+            if chat_mode and response and options['history'] and st.session_state.history_stats:
+                st.caption(format_history_stats(st.session_state.history_stats))
+            if response and not chat_mode and st.session_state.last_response['continuation']:
+                render_continue_button(st.empty())
+        elif active_job is not None and st.session_state.pending_request:
+            pending = st.session_state.pending_request
+            response, view, segments = render_response(
+                pending['action'],
+                lambda placeholder: resume_job(active_job, placeholder),
+                stream_enabled
+            )
+            store_response(pending['action'], pending['user_input'], response, view, segments, pending['chat_mode'])
+            if response and not pending['chat_mode'] and st.session_state.last_response['continuation']:
+                render_continue_button(st.empty())
+        elif st.session_state.last_response and not chat_mode:
+            last_response = st.session_state.last_response
+            continuation = last_response.get('continuation')
+            # O botão fica abaixo da resposta, mas o clique é lido antes de desenhá-la
+            content = st.container()
+            continue_slot = st.empty()
+            with content:
+                if continuation and render_continue_button(continue_slot):
+                    st.session_state.continuation = None
+                    st.session_state.pending_request = {
+                        'action': last_response['action'],
+                        'user_input': None,
+                        'chat_mode': False
+                    }
+                    response, view, segments = render_response(
+                        last_response['action'],
+                        lambda placeholder: continue_response(continuation, placeholder),
+                        stream_enabled
+                    )
+                    store_response(last_response['action'], None, response, view, segments, False)
+                    # O botão já desenhado nesta execução serve para a nova continuação, se houver
+                    if not (response and st.session_state.last_response['continuation']):
+                        continue_slot.empty()
+                else:
+                    render_response_title(last_response['action'])
+                    render_segments(last_response['segments'], last_response['key'])
     
     # Ajusta o layout para usar mais espaço
     st.markdown("""
@@ -700,6 +2065,38 @@ def main():
                 max-width: none !important;
             }
             
+            /* Blocos de código da resposta (format_code_block) */
+            .cascade-code-block {
+                margin: 1rem 0 !important;
+                border: 1px solid #e1e4e8 !important;
+                border-radius: 6px !important;
+                overflow: hidden !important;
+            }
+            
+            .cascade-code-header {
+                display: flex !important;
+                justify-content: space-between !important;
+                align-items: center !important;
+                padding: 0.4rem 1rem !important;
+                background-color: #f1f3f5 !important;
+                border-bottom: 1px solid #e1e4e8 !important;
+                font-size: 0.85em !important;
+            }
+            
+            .cascade-file-name {
+                font-weight: 600 !important;
+                margin-right: 0.75rem !important;
+            }
+            
+            .cascade-file-lang, .cascade-file-note {
+                color: #6c757d !important;
+            }
+            
+            .cascade-code-content pre {
+                margin: 0 !important;
+                border-radius: 0 !important;
+            }
+            
             /* Blocos de código */
             pre {
                 width: 100% !important;
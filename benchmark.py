@@ -0,0 +1,241 @@
+# Benchmark do app contra o servidor mock: latência, vazão e overhead do lado Python
+#
+# Uso:
+#   python benchmark.py                      # executa e compara com o baseline, se existir
+#   python benchmark.py --save-baseline      # grava os resultados como novo baseline
+#   python benchmark.py --tolerance 0.1      # falha com regressões acima de 10%
+#
+# Sai com código 1 em regressões, em cenários com erros ou com configuração diferente da do baseline.
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Silencia os avisos do Streamlit ao importar o app fora do `streamlit run`
+os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+
+from mock_server import add_config_arguments, config_from_args, MockGroqServer
+
+DEFAULT_BASELINE = os.path.join('benchmarks', 'baseline.json')
+
+# Métricas comparadas com o baseline: nome -> True se maior é pior
+REGRESSION_METRICS = {
+    'p50': True,
+    'p95': True,
+    'overhead_ms': True,
+    'throughput': False
+}
+
+# Folga absoluta por métrica, para valores pequenos demais para comparar só em %
+ABSOLUTE_SLACK = {
+    'p50': 0.005,
+    'p95': 0.010,
+    'overhead_ms': 2.0,
+    'throughput': 0.0
+}
+
+class NullPlaceholder:
+    """Substitui o st.empty() no caminho de streaming, sem renderizar nada."""
+
+    def markdown(self, *args, **kwargs):
+        pass
+
+def build_large_source(functions=200):
+    """Arquivo Python sintético grande o bastante para a análise em partes."""
+    blocks = ["import os\nimport sys\n"]
+    for index in range(functions):
+        blocks.append(
+            f"def funcao_{index}(valor):\n"
+            f"    \"\"\"Função de exemplo {index}.\"\"\"\n"
+            f"    total = 0\n"
+            f"    for item in range(valor):\n"
+            f"        total += item * {index}\n"
+            f"    return total\n"
+        )
+    return "\n".join(blocks)
+
+def percentile(values, q):
+    """Percentil q (0-100) por interpolação linear entre os valores ordenados."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def load_app(server):
+    """Importa o app e aponta o cliente, o breaker e a telemetria para o benchmark."""
+    import app
+    from streamlit import logger
+    from groq_client import get_client
+    from resilience import get_breaker
+    from telemetry import telemetry
+
+    app.client = get_client('mock', server.url, timeout=app.settings.HTTP_TIMEOUT)
+    app.breaker = get_breaker(server.url, app.settings.BREAKER_FAILURE_THRESHOLD, app.settings.BREAKER_RESET_TIMEOUT)
+    app.CACHE_ENABLED = False
+    # Fora do `streamlit run` o session_state não guarda nada; o aviso se repetiria a cada chamada
+    logger.set_log_level('error')
+    # Não mistura as chamadas do benchmark com o log de produção
+    telemetry.configure('')
+    return app
+
+def build_scenarios(app, concurrency):
+    """Cenários: (nome, concorrência, função(índice) que executa uma requisição)."""
+    large_source = build_large_source()
+    return [
+        ('suggest', 1, lambda index: app.suggest_code(
+            f"Crie uma função que some uma lista ({index})", use_cache=False)),
+        ('suggest_stream', 1, lambda index: app.suggest_code(
+            f"Crie uma função que some uma lista ({index})", NullPlaceholder(), use_cache=False)),
+        ('correct', 1, lambda index: app.correct_errors(
+            f"def soma(lista):\n    return sum(lista) + {index}\n", use_cache=False)),
+        ('correct_chunked', 1, lambda index: app.correct_errors(
+            large_source + f"\n# execução {index}\n", use_cache=False, chunked=True)),
+        (f'suggest_x{concurrency}', concurrency, lambda index: app.suggest_code(
+            f"Crie uma função que some uma lista ({index})", use_cache=False))
+    ]
+
+def run_scenario(server, concurrency, operation, requests):
+    """Executa a operação `requests` vezes e mede latência, vazão e overhead."""
+    before = server.stats.snapshot()
+    latencies = []
+    errors = 0
+
+    def timed(index):
+        started = time.perf_counter()
+        result = operation(index)
+        return time.perf_counter() - started, result is not None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, ok in pool.map(timed, range(requests)):
+            latencies.append(latency)
+            errors += 0 if ok else 1
+    elapsed = time.perf_counter() - started
+
+    after = server.stats.snapshot()
+    server_requests = after['requests'] - before['requests']
+    server_time = after['server_time'] - before['server_time']
+    overhead_ms = None
+    if server_requests == requests:
+        # Uma chamada ao servidor por requisição: o resto do tempo é do lado Python
+        overhead_ms = (sum(latencies) - server_time) / requests * 1000
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'server_requests': server_requests,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'throughput': requests / elapsed if elapsed > 0 else 0.0,
+        'overhead_ms': overhead_ms
+    }
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Lista as regressões em relação ao baseline."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_worse in REGRESSION_METRICS.items():
+            current = result.get(metric)
+            previous = reference.get(metric)
+            if current is None or previous is None:
+                continue
+            slack = ABSOLUTE_SLACK[metric]
+            if higher_is_worse and current > previous * (1 + tolerance) + slack:
+                regressions.append(f"{name}.{metric}: {current:.4f} > {previous:.4f} (+{tolerance:.0%})")
+            if not higher_is_worse and current < previous * (1 - tolerance) - slack:
+                regressions.append(f"{name}.{metric}: {current:.4f} < {previous:.4f} (-{tolerance:.0%})")
+    return regressions
+
+def format_results(results):
+    lines = [
+        f"{'cenário':<18} {'req':>4} {'conc':>4} {'erros':>5} {'p50':>8} {'p95':>8} {'p99':>8} "
+        f"{'req/s':>7} {'overhead':>9}"
+    ]
+    for name, result in results.items():
+        overhead = f"{result['overhead_ms']:.1f}ms" if result['overhead_ms'] is not None else "-"
+        lines.append(
+            f"{name:<18} {result['requests']:>4} {result['concurrency']:>4} {result['errors']:>5} "
+            f"{result['p50']:>7.3f}s {result['p95']:>7.3f}s {result['p99']:>7.3f}s "
+            f"{result['throughput']:>7.1f} {overhead:>9}"
+        )
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do app contra o servidor mock.")
+    parser.add_argument('--requests', '-n', type=int, default=20, help="Requisições por cenário")
+    parser.add_argument('--concurrency', '-c', type=int, default=8, help="Concorrência do cenário concorrente")
+    parser.add_argument('--scenario', action='append', help="Executa só os cenários indicados")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Arquivo de baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="Grava os resultados como baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Piora relativa aceita (0.25 = 25%%)")
+    parser.add_argument('--output', help="Grava os resultados em JSON")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    mock_config = config_from_args(args)
+    run_config = {'requests': args.requests, 'concurrency': args.concurrency, 'mock': mock_config._asdict()}
+
+    with MockGroqServer(mock_config) as server:
+        app = load_app(server)
+        results = {}
+        for name, concurrency, operation in build_scenarios(app, args.concurrency):
+            if args.scenario and name not in args.scenario:
+                continue
+            # Aquece conexões e caches de import antes de medir
+            operation(-1)
+            results[name] = run_scenario(server, concurrency, operation, args.requests)
+
+    print(format_results(results))
+    failed = [name for name, result in results.items() if result['errors']]
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump({'config': run_config, 'results': results}, handle, indent=2)
+
+    if failed:
+        # Requisições com erro deixam as latências sem sentido: não grava nem compara
+        print(f"Cenários com erros: {', '.join(failed)}.")
+        return 1
+
+    if args.save_baseline:
+        directory = os.path.dirname(args.baseline)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump({'config': run_config, 'results': results}, handle, indent=2)
+        print(f"Baseline gravado em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sem baseline para comparar (use --save-baseline).")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as handle:
+        baseline = json.load(handle)
+    if baseline.get('config') != run_config:
+        print(
+            "Configuração diferente da usada no baseline; rode com a mesma configuração "
+            "ou grave um novo baseline (--save-baseline)."
+        )
+        return 1
+
+    regressions = compare_with_baseline(results, baseline['results'], args.tolerance)
+    if regressions:
+        print("Regressões em relação ao baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("Sem regressões em relação ao baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+# Divisão de código-fonte em unidades de nível superior (funções, classes, blocos)
+import ast
+import hashlib
+import re
+import textwrap
+from collections import namedtuple
+
+# Unidade de código: linhas 1-based, inclusivas
+CodeUnit = namedtuple('CodeUnit', ['name', 'kind', 'start_line', 'end_line', 'text'])
+
+# Partes enviadas ao modelo: uma ou mais unidades consecutivas
+CodeChunk = namedtuple('CodeChunk', ['index', 'names', 'start_line', 'end_line', 'text'])
+
+# Tipos de unidade gerados pela divisão via AST (as demais estratégias geram 'block')
+_PYTHON_KINDS = ('function', 'class', 'method', 'statements')
+
+_IMPORT_PATTERN = re.compile(
+    r"^\s*(import\s|from\s+\S+\s+import\s|#include\s|using\s|require\s*\(|const\s+\w+\s*=\s*require\(|package\s|use\s)"
+)
+_SIGNATURE_PATTERN = re.compile(
+    r"^\s*(export\s+)?(public|private|protected|static|async|abstract|final|\s)*"
+    r"(function|class|interface|trait|enum|def|fn|func|struct|impl)\b"
+)
+
+def detect_language(source):
+    """Detecta a estratégia de divisão: 'python', 'brace' ou 'indent'."""
+    try:
+        ast.parse(source)
+        return 'python'
+    except (SyntaxError, ValueError):
+        pass
+    if source.count('{') >= 2 and source.count('{') >= source.count('}') // 2:
+        return 'brace'
+    return 'indent'
+
+def _make_unit(lines, name, kind, start, end):
+    return CodeUnit(name, kind, start, end, "\n".join(lines[start - 1:end]))
+
+def _node_span(node, lines, previous_end):
+    """Linhas ocupadas pelo nó, incluindo decoradores e comentários logo acima."""
+    start = node.lineno
+    if getattr(node, 'decorator_list', None):
+        start = min(decorator.lineno for decorator in node.decorator_list)
+    while start - 1 > previous_end and lines[start - 2].lstrip().startswith('#'):
+        start -= 1
+    end = getattr(node, 'end_lineno', None) or node.lineno
+    return start, end
+
+def _split_python_class(node, lines, start, end):
+    """Divide uma classe grande em cabeçalho (atributos) + um item por método."""
+    units = []
+    body_start = start
+    previous_end = start
+    for child in node.body:
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        child_start, child_end = _node_span(child, lines, previous_end)
+        if not units and child_start > body_start:
+            units.append(_make_unit(lines, node.name, 'class', body_start, child_start - 1))
+        units.append(_make_unit(lines, f"{node.name}.{child.name}", 'method', child_start, child_end))
+        previous_end = child_end
+    if not units:
+        return [_make_unit(lines, node.name, 'class', start, end)]
+    if previous_end < end:
+        last = units.pop()
+        units.append(_make_unit(lines, last.name, last.kind, last.start_line, end))
+    return units
+
+def split_python(source, class_split_lines=150):
+    """Divide código Python pelos nós de nível superior da AST.
+
+    Classes com mais de class_split_lines linhas são divididas por método.
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    units = []
+    pending = None  # grupo de instruções soltas (imports, constantes...)
+    previous_end = 0
+
+    for node in tree.body:
+        start, end = _node_span(node, lines, previous_end)
+        previous_end = end
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if pending:
+                units.append(_make_unit(lines, *pending))
+                pending = None
+            if isinstance(node, ast.ClassDef):
+                if end - start + 1 > class_split_lines:
+                    units.extend(_split_python_class(node, lines, start, end))
+                else:
+                    units.append(_make_unit(lines, node.name, 'class', start, end))
+            else:
+                units.append(_make_unit(lines, node.name, 'function', start, end))
+        elif pending:
+            pending = (pending[0], pending[1], pending[2], end)
+        else:
+            pending = ('<módulo>', 'statements', start, end)
+
+    if pending:
+        units.append(_make_unit(lines, *pending))
+    return units
+
+def _guess_name(line):
+    """Extrai um nome legível da primeira linha de uma unidade."""
+    match = re.search(
+        r"(?:function|class|interface|trait|enum|def|fn|func|struct|impl|const|let|var)\s+([\w$]+)", line
+    )
+    if match:
+        return match.group(1)
+    match = re.search(r"([\w$]+)\s*\(", line)
+    if match:
+        return match.group(1)
+    return line.strip()[:40] or '<bloco>'
+
+def _strip_strings(line):
+    """Remove literais de string e comentários de linha para contar chaves."""
+    line = re.sub(r'"(\\.|[^"\\])*"|\'(\\.|[^\'\\])*\'|`(\\.|[^`\\])*`', '""', line)
+    return re.sub(r"//.*$|#(?!include).*$", '', line)
+
+def split_braces(source):
+    """Divide linguagens com chaves (JS, PHP, Java, C...) pelos blocos de nível zero."""
+    lines = source.splitlines()
+    units = []
+    depth = 0
+    start = None
+    opened = False
+
+    for number, line in enumerate(lines, start=1):
+        clean = _strip_strings(line)
+        if start is None:
+            if not line.strip():
+                continue
+            start = number
+            opened = False
+        depth += clean.count('{') - clean.count('}')
+        if '{' in clean:
+            opened = True
+        # Unidade termina ao voltar ao nível zero depois de abrir um bloco,
+        # ou em instruções de uma linha no nível zero
+        if depth <= 0 and (opened or clean.rstrip().endswith(';')):
+            units.append(_make_unit(lines, _guess_name(lines[start - 1]), 'block', start, number))
+            start = None
+            depth = 0
+
+    if start is not None:
+        units.append(_make_unit(lines, _guess_name(lines[start - 1]), 'block', start, len(lines)))
+    return _merge_small_units(units, lines)
+
+def split_indent(source):
+    """Divide por indentação: cada linha sem recuo inicia uma nova unidade."""
+    lines = source.splitlines()
+    units = []
+    start = None
+
+    for number, line in enumerate(lines, start=1):
+        if line.strip() and not line[0].isspace() and not re.match(r"(end\b|[)\]}])", line):
+            if start is not None:
+                end = number - 1
+                while end > start and not lines[end - 1].strip():
+                    end -= 1
+                units.append(_make_unit(lines, _guess_name(lines[start - 1]), 'block', start, end))
+            start = number
+
+    if start is not None:
+        units.append(_make_unit(lines, _guess_name(lines[start - 1]), 'block', start, len(lines)))
+    return _merge_small_units(units, lines)
+
+def _merge_small_units(units, lines, min_lines=3):
+    """Junta unidades muito pequenas (imports, declarações) à seguinte."""
+    merged = []
+    carry = None
+    for unit in units:
+        if carry is not None:
+            unit = _make_unit(lines, unit.name, unit.kind, carry.start_line, unit.end_line)
+            carry = None
+        if unit.end_line - unit.start_line + 1 < min_lines and not _SIGNATURE_PATTERN.match(unit.text):
+            carry = unit
+            continue
+        merged.append(unit)
+    if carry is not None:
+        if merged:
+            last = merged.pop()
+            merged.append(_make_unit(lines, last.name, last.kind, last.start_line, carry.end_line))
+        else:
+            merged.append(carry)
+    return merged
+
+def split_units(source, language=None):
+    """Divide o código em unidades de nível superior conforme a linguagem."""
+    language = language or detect_language(source)
+    if language == 'python':
+        try:
+            return split_python(source)
+        except (SyntaxError, ValueError):
+            language = 'brace' if '{' in source else 'indent'
+    if language == 'brace':
+        return split_braces(source)
+    return split_indent(source)
+
+def build_shared_header(source, units, max_lines=80):
+    """Monta o contexto comum às partes: imports e assinaturas de todas as unidades."""
+    header = [line for line in source.splitlines() if _IMPORT_PATTERN.match(line)]
+    for unit in units:
+        if unit.kind == 'statements':
+            continue
+        first_line = next((line for line in unit.text.splitlines()
+                           if line.strip() and not line.lstrip().startswith('@')), '')
+        header.append(first_line.rstrip())
+    if len(header) > max_lines:
+        header = header[:max_lines] + [f"... (+{len(header) - max_lines} linhas)"]
+    return "\n".join(header)
+
+def group_units(units, max_tokens, estimate):
+    """Agrupa unidades consecutivas em partes de até max_tokens (estimados)."""
+    chunks = []
+    current = []
+    used = 0
+
+    def flush():
+        if current:
+            chunks.append(CodeChunk(
+                len(chunks) + 1,
+                [unit.name for unit in current],
+                current[0].start_line,
+                current[-1].end_line,
+                "\n\n".join(unit.text for unit in current)
+            ))
+
+    for unit in units:
+        cost = estimate(unit.text)
+        if current and used + cost > max_tokens:
+            flush()
+            current, used = [], 0
+        current.append(unit)
+        used += cost
+    flush()
+    return chunks
+
+def unit_fingerprint(unit):
+    """Identifica o conteúdo da unidade, independente da posição no arquivo.
+
+    Em Python, é o hash da AST sem números de linha (comentários, linhas em
+    branco e formatação não contam); nas demais linguagens, do texto sem
+    linhas em branco nem espaços no fim das linhas.
+    """
+    payload = None
+    if unit.kind in _PYTHON_KINDS:
+        try:
+            tree = ast.parse(textwrap.dedent(unit.text))
+            payload = ast.dump(tree, annotate_fields=False, include_attributes=False)
+        except (SyntaxError, ValueError):
+            pass
+    if payload is None:
+        payload = "\n".join(line.rstrip() for line in unit.text.splitlines() if line.strip())
+    return hashlib.sha256(f"{unit.kind}\0{payload}".encode('utf-8')).hexdigest()[:16]
+
+def plan_incremental(units, fingerprints, previous, max_tokens, estimate):
+    """Divide as unidades entre grupos já analisados e grupos novos.
+
+    previous são os grupos de análises anteriores (tuplas de fingerprints,
+    os mais recentes primeiro); um grupo é reaproveitado quando todas as suas
+    unidades continuam no arquivo sem mudanças. As unidades restantes são
+    agrupadas com group_units, sem juntar trechos separados por unidades
+    reaproveitadas. Retorna [(índices das unidades, grupo anterior ou None)]
+    na ordem do arquivo.
+    """
+    free = {}
+    for index, fingerprint in enumerate(fingerprints):
+        free.setdefault(fingerprint, []).append(index)
+
+    groups = []
+    for group in previous:
+        if not group:
+            continue
+        needed = {}
+        for fingerprint in group:
+            needed[fingerprint] = needed.get(fingerprint, 0) + 1
+        if any(len(free.get(fingerprint, ())) < count for fingerprint, count in needed.items()):
+            continue
+        groups.append((sorted(free[fingerprint].pop(0) for fingerprint in group), tuple(group)))
+
+    taken = {index for indices, _ in groups for index in indices}
+    run = []
+    for index in range(len(units) + 1):
+        if index < len(units) and index not in taken:
+            run.append(index)
+            continue
+        position = 0
+        for chunk in group_units([units[item] for item in run], max_tokens, estimate):
+            groups.append((run[position:position + len(chunk.names)], None))
+            position += len(chunk.names)
+        run = []
+    return sorted(groups, key=lambda item: item[0][0])
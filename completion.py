@@ -0,0 +1,253 @@
+# Montagem de prompts e chamadas ao modelo, sem dependência da interface
+from collections import namedtuple
+from prompts import build_messages, get_output_profile, get_prompt, prompt_fingerprint
+from resilience import call_with_retry, call_with_retry_async, get_breaker, RetryPolicy
+from hedging import hedger
+from model_router import model_router, parse_model_tiers
+from response_cache import make_cache_key
+from token_estimator import (
+    estimator, fit_max_tokens, get_context_window, trim_to_tokens, InputTooLargeError
+)
+
+# Prompt pronto para envio, já ajustado à janela de contexto do modelo
+PreparedPrompt = namedtuple('PreparedPrompt', [
+    'template', 'profile', 'messages', 'max_tokens', 'prompt_estimate', 'trimmed', 'model'
+])
+
+def usage_to_dict(usage):
+    """Converte o objeto usage da API em dicionário."""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        get = usage.get
+    else:
+        get = lambda key, default=None: getattr(usage, key, default)
+    prompt_tokens = get('prompt_tokens', 0) or 0
+    completion_tokens = get('completion_tokens', 0) or 0
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': get('total_tokens', 0) or prompt_tokens + completion_tokens
+    }
+
+def extract_stream_usage(chunk):
+    """Extrai o usage que a Groq envia no último chunk do stream (campo x_groq)."""
+    x_groq = getattr(chunk, 'x_groq', None)
+    if isinstance(x_groq, dict):
+        return x_groq.get('usage')
+    return getattr(x_groq, 'usage', None)
+
+def profile_max_tokens(settings, profile_name):
+    """Orçamento de max_tokens configurado para o perfil de saída."""
+    return getattr(settings, f"MAX_TOKENS_{profile_name.upper()}", settings.MAX_TOKENS_CODE)
+
+def prompt_version(settings, mode):
+    """Versão de prompt configurada para o modo ('' = versão padrão)."""
+    return getattr(settings, f"PROMPT_VERSION_{mode.upper()}", '')
+
+def retry_policy(settings):
+    """Política de retentativas e prazos configurada."""
+    return RetryPolicy(
+        max_attempts=max(1, settings.RETRY_MAX_ATTEMPTS),
+        base_delay=settings.RETRY_BASE_DELAY,
+        max_delay=settings.RETRY_MAX_DELAY,
+        attempt_timeout=settings.REQUEST_ATTEMPT_TIMEOUT,
+        deadline=settings.REQUEST_DEADLINE
+    )
+
+def upstream_breaker(settings):
+    """Circuit breaker do endpoint configurado, compartilhado pelo processo."""
+    return get_breaker(
+        settings.GROQ_BASE_URL or 'groq',
+        settings.BREAKER_FAILURE_THRESHOLD,
+        settings.BREAKER_RESET_TIMEOUT
+    )
+
+def configure_router(settings):
+    """Aplica GROQ_MODELS e os limites do roteamento ao roteador do processo."""
+    model_router.configure(
+        parse_model_tiers(settings.GROQ_MODELS),
+        alpha=settings.ROUTER_EWMA_ALPHA,
+        max_error_rate=settings.ROUTER_MAX_ERROR_RATE,
+        cooldown=settings.ROUTER_ERROR_COOLDOWN,
+        small_input_tokens=settings.ROUTER_SMALL_INPUT_TOKENS,
+        large_input_tokens=settings.ROUTER_LARGE_INPUT_TOKENS
+    )
+
+def configure_hedger(settings):
+    """Aplica as configurações de hedge (HEDGE_*) ao hedger do processo."""
+    hedger.configure(
+        enabled=settings.HEDGE_ENABLED,
+        modes=[mode.strip() for mode in settings.HEDGE_MODES.split(',') if mode.strip()],
+        percentile=settings.HEDGE_PERCENTILE,
+        min_delay=settings.HEDGE_MIN_DELAY,
+        min_samples=settings.HEDGE_MIN_SAMPLES,
+        max_per_minute=settings.HEDGE_MAX_PER_MINUTE,
+        fallback_model=settings.HEDGE_MODEL.strip()
+    )
+
+def route_model(settings, mode, user_input, profile_name=None, extra_tokens=0, streaming=False):
+    """Escolhe o modelo da requisição (RouteDecision) pelo modo, tamanho da entrada e perfil.
+
+    extra_tokens soma ao tamanho da entrada o que mais vai no prompt (ex.: histórico da conversa);
+    streaming diz se a chamada será em streaming (compara o 1º token em vez da latência total).
+    """
+    input_tokens = estimator.estimate(user_input) + extra_tokens
+    profile = get_output_profile(profile_name or settings.OUTPUT_PROFILE)
+    return model_router.route(
+        mode,
+        input_tokens,
+        profile.name,
+        settings.GROQ_MODEL,
+        min_context=input_tokens + settings.MIN_COMPLETION_TOKENS + settings.CONTEXT_SAFETY_MARGIN,
+        streaming=streaming
+    )
+
+def route_key(route):
+    """Modelo nas chaves de cache, coalescência e entradas parecidas.
+
+    Com roteamento, o nível exigido: ele só depende da tarefa, enquanto o
+    modelo escolhido muda com a latência observada. Sem roteamento, o modelo.
+    """
+    return route.tier or route.model
+
+def build_cache_key(template, model, temperature, profile_name, user_input):
+    """Monta a chave do cache para o template, o modelo e a entrada informados."""
+    return make_cache_key(
+        template.mode,
+        model,
+        temperature,
+        prompt_fingerprint(template),
+        profile_name,
+        user_input
+    )
+
+def build_unit_analysis_key(template, model, temperature, profile_name, fingerprints):
+    """Chave da análise de um grupo de unidades guardada na sessão: só o conteúdo delas, não as linhas.
+
+    O cabeçalho (imports e assinaturas do arquivo todo) fica fora: editar
+    outra função não invalida o grupo. Só serve ao reaproveitamento dentro da
+    sessão, que mostra as linhas da versão analisada; o cache compartilhado
+    usa a chave do prompt completo.
+    """
+    return build_cache_key(template, model, temperature, profile_name, "unidades:" + ",".join(fingerprints))
+
+def build_similarity_namespace(template, model, temperature, profile_name):
+    """Grupo do índice de entradas parecidas: só se compara entradas do mesmo modo, prompt e perfil."""
+    return make_cache_key(template.mode, model, temperature, prompt_fingerprint(template), profile_name)[:16]
+
+def normalize_input(text):
+    """Forma canônica da entrada, usada na chave da coalescência.
+
+    Unifica as quebras de linha e remove espaços no fim das linhas e linhas
+    vazias nas pontas: entradas que só diferem nisso recebem a mesma resposta.
+    """
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    return "\n".join(lines).strip('\n')
+
+def build_flight_key(template, model, temperature, profile_name, user_input):
+    """Chave da coalescência: como a do cache, mas sobre a entrada normalizada."""
+    return build_cache_key(template, model, temperature, profile_name, normalize_input(user_input))
+
+def prepare_prompt(settings, mode, user_input, profile_name=None, model=None, history=None, system=None, **fields):
+    """Monta as mensagens do modo e ajusta max_tokens ao espaço livre do contexto.
+
+    Entradas que não cabem são rejeitadas (InputTooLargeError) ou, com
+    INPUT_OVERFLOW_POLICY=trim, reduzidas mantendo o início e o fim. history
+    são as mensagens anteriores da conversa (conversation.build_history_messages);
+    system, se dado, é a mensagem de sistema no lugar da do template.
+    """
+    model = model or settings.GROQ_MODEL
+    template = get_prompt(mode, prompt_version(settings, mode))
+    profile = get_output_profile(profile_name or settings.OUTPUT_PROFILE)
+    requested_max_tokens = profile_max_tokens(settings, profile.name)
+    context_window = get_context_window(model, settings.MODEL_CONTEXT_WINDOW)
+
+    messages = build_messages(template, user_input, profile, history, system, **fields)
+    prompt_estimate = estimator.estimate_messages(messages)
+    max_tokens = fit_max_tokens(
+        prompt_estimate,
+        requested_max_tokens,
+        context_window,
+        settings.CONTEXT_SAFETY_MARGIN,
+        settings.MIN_COMPLETION_TOKENS
+    )
+    if max_tokens is not None:
+        return PreparedPrompt(template, profile, messages, max_tokens, prompt_estimate, False, model)
+
+    if settings.INPUT_OVERFLOW_POLICY != 'trim':
+        raise InputTooLargeError(
+            f"A entrada tem ~{prompt_estimate:,} tokens e não cabe no contexto de "
+            f"{context_window:,} tokens do modelo {model}. Reduza o texto enviado."
+        )
+
+    # Reduz a entrada deixando espaço para uma resposta útil
+    fixed_tokens = prompt_estimate - estimator.estimate(user_input)
+    reserved = max(settings.MIN_COMPLETION_TOKENS, min(requested_max_tokens, context_window // 4))
+    input_budget = max(context_window - fixed_tokens - settings.CONTEXT_SAFETY_MARGIN - reserved, 0)
+    trimmed_input = trim_to_tokens(user_input, input_budget)
+
+    messages = build_messages(template, trimmed_input, profile, history, system, **fields)
+    prompt_estimate = estimator.estimate_messages(messages)
+    max_tokens = fit_max_tokens(
+        prompt_estimate,
+        requested_max_tokens,
+        context_window,
+        settings.CONTEXT_SAFETY_MARGIN,
+        settings.MIN_COMPLETION_TOKENS
+    ) or settings.MIN_COMPLETION_TOKENS
+    return PreparedPrompt(template, profile, messages, max_tokens, prompt_estimate, True, model)
+
+def create_completion(client, policy=None, breaker=None, **params):
+    """Chama chat.completions.create; com policy, aplica retentativas, prazos e o breaker.
+
+    Em streaming, só a abertura do stream é repetida: erros depois do primeiro
+    chunk chegam ao chamador.
+    """
+    if policy is None:
+        return client.chat.completions.create(**params)
+    return call_with_retry(
+        lambda timeout: client.chat.completions.create(timeout=timeout, **params),
+        policy,
+        breaker
+    )
+
+def complete(client, messages, model, temperature, max_tokens, policy=None, breaker=None):
+    """Executa a completion aguardando a resposta completa. Retorna (texto, usage)."""
+    response = create_completion(
+        client,
+        policy,
+        breaker,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stop=None
+    )
+
+    return response.choices[0].message.content, usage_to_dict(response.usage)
+
+async def create_completion_async(client, policy=None, breaker=None, **params):
+    """Versão assíncrona de create_completion, para um AsyncClient."""
+    if policy is None:
+        return await client.chat.completions.create(**params)
+    return await call_with_retry_async(
+        lambda timeout: client.chat.completions.create(timeout=timeout, **params),
+        policy,
+        breaker
+    )
+
+async def complete_async(client, messages, model, temperature, max_tokens, policy=None, breaker=None):
+    """Versão assíncrona de complete. Retorna (texto, usage)."""
+    response = await create_completion_async(
+        client,
+        policy,
+        breaker,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stop=None
+    )
+
+    return response.choices[0].message.content, usage_to_dict(response.usage)
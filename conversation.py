@@ -0,0 +1,138 @@
+# Modo conversa: turnos guardados na sessão e histórico montado dentro de um orçamento de tokens
+import re
+import time
+import uuid
+
+from token_estimator import MESSAGE_OVERHEAD_TOKENS
+
+_CODE_BLOCK_PATTERN = re.compile(r"```([^\n`]*)\n(.*?)```", re.DOTALL)
+_DEFINITION_PATTERN = re.compile(
+    r"^\s*(?:export\s+)?(?:async\s+)?(?:def|class|function|func|fn|interface|struct)\s+([A-Za-z_][\w]*)",
+    re.MULTILINE
+)
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+)$", re.MULTILINE)
+
+ROLE_LABELS = {'user': 'Usuário', 'assistant': 'Assistente'}
+
+def extract_code_blocks(text):
+    """Blocos de código markdown da resposta: lista de (linguagem, código)."""
+    return [(match.group(1).strip(), match.group(2)) for match in _CODE_BLOCK_PATTERN.finditer(text or '')]
+
+def code_block_label(index, language, code):
+    """Rótulo curto de um bloco de código, para a interface e para os resumos."""
+    names = _DEFINITION_PATTERN.findall(code)
+    lines = code.count('\n') + (0 if code.endswith('\n') else 1)
+    description = f"{language or 'código'}, {lines} linhas"
+    if names:
+        description += ": " + ", ".join(names[:3]) + ("..." if len(names) > 3 else "")
+    return f"Bloco {index + 1} ({description})"
+
+def _first_sentence(text, max_chars):
+    """Primeira frase de texto corrido, ignorando títulos, listas e código."""
+    prose = _CODE_BLOCK_PATTERN.sub(' ', text)
+    for line in prose.splitlines():
+        line = line.strip().lstrip('-*>0123456789. ').strip()
+        if len(line) < 3 or line.startswith(('#', '|', '`')):
+            continue
+        sentence = re.split(r"(?<=[.!?])\s", line, maxsplit=1)[0]
+        return sentence[:max_chars]
+    return ''
+
+def summarize_turn(role, content, max_chars=300):
+    """Resumo local (sem chamar o modelo) de um turno, usado quando ele sai da janela recente.
+
+    Guarda o início do texto, os títulos da resposta e os nomes definidos nos
+    blocos de código: o suficiente para referências como "a função anterior".
+    """
+    parts = []
+    sentence = _first_sentence(content, max_chars // 2)
+    if sentence:
+        parts.append(sentence.rstrip('.:;'))
+    if role == 'assistant':
+        headings = _HEADING_PATTERN.findall(content)
+        if headings:
+            parts.append("Seções: " + "; ".join(heading.strip() for heading in headings[:4]))
+    blocks = extract_code_blocks(content)
+    names = _DEFINITION_PATTERN.findall(content if not blocks else "\n".join(code for _, code in blocks))
+    if blocks:
+        parts.append(f"{len(blocks)} bloco(s) de código")
+    if names:
+        parts.append("Define: " + ", ".join(dict.fromkeys(names[:8])))
+    summary = ". ".join(parts) or content.strip()[:max_chars]
+    return summary[:max_chars]
+
+def new_turn(role, content, mode=None):
+    """Turno da conversa, no formato guardado em st.session_state.chat_history."""
+    return {
+        'id': uuid.uuid4().hex[:8],
+        'role': role,
+        'mode': mode,
+        'content': content,
+        'summary': summarize_turn(role, content),
+        'accepted': [],
+        'timestamp': time.time()
+    }
+
+def render_turn(turn):
+    """Conteúdo do turno enviado ao modelo, sem os blocos de código já aceitos pelo usuário."""
+    accepted = set(turn.get('accepted') or ())
+    if not accepted:
+        return turn['content']
+    index = -1
+
+    def replace(match):
+        nonlocal index
+        index += 1
+        if index not in accepted:
+            return match.group(0)
+        label = code_block_label(index, match.group(1).strip(), match.group(2))
+        return f"[{label} — já aplicado pelo usuário; omitido]"
+
+    return _CODE_BLOCK_PATTERN.sub(replace, turn['content'])
+
+def build_history_messages(history, budget, recent_turns, estimate):
+    """Mensagens do histórico dentro de `budget` tokens. Retorna (mensagens, estatísticas).
+
+    Os turnos mais recentes (até recent_turns) vão na íntegra; os anteriores
+    entram como resumos em uma mensagem de sistema; o que não couber é
+    descartado, do mais antigo para o mais novo. O tamanho do prompt fica
+    limitado por `budget`, qualquer que seja a duração da conversa.
+    """
+    remaining = budget
+    verbatim = []
+    summaries = []
+    dropped = 0
+    # Cabeçalho da mensagem de resumos, reservado na primeira vez que for usado
+    summary_header = "Resumo dos turnos anteriores da conversa (mais antigos primeiro):"
+    header_cost = estimate(summary_header) + MESSAGE_OVERHEAD_TOKENS
+
+    for position, turn in enumerate(reversed(history)):
+        if not summaries and position < recent_turns:
+            content = render_turn(turn)
+            cost = estimate(content) + MESSAGE_OVERHEAD_TOKENS
+            if cost <= remaining:
+                verbatim.append({'role': turn['role'], 'content': content})
+                remaining -= cost
+                continue
+        line = f"- {ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['summary']}"
+        cost = estimate(line) + 1 + (header_cost if not summaries else 0)
+        if cost > remaining:
+            dropped = len(history) - position
+            break
+        summaries.append(line)
+        remaining -= cost
+
+    messages = []
+    if summaries:
+        messages.append({
+            'role': 'system',
+            'content': summary_header + "\n" + "\n".join(reversed(summaries))
+        })
+    messages.extend(reversed(verbatim))
+    stats = {
+        'verbatim': len(verbatim),
+        'summarized': len(summaries),
+        'dropped': dropped,
+        'tokens': budget - remaining
+    }
+    return messages, stats
@@ -0,0 +1,95 @@
+# Plano de arquivos da geração em paralelo: manifesto JSON do modelo e montagem da resposta por arquivo
+import json
+import re
+from collections import namedtuple
+
+from response_segments import split_segments
+
+# Arquivo do plano: caminho, linguagem do bloco de código e o que ele contém
+FileSpec = namedtuple('FileSpec', ['path', 'language', 'description'])
+
+# Manifesto: visão geral da solução e os arquivos, na ordem do plano
+Manifest = namedtuple('Manifest', ['summary', 'files'])
+
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+def _json_object(text):
+    """Primeiro valor JSON da resposta (com ou sem cerca ```json), ou None."""
+    fenced = _JSON_FENCE.search(text)
+    candidate = fenced.group(1) if fenced else text
+    start = min((index for index in (candidate.find('{'), candidate.find('[')) if index >= 0), default=-1)
+    if start < 0:
+        return None
+    try:
+        value, _ = json.JSONDecoder().raw_decode(candidate[start:])
+    except ValueError:
+        return None
+    return value
+
+def _file_spec(item):
+    if isinstance(item, str):
+        item = {'path': item}
+    if not isinstance(item, dict):
+        return None
+    path = str(item.get('path') or '').strip().strip('`')
+    while path.startswith('./'):
+        path = path[2:]
+    if not path or path.endswith('/'):
+        return None
+    language = str(item.get('language') or '').strip().lower()
+    if not language and '.' in path:
+        language = path.rsplit('.', 1)[-1].lower()
+    return FileSpec(path, language, str(item.get('description') or '').strip())
+
+def parse_manifest(text, max_files=8):
+    """Manifesto a partir da resposta do modelo, ou None se ela não trouxer um plano válido.
+
+    Aceita {"summary": ..., "files": [...]} ou só a lista de arquivos; caminhos
+    repetidos ficam uma vez e o plano é limitado a max_files arquivos.
+    """
+    value = _json_object(text)
+    if isinstance(value, list):
+        value = {'files': value}
+    if not isinstance(value, dict) or not isinstance(value.get('files'), list):
+        return None
+    files = []
+    paths = set()
+    for item in value['files']:
+        spec = _file_spec(item)
+        if spec is None or spec.path in paths:
+            continue
+        paths.add(spec.path)
+        files.append(spec)
+    if not files:
+        return None
+    return Manifest(str(value.get('summary') or '').strip(), files[:max_files])
+
+def format_manifest(manifest):
+    """Plano em texto para o prompt de cada arquivo (o mesmo em todas as chamadas)."""
+    lines = [manifest.summary] if manifest.summary else []
+    lines.extend(
+        f"- {spec.path}" + (f": {spec.description}" if spec.description else "")
+        for spec in manifest.files
+    )
+    return "\n".join(lines)
+
+def file_code(text, spec):
+    """Código do arquivo gerado: o primeiro bloco da resposta (ou ela toda, sem cercas). Retorna (código, linguagem)."""
+    for segment in split_segments(text):
+        if segment.kind == 'code':
+            return segment.content.rstrip('\n'), segment.language or spec.language
+    return text.strip(), spec.language
+
+def format_file_section(spec, text=None, error=None):
+    """Seção de um arquivo na resposta: título, descrição e o bloco de código com o caminho."""
+    section = [f"#### {spec.path}"]
+    if spec.description:
+        section.append(f"_{spec.description}_")
+    if error is not None:
+        section.append(f"⚠️ Erro ao gerar este arquivo: {error}")
+        return "\n\n".join(section)
+    code, language = file_code(text, spec)
+    runs = re.findall(r"`{3,}", code)
+    fence = '`' * max([3] + [len(run) + 1 for run in runs])
+    section.append(f"{fence}{language}:{spec.path}\n{code}\n{fence}")
+    return "\n\n".join(section)
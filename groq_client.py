@@ -0,0 +1,67 @@
+# Cliente Groq compartilhado pelo processo
+import threading
+import httpx
+from groq import AsyncClient, Client
+
+_clients = {}
+_async_clients = {}
+_lock = threading.Lock()
+
+def get_client(api_key, base_url=None, timeout=60.0, max_connections=100,
+               max_keepalive_connections=20, keepalive_expiry=30.0):
+    """Retorna um cliente Groq reutilizável, com pool de conexões keep-alive.
+
+    Clientes são criados uma única vez por combinação de parâmetros e
+    compartilhados por todas as sessões e threads do processo. As retentativas
+    internas do SDK ficam desligadas: quem repete as chamadas é resilience.py.
+    """
+    key = (api_key, base_url, timeout, max_connections, max_keepalive_connections, keepalive_expiry)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry
+                ),
+                follow_redirects=True
+            )
+            client = Client(
+                api_key=api_key,
+                base_url=base_url or None,
+                http_client=http_client,
+                max_retries=0
+            )
+            _clients[key] = client
+        return client
+
+def get_async_client(api_key, base_url=None, timeout=60.0, max_connections=100,
+                     max_keepalive_connections=20, keepalive_expiry=30.0):
+    """Versão assíncrona de get_client, para a API HTTP (api_server.py).
+
+    O pool do httpx.AsyncClient pertence ao event loop em que é usado; o
+    cliente deve ser criado e usado dentro de um único loop.
+    """
+    key = (api_key, base_url, timeout, max_connections, max_keepalive_connections, keepalive_expiry)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry
+                ),
+                follow_redirects=True
+            )
+            client = AsyncClient(
+                api_key=api_key,
+                base_url=base_url or None,
+                http_client=http_client,
+                max_retries=0
+            )
+            _async_clients[key] = client
+        return client
@@ -0,0 +1,284 @@
+# Requisições em streaming com hedge: um segundo pedido quando o primeiro token demora
+import threading
+import time
+from collections import deque
+
+from rate_limit import TokenBucket
+
+def _percentile(values, q):
+    """Percentil q (0-100) de uma lista de valores, por interpolação linear."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class HedgeCancelled(Exception):
+    """O job foi parado enquanto os pedidos esperavam o primeiro token; todos já foram fechados."""
+
+def _has_content(chunk):
+    return bool(chunk.choices) and bool(getattr(chunk.choices[0].delta, 'content', None))
+
+class _Attempt:
+    """Um dos pedidos da corrida: abre o stream numa thread e lê até o primeiro token.
+
+    Os chunks lidos até lá ficam em `buffer`; o restante do stream é consumido
+    por quem vencer a corrida, na thread de quem chamou.
+    """
+
+    def __init__(self, label, model, open_stream, changed):
+        self.label = label
+        self.model = model
+        self.open_stream = open_stream
+        self.changed = changed
+        self.started = time.perf_counter()
+        self.ttft = None
+        self.stream = None
+        self.iterator = None
+        self.buffer = []
+        self.error = None
+        self.done = False
+        self.cancelled = False
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"hedge-{self.label}", daemon=True).start()
+
+    def _run(self):
+        try:
+            stream = self.open_stream(self.model)
+        except Exception as e:
+            self._finish(error=e)
+            return
+        with self.changed:
+            if self.cancelled:
+                stream.close()
+                return
+            self.stream = stream
+        try:
+            iterator = iter(stream)
+            for chunk in iterator:
+                self.buffer.append(chunk)
+                if _has_content(chunk):
+                    break
+            self.iterator = iterator
+        except Exception as e:
+            self._finish(error=e)
+            return
+        self._finish()
+
+    def _finish(self, error=None):
+        with self.changed:
+            self.ttft = time.perf_counter() - self.started
+            self.error = None if self.cancelled else error
+            self.done = True
+            self.changed.notify_all()
+
+    @property
+    def ready(self):
+        """Começou a transmitir (ou terminou sem conteúdo) sem erro."""
+        return self.done and self.error is None and not self.cancelled
+
+    def cancel(self):
+        """Fecha a conexão: o servidor para de gerar e a thread sai da leitura. Acorda quem espera a corrida."""
+        with self.changed:
+            self.cancelled = True
+            stream = self.stream
+            self.changed.notify_all()
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    # Registrado no job como um stream: job.cancel() fecha o pedido
+    close = cancel
+
+class HedgedStream:
+    """Stream do pedido vencedor: repete os chunks já lidos e segue com o restante."""
+
+    def __init__(self, attempt, hedged):
+        self.model = attempt.model
+        self.winner = attempt.label
+        self.hedged = hedged
+        self._attempt = attempt
+
+    def __iter__(self):
+        yield from self._attempt.buffer
+        if self._attempt.iterator is not None:
+            yield from self._attempt.iterator
+
+    def close(self):
+        if self._attempt.stream is not None:
+            self._attempt.stream.close()
+
+class Hedger:
+    """Envia um segundo pedido quando o primeiro token demora mais que o normal.
+
+    O atraso é o percentil `percentile` do tempo até o primeiro token das
+    últimas `window` chamadas do mesmo modo e modelo (nunca menor que
+    min_delay). Passado esse tempo sem token, sai um segundo pedido (ao mesmo
+    modelo ou a fallback_model); o primeiro que começar a transmitir vence e o
+    outro é fechado na hora. Os hedges são limitados a max_per_minute no
+    processo; sem min_samples medições, não há hedge.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.modes = ()
+        self.percentile = 95.0
+        self.min_delay = 0.25
+        self.min_samples = 20
+        self.fallback_model = ''
+        self.max_per_minute = 0
+        self._budget = None
+        self._samples = {}
+        self._window = 200
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.sent = 0
+        self.won = 0
+        self.denied = 0
+
+    def configure(self, enabled=False, modes=('suggest',), percentile=95.0, min_delay=0.25, min_samples=20,
+                  max_per_minute=10, fallback_model='', window=200):
+        """Aplica as configurações; o orçamento só é recriado quando max_per_minute muda."""
+        with self._lock:
+            self.enabled = enabled and max_per_minute > 0
+            self.modes = tuple(modes)
+            self.percentile = min(max(percentile, 0.0), 100.0)
+            self.min_delay = min_delay
+            self.min_samples = max(min_samples, 1)
+            self.fallback_model = fallback_model
+            if window != self._window:
+                self._samples = {key: deque(values, maxlen=window) for key, values in self._samples.items()}
+                self._window = window
+            if max_per_minute != self.max_per_minute:
+                self.max_per_minute = max_per_minute
+                self._budget = TokenBucket(max_per_minute, max_per_minute / 60.0) if max_per_minute > 0 else None
+
+    def applies_to(self, mode):
+        """O hedge vale para o modo (ex.: 'suggest' cobre também 'suggest_followup')."""
+        return self.enabled and any(mode == name or mode.startswith(f"{name}_") for name in self.modes)
+
+    def observe(self, mode, model, ttft):
+        with self._lock:
+            samples = self._samples.get((mode, model))
+            if samples is None:
+                samples = self._samples[(mode, model)] = deque(maxlen=self._window)
+            samples.append(ttft)
+
+    def delay(self, mode, model):
+        """Espera antes do hedge, em segundos (None enquanto faltam medições)."""
+        with self._lock:
+            samples = list(self._samples.get((mode, model), ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(_percentile(samples, self.percentile), self.min_delay)
+
+    def _acquire(self):
+        """Consome uma ficha do orçamento de hedges por minuto."""
+        with self._lock:
+            if self._budget is None:
+                return False
+            self._budget.refill(time.monotonic())
+            if self._budget.tokens < 1:
+                self.denied += 1
+                return False
+            self._budget.tokens -= 1
+            self.sent += 1
+            return True
+
+    def open(self, open_stream, mode, model, job=None):
+        """Abre o stream com open_stream(model), com hedge se o modo pedir. Retorna (stream, modelo).
+
+        open_stream deve fazer a chamada completa (retentativas, breaker); ela
+        pode rodar em outra thread. Se os dois pedidos falharem, o erro do
+        primeiro é repassado. Com job, cada pedido é registrado nele assim que
+        sai (job.attach): parar o job fecha os dois e encerra a espera pelo
+        primeiro token na hora, com HedgeCancelled.
+        """
+        if not self.applies_to(mode):
+            return open_stream(model), model
+        with self._lock:
+            self.requests += 1
+        delay = self.delay(mode, model)
+        changed = threading.Condition()
+        attempts = []
+
+        def stopped():
+            return job is not None and job.cancelled
+
+        def launch(label, attempt_model):
+            attempt = _Attempt(label, attempt_model, open_stream, changed)
+            attempts.append(attempt)
+            if job is not None:
+                job.attach(attempt)
+            attempt.start()
+            return attempt
+
+        try:
+            primary = launch('primary', model)
+            with changed:
+                changed.wait_for(lambda: primary.done or stopped(), timeout=delay)
+            if not primary.done and not stopped() and self._acquire():
+                launch('hedge', self.fallback_model or model)
+            with changed:
+                changed.wait_for(
+                    lambda: stopped() or any(item.ready for item in attempts) or all(item.done for item in attempts)
+                )
+                winner = None if stopped() else next((item for item in attempts if item.ready), None)
+        except BaseException:
+            for item in attempts:
+                item.cancel()
+            raise
+
+        for item in attempts:
+            if item is not winner:
+                item.cancel()
+        if stopped():
+            raise HedgeCancelled("job parado antes do primeiro token")
+        if winner is None:
+            raise primary.error
+
+        # Mede o primeiro token do pedido original; se ele perdeu, o tempo até
+        # o cancelamento é um limite inferior e mantém a cauda na amostra
+        if primary.ready:
+            self.observe(mode, model, primary.ttft)
+        elif not primary.done:
+            self.observe(mode, model, time.perf_counter() - primary.started)
+        if winner.label == 'hedge':
+            with self._lock:
+                self.won += 1
+        return HedgedStream(winner, hedged=len(attempts) > 1), winner.model
+
+    def snapshot(self):
+        with self._lock:
+            tokens = None
+            if self._budget is not None:
+                self._budget.refill(time.monotonic())
+                tokens = int(self._budget.tokens)
+            return {
+                'enabled': self.enabled,
+                'requests': self.requests,
+                'sent': self.sent,
+                'won': self.won,
+                'denied': self.denied,
+                'budget': tokens
+            }
+
+    def render_prometheus(self):
+        """Contadores no formato texto do Prometheus."""
+        stats = self.snapshot()
+        return "\n".join([
+            "# HELP assistant_hedge_total Pedidos de hedge por resultado (sent, won, denied pelo orçamento).",
+            "# TYPE assistant_hedge_total counter",
+            f'assistant_hedge_total{{result="sent"}} {stats["sent"]}',
+            f'assistant_hedge_total{{result="won"}} {stats["won"]}',
+            f'assistant_hedge_total{{result="denied"}} {stats["denied"]}',
+            "# HELP assistant_hedge_eligible_total Chamadas em streaming elegíveis a hedge.",
+            "# TYPE assistant_hedge_eligible_total counter",
+            f"assistant_hedge_eligible_total {stats['requests']}"
+        ]) + "\n"
+
+# Hedger único do processo: o orçamento por minuto vale para todas as sessões
+hedger = Hedger()
@@ -0,0 +1,203 @@
+# Compactação da entrada antes do prompt: remove o que não muda o significado e mapeia as linhas
+import re
+from collections import namedtuple
+
+from static_checks import guess_language, LANGUAGE_HINTS
+
+# Entrada compactada: line_map[i] é a linha original da linha i+1 do texto (None se a numeração não mudou);
+# removed conta, por tipo, as linhas afetadas
+Compaction = namedtuple('Compaction', ['text', 'language', 'line_map', 'removed'])
+
+COMPACTION_LABELS = {
+    'license': 'cabeçalho de licença',
+    'banner': 'banners de comentário',
+    'blank': 'linhas em branco',
+    'repeated': 'linhas repetidas',
+    'data': 'linhas de dados',
+    'long_line': 'linhas longas encurtadas',
+    'trailing': 'espaços no fim da linha'
+}
+
+# Comentário de linha e delimitadores de bloco de cada linguagem; o 1º comentário de linha escreve os avisos
+COMMENT_STYLES = {
+    'python': (('#',), (('"""', '"""'), ("'''", "'''"))),
+    'ruby': (('#',), (('=begin', '=end'),)),
+    'php': (('//', '#'), (('/*', '*/'),)),
+    'go': (('//',), (('/*', '*/'),)),
+    'java': (('//',), (('/*', '*/'),)),
+    'javascript': (('//',), (('/*', '*/'),)),
+    'typescript': (('//',), (('/*', '*/'),)),
+}
+
+_LICENSE_PATTERN = re.compile(
+    r"licen[sc]e|licenciad|copyright|\(c\)|©|spdx-license|all rights reserved|todos os direitos|"
+    r"permission is hereby granted|without warranty|sem garantia",
+    re.I
+)
+# Linhas só com pontuação repetida (ex.: "# =======", "/*********/")
+_BANNER_BODY = re.compile(r"^[\s=\-*#/~_+.<>|]{4,}$")
+# Linhas de dados embutidos: base64 ou listas de números/hexadecimais
+_DATA_LINE = re.compile(r"^\s*(?:[A-Za-z0-9+/]{40,}={0,2}|(?:(?:0x[0-9a-fA-F]+|-?\d+(?:\.\d+)?)\s*,\s*){8,}\S*)\s*$")
+# Cabeçalho antes da licença que fica como está (shebang, encoding, abertura do PHP)
+_PREAMBLE = re.compile(r"^(#!|#.*coding[:=]|<\?php\s*$)")
+
+_LINE_REFERENCE = re.compile(
+    r"\b(?P<word>[Ll]inhas?|[Ll]ines?)(?P<space>\s+)"
+    r"(?P<numbers>\d+(?:\s*(?:[-–,]|\b(?:a|e|até|and|to)\b)\s*\d+)*)"
+)
+
+def _is_comment(line, markers):
+    stripped = line.lstrip()
+    return any(stripped.startswith(marker) for marker in markers)
+
+def _comment_body(line, markers):
+    stripped = line.strip()
+    for marker in markers:
+        if stripped.startswith(marker):
+            return stripped[len(marker):]
+    return stripped
+
+def _license_header(lines, style):
+    """(início, fim) 0-based e exclusivo do comentário de licença no topo do arquivo, ou None."""
+    markers, blocks = style
+    start = 0
+    while start < len(lines) and (not lines[start].strip() or _PREAMBLE.match(lines[start])):
+        start += 1
+    if start >= len(lines):
+        return None
+    end = start
+    first = lines[start].strip()
+    block = next(((opening, closing) for opening, closing in blocks if first.startswith(opening)), None)
+    if block is not None:
+        opening, closing = block
+        rest = first[len(opening):]
+        end = start + 1
+        if closing not in rest:
+            while end < len(lines) and closing not in lines[end]:
+                end += 1
+            end += 1
+    else:
+        while end < len(lines) and _is_comment(lines[end], markers):
+            end += 1
+    end = min(end, len(lines))
+    if end - start < 2 or not _LICENSE_PATTERN.search("\n".join(lines[start:end])):
+        return None
+    return start, end
+
+def _marker(language, text, line=''):
+    """Aviso no lugar do que foi omitido, como comentário da linguagem (ou entre colchetes).
+
+    Sem números de linha: o modelo os repetiria, e a tradução das linhas citadas os trocaria.
+    """
+    indent = line[:len(line) - len(line.lstrip())]
+    style = COMMENT_STYLES.get(language)
+    return f"{indent}{style[0][0]} [{text}]" if style else f"{indent}[{text}]"
+
+def compact_input(source, max_line_chars=400, language=None):
+    """Compacta o código colado antes de ir ao prompt. Retorna Compaction.
+
+    Em todas as entradas: espaços no fim das linhas, linhas em branco seguidas,
+    linhas idênticas repetidas, blocos de dados embutidos (base64, listas de
+    números) e linhas com mais de max_line_chars caracteres (código
+    minificado). Com a linguagem reconhecida, também o comentário de licença do
+    topo e os banners de comentário. O que é omitido vira um aviso de uma linha.
+    """
+    if language is None:
+        language = guess_language(source, [name for name, _, _ in LANGUAGE_HINTS])
+    style = COMMENT_STYLES.get(language)
+    lines = source.splitlines()
+    removed = dict.fromkeys(COMPACTION_LABELS, 0)
+    # (linha original 1-based, texto)
+    numbered = []
+    for number, line in enumerate(lines, 1):
+        stripped = line.rstrip()
+        if stripped != line:
+            removed['trailing'] += 1
+        numbered.append((number, stripped))
+
+    if style is not None:
+        header = _license_header([line for _, line in numbered], style)
+        if header is not None:
+            start, end = header
+            first = numbered[start][0]
+            removed['license'] += end - start
+            numbered[start:end] = [(first, _marker(language, f"licença omitida ({end - start} linhas)"))]
+        markers = style[0]
+        kept = []
+        for number, line in numbered:
+            if _is_comment(line, markers + ('/*',)) and _BANNER_BODY.match(_comment_body(line, markers + ('/*',)) or '----'):
+                removed['banner'] += 1
+                continue
+            kept.append((number, line))
+        numbered = kept
+
+    compacted = []
+    index = 0
+    while index < len(numbered):
+        number, line = numbered[index]
+        run = index + 1
+        if not line.strip():
+            while run < len(numbered) and not numbered[run][1].strip():
+                run += 1
+            removed['blank'] += run - index - 1
+            compacted.append((number, ''))
+            index = run
+            continue
+        if _DATA_LINE.match(line):
+            while run < len(numbered) and _DATA_LINE.match(numbered[run][1]):
+                run += 1
+            if run - index >= 8:
+                compacted.append((number, line[:max_line_chars]))
+                compacted.append((numbered[index + 1][0], _marker(
+                    language, f"mais {run - index - 1} linhas de dados omitidas", line
+                )))
+                removed['data'] += run - index - 1
+                index = run
+                continue
+            run = index + 1
+        while run < len(numbered) and numbered[run][1] == line:
+            run += 1
+        if run - index >= 3:
+            compacted.append((number, line))
+            compacted.append((numbered[index + 1][0], _marker(
+                language, f"a linha acima se repete mais {run - index - 1} vezes", line
+            )))
+            removed['repeated'] += run - index - 1
+            index = run
+            continue
+        if len(line) > max_line_chars:
+            keep = max_line_chars // 2
+            line = f"{line[:keep]} … [{len(line) - keep} caracteres omitidos]"
+            removed['long_line'] += 1
+        compacted.append((number, line))
+        index += 1
+
+    text = "\n".join(line for _, line in compacted) + ("\n" if source.endswith("\n") else "")
+    line_map = [number for number, _ in compacted]
+    if line_map == list(range(1, len(line_map) + 1)):
+        line_map = None
+    return Compaction(text, language, line_map, removed)
+
+def translate_line_refs(text, line_map):
+    """Troca, na resposta do modelo, as linhas citadas da entrada compactada pelas do original.
+
+    Reconhece "linha 12", "linhas 3-5", "linhas 3, 7 e 9" e os equivalentes em inglês.
+    """
+    if not line_map:
+        return text
+
+    def original(match):
+        number = int(match.group(0))
+        return str(line_map[number - 1]) if 1 <= number <= len(line_map) else match.group(0)
+
+    def replace(match):
+        numbers = re.sub(r"\d+", original, match.group('numbers'))
+        return f"{match.group('word')}{match.group('space')}{numbers}"
+
+    return _LINE_REFERENCE.sub(replace, text)
+
+def format_compaction(removed):
+    """Resumo do que foi omitido (ex.: "cabeçalho de licença: 20 linhas, linhas repetidas: 12")."""
+    return ", ".join(
+        f"{COMPACTION_LABELS[kind]}: {count}" for kind, count in removed.items() if count
+    )
@@ -0,0 +1,243 @@
+# Gerações em segundo plano: pool de threads compartilhado pelas sessões, com cancelamento
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados de um job; os três últimos são finais
+JOB_STATES = ('queued', 'running', 'done', 'cancelled', 'error')
+
+class Job:
+    """Geração que roda num worker do pool, fora da thread do script.
+
+    A função do job publica o texto com publish() e registra os streams
+    abertos com attach(); cancel() fecha esses streams na hora, e o servidor
+    para de gerar. Com deadline (segundos desde o início da execução), o job é parado
+    sozinho quando o prazo acaba, com stop_reason 'deadline'. O resultado (ou o
+    erro) fica no job até ele ser descartado, para a sessão recuperá-lo num rerun.
+    """
+
+    def __init__(self, job_id, context=None, deadline=None):
+        self.id = job_id
+        self.context = context or {}
+        self.deadline = deadline
+        self.stop_reason = None
+        self.status = 'queued'
+        self.parts = []
+        self.result = None
+        self.error = None
+        self.ttft = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self._streams = []
+        self._cancelled = False
+        self._timer = None
+        self._changed = threading.Condition()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def done(self):
+        return self.status in ('done', 'cancelled', 'error')
+
+    @property
+    def elapsed(self):
+        """Tempo desde o início da execução (até o fim, se já terminou)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def publish(self, part):
+        with self._changed:
+            if self.ttft is None:
+                self.ttft = time.monotonic() - self.started
+            self.parts.append(part)
+            self._changed.notify_all()
+
+    def attach(self, stream):
+        """Registra um stream aberto (um job pode ter vários); se o job já foi parado, ele é fechado na hora."""
+        with self._changed:
+            self._streams.append(stream)
+            cancelled = self._cancelled
+        if cancelled:
+            stream.close()
+
+    def cancel(self, reason='user'):
+        """Para o job: fecha os streams abertos. Retorna False se ele já tinha terminado."""
+        with self._changed:
+            if self.done or self._cancelled:
+                return False
+            self._cancelled = True
+            self.stop_reason = reason
+            streams = list(self._streams)
+            if self.status == 'queued':
+                # Ainda na fila: termina já, sem esperar um worker livre
+                self._finish('cancelled')
+            self._changed.notify_all()
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        return True
+
+    def text(self):
+        """Texto publicado até agora."""
+        with self._changed:
+            return "".join(self.parts)
+
+    def wait(self, timeout=None):
+        """Aguarda o fim do job. Retorna se ele terminou."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.done, timeout)
+            return self.done
+
+    def _start(self):
+        with self._changed:
+            if self._cancelled:
+                if not self.done:
+                    self._finish('cancelled')
+                return False
+            self.status = 'running'
+            self.started = time.monotonic()
+            if self.deadline:
+                self._timer = threading.Timer(self.deadline, self.cancel, kwargs={'reason': 'deadline'})
+                self._timer.daemon = True
+                self._timer.start()
+            return True
+
+    def _finish(self, status, result=None, error=None):
+        """Chamado com o lock; marca o estado final e acorda quem espera."""
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.monotonic()
+        if self.started is None:
+            self.started = self.finished
+        self._streams = []
+        if self._timer is not None:
+            self._timer.cancel()
+        self._changed.notify_all()
+
+class JobManager:
+    """Pool limitado de workers para as gerações de todas as sessões.
+
+    Cada sessão guarda só o id do job em st.session_state; num rerun ela o
+    recupera com get() e continua acompanhando o texto parcial. Jobs
+    terminados são descartados `retention` segundos depois do fim.
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self.retention = 600.0
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.failed = 0
+
+    def configure(self, workers=8, retention=600.0):
+        """Aplica as configurações; o pool só é recriado quando o número de workers muda."""
+        with self._lock:
+            self.retention = retention
+            workers = max(workers, 1)
+            if workers != self.workers:
+                previous = self._executor
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+                self.workers = workers
+                if previous is not None:
+                    # Os jobs já enviados ao pool anterior terminam normalmente
+                    previous.shutdown(wait=False)
+
+    def submit(self, function, context=None, deadline=None):
+        """Enfileira function(job) no pool e retorna o Job. O retorno de function vira job.result.
+
+        deadline é o prazo da execução em segundos (None ou 0 = sem prazo).
+        """
+        job = Job(uuid.uuid4().hex, context, deadline)
+        with self._lock:
+            if self._executor is None:
+                raise RuntimeError("JobManager não configurado.")
+            self._prune()
+            self._jobs[job.id] = job
+            self.submitted += 1
+            executor = self._executor
+        executor.submit(self._run, job, function)
+        return job
+
+    def _run(self, job, function):
+        if not job._start():
+            self._count(job)
+            return
+        try:
+            result = function(job)
+        except Exception as e:
+            with job._changed:
+                # Com o stream fechado pelo cancelamento, a leitura pode falhar: não é um erro
+                if job.cancelled:
+                    job._finish('cancelled')
+                else:
+                    job._finish('error', error=e)
+        else:
+            with job._changed:
+                job._finish('cancelled' if job.cancelled else 'done', result)
+        self._count(job)
+
+    def _count(self, job):
+        with self._lock:
+            if job.status == 'cancelled' and job.stop_reason == 'deadline':
+                self.expired += 1
+            elif job.status == 'cancelled':
+                self.cancelled += 1
+            elif job.status == 'error':
+                self.failed += 1
+
+    def _prune(self):
+        """Descarta os jobs terminados há mais de retention segundos (chamado com o lock)."""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and now - job.finished > self.retention
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Job pelo id, ou None se não existe (ou já foi descartado)."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        return job is not None and job.cancel()
+
+    def queue_position(self, job):
+        """Jobs enviados antes deste e ainda na fila."""
+        with self._lock:
+            return sum(
+                1 for other in self._jobs.values()
+                if other.status == 'queued' and other.submitted < job.submitted
+            )
+
+    def snapshot(self):
+        with self._lock:
+            states = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                states[job.status] += 1
+            return {
+                'workers': self.workers,
+                'queued': states['queued'],
+                'running': states['running'],
+                'submitted': self.submitted,
+                'cancelled': self.cancelled,
+                'expired': self.expired,
+                'failed': self.failed
+            }
+
+# Gerenciador único do processo, compartilhado pelas sessões do app
+job_manager = JobManager()
@@ -0,0 +1,242 @@
+# Teste de carga com várias sessões simuladas (AppTest) contra o servidor mock
+#
+# Uso:
+#   python load_test.py --sessions 1,5,10,20 --iterations 3
+#   python load_test.py --sessions 10 --base-url http://127.0.0.1:8765   # mock em outro processo
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+
+from streamlit.runtime import Runtime
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+from benchmark import percentile
+from mock_server import add_config_arguments, config_from_args, MockGroqServer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+SUGGEST_INPUT = "Crie uma função Python que valide um CPF (sessão {session}, iteração {iteration})"
+CORRECT_INPUT = "def media(valores):\n    return sum(valores) / len(valores  # sessão {session}, iteração {iteration}\n"
+
+_queue_delay = threading.local()
+
+@contextmanager
+def concurrent_apptest():
+    """Permite várias AppTest em paralelo e mede a espera até o script começar.
+
+    A AppTest troca o Runtime global a cada execução e o remove ao terminar;
+    com sessões simultâneas, uma delas apagaria o runtime de outra ainda em
+    execução. Aqui um runtime simulado compartilhado cobre esses intervalos.
+    Cada AppTest também recompila o script a cada rerun, e compilações
+    simultâneas falham no Python 3.11; como no servidor real, o bytecode passa
+    a vir de um único ScriptCache.
+    """
+    shared_runtime = MagicMock(spec=Runtime)
+    shared_runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared_script_cache = ScriptCache()
+    original_instance = Runtime.__dict__['instance']
+    original_run = LocalScriptRunner.run
+    original_get_bytecode = ScriptCache.get_bytecode
+
+    def instance(cls):
+        return cls._instance or shared_runtime
+
+    def get_bytecode(self, script_path):
+        return original_get_bytecode(shared_script_cache, script_path)
+
+    def timed_run(self, *args, **kwargs):
+        requested = time.perf_counter()
+        started = []
+
+        def on_event(sender, event, **data):
+            if event == ScriptRunnerEvent.SCRIPT_STARTED and not started:
+                started.append(time.perf_counter())
+
+        self.on_event.connect(on_event, weak=False)
+        try:
+            return original_run(self, *args, **kwargs)
+        finally:
+            self.on_event.disconnect(on_event)
+            _queue_delay.value = started[0] - requested if started else None
+
+    Runtime.instance = classmethod(instance)
+    LocalScriptRunner.run = timed_run
+    ScriptCache.get_bytecode = get_bytecode
+    try:
+        yield
+    finally:
+        Runtime.instance = original_instance
+        LocalScriptRunner.run = original_run
+        ScriptCache.get_bytecode = original_get_bytecode
+
+def resident_memory():
+    """Memória residente do processo, em bytes."""
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em KB no Linux e em bytes no macOS
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+def find_button(at, label):
+    return next(button for button in at.button if button.label == label)
+
+def timed(samples, action, operation):
+    """Executa uma ação da sessão e registra latência, espera na fila e erros."""
+    _queue_delay.value = None
+    started = time.perf_counter()
+    at = operation()
+    latency = time.perf_counter() - started
+    samples.append({
+        'action': action,
+        'latency': latency,
+        'queue_delay': _queue_delay.value,
+        'error': bool(at.exception) or bool(at.error)
+    })
+    return at
+
+def run_session(session, iterations, think_time, timeout, start_barrier):
+    """Sessão simulada: abre o app e alterna entre os dois botões."""
+    samples = []
+    start_barrier.wait()
+    at = timed(samples, 'load', lambda: AppTest.from_file(APP_PATH, default_timeout=timeout).run())
+
+    for iteration in range(iterations):
+        for action, text, label in (
+            ('suggest', SUGGEST_INPUT, "Sugerir Código"),
+            ('correct', CORRECT_INPUT, "Corrigir Erros")
+        ):
+            text = text.format(session=session, iteration=iteration)
+            at = timed(samples, 'input', lambda: at.text_area[0].input(text).run())
+            at = timed(samples, action, lambda: find_button(at, label).click().run())
+            if think_time:
+                time.sleep(think_time)
+    return at, samples
+
+def run_level(sessions, iterations, think_time, timeout):
+    """Executa um nível de concorrência e agrega as amostras."""
+    memory_before = resident_memory()
+    start_barrier = threading.Barrier(sessions)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [
+            pool.submit(run_session, session, iterations, think_time, timeout, start_barrier)
+            for session in range(sessions)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    # Medido com as sessões ainda referenciadas
+    memory_after = resident_memory()
+
+    samples = [sample for _, session_samples in results for sample in session_samples]
+    report = {
+        'sessions': sessions,
+        'actions': len(samples),
+        'errors': sum(1 for sample in samples if sample['error']),
+        'elapsed': elapsed,
+        'actions_per_second': len(samples) / elapsed if elapsed > 0 else 0.0,
+        'memory_per_session_mb': max(memory_after - memory_before, 0) / sessions / (1024 * 1024),
+        'queue_delay': {
+            q: percentile([s['queue_delay'] for s in samples if s['queue_delay'] is not None], q)
+            for q in (50, 95)
+        },
+        'latency': {}
+    }
+    for action in ('load', 'input', 'suggest', 'correct'):
+        latencies = [sample['latency'] for sample in samples if sample['action'] == action]
+        report['latency'][action] = {q: percentile(latencies, q) for q in (50, 95)}
+    return report
+
+REPORT_HEADER = (
+    f"{'sessões':>7} {'ações':>6} {'erros':>5} {'carga p50/p95':>14} {'texto p50/p95':>14} "
+    f"{'sugerir p50/p95':>16} {'corrigir p50/p95':>17} {'fila p50/p95':>16} {'ações/s':>8} {'MB/sessão':>10}"
+)
+
+def format_report(report):
+    """Linha da tabela de resultados de um nível de concorrência."""
+    def pair(values):
+        if values[50] is None:
+            return "-"
+        return f"{values[50]:.2f}/{values[95]:.2f}s"
+
+    queue = report['queue_delay']
+    queue_display = f"{queue[50] * 1000:.1f}/{queue[95] * 1000:.1f}ms" if queue[50] is not None else "-"
+    latency = report['latency']
+    return (
+        f"{report['sessions']:>7} {report['actions']:>6} {report['errors']:>5} "
+        f"{pair(latency['load']):>14} {pair(latency['input']):>14} {pair(latency['suggest']):>16} "
+        f"{pair(latency['correct']):>17} {queue_display:>16} {report['actions_per_second']:>8.1f} "
+        f"{report['memory_per_session_mb']:>10.2f}"
+    )
+
+def write_env_file(base_url, stream):
+    """Configuração do app durante o teste: backend mock, sem cache e sem log de telemetria."""
+    handle = tempfile.NamedTemporaryFile('w', suffix='.env', delete=False, encoding='utf-8')
+    with handle:
+        handle.write(
+            f"GROQ_API_KEY=mock\n"
+            f"GROQ_BASE_URL={base_url}\n"
+            f"GROQ_MODEL=mock\n"
+            f"STREAM_RESPONSES={'true' if stream else 'false'}\n"
+            f"CACHE_ENABLED=false\n"
+            f"TELEMETRY_LOG_PATH=\n"
+        )
+    return handle.name
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do app com sessões simuladas.")
+    parser.add_argument('--sessions', default='1,5,10', help="Níveis de concorrência, separados por vírgula")
+    parser.add_argument('--iterations', type=int, default=2, help="Ciclos sugerir + corrigir por sessão")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Pausa entre ações, em segundos")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Prazo de cada rerun, em segundos")
+    parser.add_argument('--no-stream', action='store_true', help="Usa respostas sem streaming")
+    parser.add_argument('--base-url', help="Usa um servidor já em execução em vez do mock interno")
+    parser.add_argument('--output', help="Grava os resultados em JSON")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.sessions.split(',') if level.strip()]
+
+    server = None
+    if args.base_url is None:
+        server = MockGroqServer(config_from_args(args)).start()
+    env_file = write_env_file(args.base_url or server.url, not args.no_stream)
+    # Lido por settings.py no primeiro import, dentro da primeira sessão
+    os.environ['APP_ENV_FILE'] = env_file
+
+    reports = []
+    try:
+        with concurrent_apptest():
+            # Aquecimento: imports e caches do processo não entram na memória por sessão
+            AppTest.from_file(APP_PATH, default_timeout=args.timeout).run()
+            print(REPORT_HEADER, flush=True)
+            for sessions in levels:
+                reports.append(run_level(sessions, args.iterations, args.think_time, args.timeout))
+                print(format_report(reports[-1]), flush=True)
+    finally:
+        if server is not None:
+            server.stop()
+        os.remove(env_file)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump({'config': vars(args), 'levels': reports}, handle, indent=2)
+    return 1 if any(report['errors'] for report in reports) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# Servidor local compatível com a API de chat completions da Groq, para testes e benchmarks
+#
+# Uso:
+#   python mock_server.py --port 8765 --latency 0.2 --tokens-per-second 300 --error-rate 0.05
+#   GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# latency: segundos até o primeiro token; error_rate: fração de requisições com erro
+MockConfig = namedtuple('MockConfig', [
+    'latency', 'tokens_per_second', 'response_tokens', 'chunk_tokens',
+    'error_rate', 'error_status', 'retry_after', 'seed'
+], defaults=[0.05, 400.0, 200, 4, 0.0, 503, None, None])
+
+def build_response_words(count):
+    """Texto de resposta com markdown e um bloco de código, com `count` palavras (≈ tokens)."""
+    header = ["### Análise\n\n", "Segue", "a", "sugestão:\n\n", "```python\n", "def", "exemplo():\n",
+              "   ", "return", "42\n", "```\n\n"]
+    words = header[:count]
+    while len(words) < count:
+        words.append("palavra")
+    return words
+
+class MockStats:
+    """Contadores do servidor, incluindo o tempo gasto no lado do servidor."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.server_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, duration, error=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1 if error else 0
+            self.server_time += duration
+
+    def snapshot(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'server_time': self.server_time}
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalhos e corpo saem em escritas separadas; sem isso o Nagle soma ~40ms por resposta
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_event(self, data):
+        payload = f"data: {data}\n\n".encode('utf-8')
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+        self.wfile.flush()
+
+    def _stream_words(self, words, completion_id, model, usage, token_delay):
+        """Envia a resposta em chunks SSE; o último traz o usage em x_groq, como na Groq."""
+        step = max(1, self.server.config.chunk_tokens)
+        for index in range(0, len(words), step):
+            piece = words[index:index + step]
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'system_fingerprint': 'mock',
+                'choices': [{
+                    'index': 0,
+                    'delta': {'role': 'assistant', 'content': " ".join(piece) + " "},
+                    'finish_reason': None,
+                    'logprobs': None
+                }]
+            }
+            if index + step >= len(words):
+                chunk['choices'][0]['finish_reason'] = 'stop'
+                chunk['x_groq'] = {'id': completion_id, 'usage': usage}
+            self._write_event(json.dumps(chunk))
+            time.sleep(token_delay * len(piece))
+        self._write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self._send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model'}]})
+        self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        started = time.perf_counter()
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'Not found'}})
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        config = self.server.config
+
+        with self.server.random_lock:
+            failed = self.server.random.random() < config.error_rate
+        if failed:
+            headers = {'retry-after': str(config.retry_after)} if config.retry_after is not None else None
+            self._send_json(
+                config.error_status,
+                {'error': {'message': 'Erro injetado pelo servidor mock', 'type': 'mock_error'}},
+                headers
+            )
+            self.server.stats.add(time.perf_counter() - started, error=True)
+            return
+
+        messages = body.get('messages', [])
+        max_tokens = body.get('max_tokens') or config.response_tokens
+        words = build_response_words(min(config.response_tokens, max_tokens))
+        usage = {
+            'prompt_tokens': sum(len(message.get('content', '')) for message in messages) // 4,
+            'completion_tokens': len(words)
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get('model', 'mock')
+        token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+        time.sleep(config.latency)
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                self._stream_words(words, completion_id, model, usage, token_delay)
+            except (BrokenPipeError, ConnectionResetError):
+                # O cliente desistiu no meio do stream
+                self.close_connection = True
+        else:
+            time.sleep(token_delay * len(words))
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'system_fingerprint': 'mock',
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': " ".join(words)},
+                    'finish_reason': 'stop',
+                    'logprobs': None
+                }],
+                'usage': usage
+            })
+        self.server.stats.add(time.perf_counter() - started)
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Fila de conexões maior que o padrão (5), para rajadas de centenas de clientes
+    request_queue_size = 256
+
+class MockGroqServer:
+    """Servidor mock executado em uma thread; use como context manager."""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or MockConfig()
+        self._server = MockHTTPServer((host, port), MockHandler)
+        self._server.config = self.config
+        self._server.stats = MockStats()
+        self._server.random = random.Random(self.config.seed)
+        self._server.random_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self):
+        return self._server.stats
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Atende em primeiro plano até ser interrompido."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def add_config_arguments(parser):
+    """Argumentos de configuração do mock, compartilhados com o benchmark."""
+    defaults = MockConfig()
+    parser.add_argument('--latency', type=float, default=defaults.latency,
+                        help="Segundos até o primeiro token")
+    parser.add_argument('--tokens-per-second', type=float, default=defaults.tokens_per_second,
+                        help="Velocidade de geração (0 = instantâneo)")
+    parser.add_argument('--response-tokens', type=int, default=defaults.response_tokens,
+                        help="Tamanho da resposta, em tokens")
+    parser.add_argument('--chunk-tokens', type=int, default=defaults.chunk_tokens,
+                        help="Tokens por chunk no streaming")
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate,
+                        help="Fração das requisições que falham (0 a 1)")
+    parser.add_argument('--error-status', type=int, default=defaults.error_status,
+                        help="Status HTTP dos erros injetados")
+    parser.add_argument('--retry-after', type=float, default=defaults.retry_after,
+                        help="Valor do cabeçalho Retry-After nos erros injetados")
+    parser.add_argument('--seed', type=int, default=defaults.seed,
+                        help="Semente da injeção de erros")
+
+def config_from_args(args):
+    return MockConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        chunk_tokens=args.chunk_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor mock compatível com a API da Groq.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockGroqServer(config_from_args(args), args.host, args.port)
+    print(f"Servidor mock em {server.url} (GROQ_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
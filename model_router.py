@@ -0,0 +1,189 @@
+# Escolha do modelo por requisição: nível exigido pela tarefa + latência e erros observados
+import threading
+import time
+from collections import namedtuple
+
+from telemetry import telemetry
+from token_estimator import get_context_window
+
+# Níveis de modelo, do mais leve ao mais capaz
+TIERS = ('small', 'medium', 'large')
+
+# Nível mínimo pedido por cada perfil de saída
+PROFILE_TIERS = {'concise': 'small', 'standard': 'medium', 'exhaustive': 'large'}
+
+# Modelo escolhido, nível exigido pela tarefa (None sem roteamento) e o motivo, para a interface
+RouteDecision = namedtuple('RouteDecision', ['model', 'tier', 'reason'])
+
+def parse_model_tiers(value):
+    """Lê "modelo:nível,modelo:nível" (GROQ_MODELS). Modelos sem nível são 'large'."""
+    models = []
+    for item in (value or '').split(','):
+        model, _, tier = item.strip().partition(':')
+        model = model.strip()
+        if not model:
+            continue
+        tier = tier.strip().lower() or 'large'
+        if tier not in TIERS:
+            raise ValueError(f"Nível de modelo desconhecido em GROQ_MODELS: {tier} (use {', '.join(TIERS)})")
+        models.append((model, tier))
+    return models
+
+class ModelHealth:
+    """Médias móveis exponenciais (EWMA) de latência e de erros de um modelo.
+
+    O tempo até o 1º token (streaming) e a latência total (sem streaming)
+    ficam em médias separadas: misturadas, a média oscilaria com o tipo das
+    últimas chamadas, não com o modelo.
+    """
+
+    def __init__(self):
+        self.ttft = None
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.last_error = None
+
+    def observe(self, latency, error, alpha, streaming=False):
+        if latency is not None and not error:
+            if streaming:
+                self.ttft = latency if self.ttft is None else (1 - alpha) * self.ttft + alpha * latency
+            else:
+                self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (1.0 if error else 0.0)
+        self.samples += 1
+        if error:
+            self.last_error = time.monotonic()
+
+    def healthy(self, max_error_rate, cooldown):
+        """Fora do ar só enquanto a taxa de erro está alta e o último erro é recente."""
+        if self.error_rate < max_error_rate or self.last_error is None:
+            return True
+        return time.monotonic() - self.last_error >= cooldown
+
+class ModelRouter:
+    """Escolhe, por requisição, o modelo mais rápido e saudável que atende ao nível da tarefa.
+
+    O nível vem do modo, do tamanho da entrada e do perfil de saída; entre os
+    modelos configurados com nível igual ou maior (e contexto suficiente), vence
+    o de menor latência média recente do mesmo tipo de chamada (1º token no
+    streaming, latência total sem ele). Modelos ainda sem medições desse tipo
+    são tentados primeiro, uma vez, para entrarem na comparação. As medições vêm da
+    telemetria de todas as chamadas do processo.
+    """
+
+    def __init__(self):
+        self.models = []
+        self.alpha = 0.2
+        self.max_error_rate = 0.5
+        self.cooldown = 60.0
+        self.small_input_tokens = 400
+        self.large_input_tokens = 6000
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def configure(self, models, alpha=0.2, max_error_rate=0.5, cooldown=60.0,
+                  small_input_tokens=400, large_input_tokens=6000):
+        """Define os modelos [(modelo, nível)] e os limites (lista vazia desativa o roteamento)."""
+        with self._lock:
+            self.models = list(models)
+            self.alpha = alpha
+            self.max_error_rate = max_error_rate
+            self.cooldown = cooldown
+            self.small_input_tokens = small_input_tokens
+            self.large_input_tokens = large_input_tokens
+
+    @property
+    def enabled(self):
+        return bool(self.models)
+
+    def observe(self, record):
+        """Recebe cada registro da telemetria; usa o 1º token no streaming e a latência total sem ele."""
+        if record['status'] == 'cancelled':
+            return
+        with self._lock:
+            health = self._health.get(record['model'])
+            if health is None:
+                health = self._health[record['model']] = ModelHealth()
+            streaming = bool(record['streaming'])
+            latency = record['ttft'] if streaming else record['latency']
+            health.observe(latency, record['status'] != 'ok', self.alpha, streaming)
+
+    def required_tier(self, mode, input_tokens, profile_name):
+        """Nível mínimo de modelo para a tarefa. Retorna (nível, motivo)."""
+        tier = PROFILE_TIERS.get(profile_name, 'medium')
+        reason = f"perfil {profile_name}"
+        if input_tokens >= self.large_input_tokens:
+            tier, reason = 'large', f"entrada grande (~{input_tokens:,} tokens)"
+        elif mode.startswith('suggest') and TIERS.index(tier) < TIERS.index('medium'):
+            tier, reason = 'medium', "geração de código"
+        elif mode.startswith('correct') and input_tokens <= self.small_input_tokens and tier != 'large':
+            tier, reason = 'small', f"correção de trecho curto (~{input_tokens:,} tokens)"
+        return tier, reason
+
+    def route(self, mode, input_tokens, profile_name, default_model, min_context=0, streaming=False):
+        """Modelo para a requisição (RouteDecision). Sem GROQ_MODELS, sempre default_model.
+
+        streaming escolhe a média comparada: 1º token (True) ou latência total (False).
+        """
+        with self._lock:
+            models = list(self.models)
+            if not models:
+                return RouteDecision(default_model, None, "modelo fixo (GROQ_MODEL)")
+
+            tier, reason = self.required_tier(mode, input_tokens, profile_name)
+            fits = [(model, level) for model, level in models if get_context_window(model) >= min_context]
+            eligible = [(model, level) for model, level in fits if TIERS.index(level) >= TIERS.index(tier)]
+            if not eligible:
+                # Nenhum modelo do nível cabe a entrada: usa o de maior contexto
+                eligible = fits or [max(models, key=lambda item: get_context_window(item[0]))]
+                reason += "; nenhum modelo do nível comporta a entrada"
+
+            healthy = [
+                item for item in eligible
+                if self._health.get(item[0], ModelHealth()).healthy(self.max_error_rate, self.cooldown)
+            ]
+            if not healthy:
+                model, _ = min(eligible, key=lambda item: self._health[item[0]].error_rate)
+                return RouteDecision(model, tier, f"{reason} → nível {tier}; nenhum modelo saudável, menor taxa de erro")
+
+            def measured(model):
+                health = self._health.get(model)
+                if health is None:
+                    return None
+                return health.ttft if streaming else health.latency
+
+            def rank(item):
+                model, level = item
+                latency = measured(model)
+                return (latency is not None, latency or 0.0, TIERS.index(level), models.index(item))
+
+            model, _ = min(healthy, key=rank)
+            latency = measured(model)
+            if latency is None:
+                choice = "ainda sem medições"
+            else:
+                kind = "até o 1º token" if streaming else "sem streaming"
+                choice = f"o mais rápido entre os saudáveis (~{latency:.2f}s {kind})"
+            return RouteDecision(model, tier, f"{reason} → nível {tier}; {choice}")
+
+    def snapshot(self):
+        """Estado de cada modelo configurado, para a sidebar."""
+        with self._lock:
+            rows = []
+            for model, tier in self.models:
+                health = self._health.get(model) or ModelHealth()
+                rows.append({
+                    'model': model,
+                    'tier': tier,
+                    'ttft': health.ttft,
+                    'latency': health.latency,
+                    'error_rate': health.error_rate,
+                    'samples': health.samples,
+                    'healthy': health.healthy(self.max_error_rate, self.cooldown)
+                })
+            return rows
+
+# Roteador único do processo, alimentado pela telemetria
+model_router = ModelRouter()
+telemetry.add_listener(model_router.observe)
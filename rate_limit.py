@@ -0,0 +1,80 @@
+# Limitador de taxa com token buckets para requisições e tokens por minuto
+import threading
+import time
+
+class TokenBucket:
+    """Balde de fichas com capacidade e reposição contínua por segundo."""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+    def wait_time(self, amount):
+        """Segundos até haver `amount` fichas disponíveis (0 se já houver)."""
+        missing = amount - self.tokens
+        if missing <= 0:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float('inf')
+        return missing / self.refill_per_second
+
+class RateLimiter:
+    """Respeita limites de requisições por minuto (RPM) e tokens por minuto (TPM).
+
+    Um limite <= 0 desativa o respectivo balde.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000):
+        self._buckets = {}
+        if requests_per_minute > 0:
+            self._buckets['requests'] = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        if tokens_per_minute > 0:
+            self._buckets['tokens'] = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._condition = threading.Condition()
+        self.total_wait = 0.0
+
+    def acquire(self, tokens=0):
+        """Bloqueia até poder enviar uma requisição de `tokens` tokens.
+
+        Retorna a quantidade de tokens reservada (limitada à capacidade do balde)
+        e o tempo de espera, em segundos.
+        """
+        token_bucket = self._buckets.get('tokens')
+        if token_bucket is not None:
+            tokens = min(tokens, token_bucket.capacity)
+        needed = {'requests': 1, 'tokens': tokens}
+        started = time.monotonic()
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = 0.0
+                for name, bucket in self._buckets.items():
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(needed[name]))
+                if wait <= 0:
+                    for name, bucket in self._buckets.items():
+                        bucket.tokens -= needed[name]
+                    waited = time.monotonic() - started
+                    self.total_wait += waited
+                    return tokens, waited
+                self._condition.wait(timeout=min(wait, 5.0))
+
+    def settle(self, reserved, actual):
+        """Corrige o balde de tokens com o consumo real da requisição."""
+        bucket = self._buckets.get('tokens')
+        if bucket is None or actual is None:
+            return
+        with self._condition:
+            bucket.refill(time.monotonic())
+            # Consumo acima do reservado vira dívida; abaixo, devolve fichas
+            bucket.tokens = min(bucket.capacity, bucket.tokens + reserved - actual)
+            self._condition.notify_all()
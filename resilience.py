@@ -0,0 +1,276 @@
+# Retentativas com backoff exponencial, prazos e circuit breaker para as chamadas à API
+import asyncio
+import random
+import threading
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+
+import httpx
+from groq import APIConnectionError, APIStatusError
+
+# Status HTTP transitórios que justificam uma nova tentativa
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# max_attempts inclui a primeira tentativa; prazos em segundos (0 = sem prazo total)
+RetryPolicy = namedtuple('RetryPolicy', [
+    'max_attempts', 'base_delay', 'max_delay', 'attempt_timeout', 'deadline'
+])
+
+class CircuitOpenError(RuntimeError):
+    """O circuit breaker está aberto: a chamada falha sem chegar à API."""
+
+class DeadlineExceededError(TimeoutError):
+    """O prazo total da requisição terminou antes de uma resposta."""
+
+def is_retryable(error):
+    """Indica se o erro é transitório (rede, timeout, 429 ou 5xx)."""
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return isinstance(error, (APIConnectionError, httpx.TransportError))
+
+def parse_retry_after(error):
+    """Lê Retry-After (segundos ou data HTTP) ou retry-after-ms da resposta de erro."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def backoff_delay(attempt, base_delay, max_delay, retry_after=None):
+    """Espera antes da próxima tentativa: backoff exponencial com jitter total.
+
+    Quando o servidor informa Retry-After, a espera nunca é menor que ele.
+    """
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+class CircuitBreaker:
+    """Circuit breaker compartilhado pelo processo.
+
+    Após failure_threshold falhas transitórias seguidas o circuito abre e as
+    chamadas falham na hora; passado reset_timeout, uma única chamada de teste
+    é liberada (meio aberto) e o resultado dela fecha ou reabre o circuito.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Indica se a chamada pode seguir para a API."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.failure_threshold > 0 and self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state != self.OPEN:
+                    self.opened_count += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def retry_in(self):
+        """Segundos até a próxima chamada de teste (0 se o circuito não está aberto)."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def snapshot(self):
+        """Estado atual para as métricas."""
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opened_count': self.opened_count,
+                'retry_in': retry_in
+            }
+
+class RetryStats:
+    """Contadores de tentativas do processo (todas as sessões e threads)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'failures': self.failures,
+                'short_circuits': self.short_circuits
+            }
+
+# Contadores únicos do processo
+retry_stats = RetryStats()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name, failure_threshold=5, reset_timeout=30.0):
+    """Retorna o circuit breaker do upstream `name`, criado uma vez por processo."""
+    key = (name, failure_threshold, reset_timeout)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(failure_threshold, reset_timeout)
+            _breakers[key] = breaker
+        return breaker
+
+class _RetryLoop:
+    """Estado de uma chamada com retentativas, comum às versões síncrona e assíncrona."""
+
+    def __init__(self, policy, breaker, stats):
+        self.policy = policy
+        self.breaker = breaker
+        self.stats = stats
+        self.attempt = 0
+        self.deadline = time.monotonic() + policy.deadline if policy.deadline > 0 else None
+        stats.add(calls=1)
+
+    def next_timeout(self):
+        """Libera a próxima tentativa e devolve o prazo dela (None = sem prazo)."""
+        if self.breaker is not None and not self.breaker.allow():
+            self.stats.add(short_circuits=1)
+            raise CircuitOpenError(
+                f"A API está instável; novas chamadas estão suspensas por "
+                f"{self.breaker.retry_in():.0f}s. Tente novamente em instantes."
+            )
+
+        timeout = self.policy.attempt_timeout
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats.add(failures=1)
+                raise DeadlineExceededError(
+                    f"Sem resposta da API em {self.policy.deadline:.0f}s ({self.attempt} tentativas)."
+                )
+            timeout = min(timeout, remaining) if timeout > 0 else remaining
+
+        self.attempt += 1
+        self.stats.add(attempts=1)
+        return timeout or None
+
+    def on_success(self):
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def on_error(self, error):
+        """Espera antes da próxima tentativa, ou None se o erro deve ser repassado."""
+        retryable = is_retryable(error)
+        if self.breaker is not None:
+            # Erros do cliente (400, 401...) mostram que o upstream está respondendo
+            if retryable:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        if not retryable or self.attempt >= self.policy.max_attempts:
+            self.stats.add(failures=1)
+            return None
+
+        delay = backoff_delay(self.attempt, self.policy.base_delay, self.policy.max_delay, parse_retry_after(error))
+        if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+            self.stats.add(failures=1)
+            return None
+        self.stats.add(retries=1)
+        return delay
+
+def call_with_retry(operation, policy, breaker=None, stats=retry_stats):
+    """Executa operation(timeout) com retentativas, prazos e circuit breaker.
+
+    `timeout` é o prazo da tentativa, já limitado ao tempo que resta do prazo
+    total. Erros não transitórios (400, 401...) são repassados sem nova tentativa.
+    """
+    retry = _RetryLoop(policy, breaker, stats)
+    while True:
+        timeout = retry.next_timeout()
+        try:
+            result = operation(timeout)
+        except Exception as error:
+            delay = retry.on_error(error)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        retry.on_success()
+        return result
+
+async def call_with_retry_async(operation, policy, breaker=None, stats=retry_stats):
+    """Versão assíncrona de call_with_retry: `operation(timeout)` é uma corrotina."""
+    retry = _RetryLoop(policy, breaker, stats)
+    while True:
+        timeout = retry.next_timeout()
+        try:
+            result = await operation(timeout)
+        except Exception as error:
+            delay = retry.on_error(error)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        retry.on_success()
+        return result
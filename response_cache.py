@@ -0,0 +1,141 @@
+# Cache de respostas em dois níveis: LRU em memória + SQLite em disco
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def make_cache_key(*parts):
+    """Gera a chave do cache a partir das partes da requisição."""
+    payload = json.dumps([str(part) for part in parts], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Cache de respostas com TTL e limite de tamanho, compartilhado entre sessões."""
+
+    def __init__(self, db_path, ttl=86400, memory_entries=256, disk_max_bytes=100 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    usage TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)"
+            )
+            self._conn.commit()
+
+    def _is_expired(self, created_at, now):
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _remember(self, key, entry):
+        """Insere no nível em memória, descartando o item menos usado."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Retorna {'value', 'usage'} ou None se não houver entrada válida."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._is_expired(entry['created_at'], now):
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    return entry
+
+            if self._conn is None:
+                return None
+
+            row = self._conn.execute(
+                "SELECT value, usage, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, usage, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+            entry = {
+                'value': value,
+                'usage': json.loads(usage) if usage else None,
+                'created_at': created_at
+            }
+            self._remember(key, entry)
+            return entry
+
+    def set(self, key, value, usage=None):
+        """Armazena a resposta nos dois níveis e aplica a política de eviction."""
+        now = time.time()
+        entry = {'value': value, 'usage': usage, 'created_at': now}
+        with self._lock:
+            self._remember(key, entry)
+
+            if self._conn is None:
+                return
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, usage, created_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, json.dumps(usage) if usage else None, now, now, len(value.encode('utf-8')))
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Remove entradas expiradas e as menos acessadas até caber no limite em disco."""
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+
+        if self.disk_max_bytes <= 0:
+            return
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        expired_keys = []
+        for key, size in rows:
+            if total <= self.disk_max_bytes:
+                break
+            expired_keys.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", expired_keys)
+
+    def clear(self):
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
@@ -0,0 +1,153 @@
+# Divisão incremental da resposta em trechos de texto e blocos de código, para renderização
+import re
+from collections import namedtuple
+
+# Trecho da resposta: kind é 'text' ou 'code'; filename e language só valem para código
+Segment = namedtuple('Segment', ['kind', 'content', 'filename', 'language'])
+
+_FENCE_PATTERN = re.compile(r"^\s{0,3}(`{3,}|~{3,})\s*([^`\s]*)\s*$")
+_FILENAME_PATTERN = re.compile(r"(?<![\w/.])((?:[\w.-]+/)*[\w-]+(?:\.[\w-]+)*\.[A-Za-z][A-Za-z0-9]{0,5})(?![\w/])")
+
+# Linhas com mais palavras que isso são texto corrido, não o nome do arquivo do bloco seguinte
+_FILENAME_LINE_MAX_WORDS = 8
+
+def find_filename(line):
+    """Nome de arquivo citado na linha logo antes de um bloco (ex.: "**app/models.py**")."""
+    if not line or len(line.split()) > _FILENAME_LINE_MAX_WORDS:
+        return None
+    matches = _FILENAME_PATTERN.findall(line.strip('#*`>-: '))
+    return matches[-1] if matches else None
+
+def _code_segment(info, code, previous_line):
+    """Bloco de código a partir do info string (```python ou ```python:app/x.py) e da linha anterior."""
+    language, _, path = info.partition(':')
+    if not path and ('.' in language or '/' in language):
+        language, path = '', language
+    return Segment('code', code, path or find_filename(previous_line), language.lower() or None)
+
+class SegmentParser:
+    """Divide a resposta em trechos conforme ela chega.
+
+    feed() recebe o texto acumulado e só analisa o que veio depois do último
+    trecho fechado; os trechos já fechados não mudam mais e podem ser
+    renderizados uma única vez. O texto em aberto (um parágrafo ou um bloco de
+    código ainda sem a cerca de fechamento) volta como `tail`.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self._source = ''
+        self._offset = 0
+        self._previous_line = ''
+        self.restarted = False
+
+    def reset(self):
+        self.__init__()
+
+    def feed(self, text):
+        """Analisa o texto acumulado. Retorna (trechos fechados nesta chamada, tail).
+
+        Se o texto não continua o anterior (ex.: o aviso "Aguardando..."
+        trocado pela resposta), a análise recomeça e `restarted` fica True.
+        """
+        restarted = not text.startswith(self._source[:self._offset])
+        if restarted:
+            self.reset()
+        self.restarted = restarted
+        self._source = text
+        closed = []
+        position = self._offset
+        text_start = position
+        while True:
+            line_end = text.find('\n', position)
+            if line_end < 0:
+                break
+            line = text[position:line_end]
+            fence = _FENCE_PATTERN.match(line)
+            if fence:
+                marker = fence.group(1)
+                closing = self._find_closing(text, line_end + 1, marker)
+                if closing is None:
+                    break
+                code_end, after = closing
+                prose = text[text_start:position]
+                if prose.strip():
+                    closed.append(Segment('text', prose, None, None))
+                closed.append(_code_segment(fence.group(2), text[line_end + 1:code_end], self._previous_line))
+                position = text_start = after
+                self._previous_line = ''
+                continue
+            if line.strip():
+                self._previous_line = line.strip()
+            elif text[text_start:position].strip():
+                # Parágrafo terminado: fecha o texto até aqui
+                closed.append(Segment('text', text[text_start:position], None, None))
+                text_start = position
+            position = line_end + 1
+
+        self._offset = text_start
+        self.segments.extend(closed)
+        return closed, self._tail(text[text_start:])
+
+    def _find_closing(self, text, start, marker):
+        """Posição do fim do código e do início da linha seguinte à cerca de fechamento."""
+        position = start
+        while True:
+            line_end = text.find('\n', position)
+            line = text[position:] if line_end < 0 else text[position:line_end]
+            stripped = line.strip()
+            if stripped and stripped[0] == marker[0] and set(stripped) == {marker[0]} and len(stripped) >= len(marker):
+                if line_end < 0:
+                    # Cerca no fim do texto: só é fechada quando a linha terminar
+                    return None
+                return position, line_end + 1
+            if line_end < 0:
+                return None
+            position = line_end + 1
+
+    def _tail(self, rest):
+        """Trecho ainda em aberto: texto comum ou um bloco de código sem a cerca de fechamento."""
+        if not rest.strip():
+            return None
+        lines = rest.split('\n')
+        for index, line in enumerate(lines):
+            fence = _FENCE_PATTERN.match(line)
+            if fence and index < len(lines) - 1:
+                prose = "\n".join(lines[:index])
+                code = "\n".join(lines[index + 1:])
+                previous = next((item.strip() for item in reversed(lines[:index]) if item.strip()), self._previous_line)
+                segment = _code_segment(fence.group(2), code, previous)
+                return [Segment('text', prose, None, None), segment] if prose.strip() else [segment]
+        return [Segment('text', rest, None, None)]
+
+    def finish(self):
+        """Fecha o que ficou em aberto no fim da resposta (ex.: bloco cortado por max_tokens).
+
+        A última linha não precisa terminar em quebra de linha: uma cerca de
+        fechamento ali fecha o bloco. Retorna os trechos fechados aqui.
+        """
+        closed = []
+        if self._source and not self._source.endswith('\n'):
+            closed, _ = self.feed(self._source + '\n')
+        tail = self._tail(self._source[self._offset:]) or []
+        self.segments.extend(tail)
+        self._offset = len(self._source)
+        return closed + tail
+
+def split_segments(text):
+    """Trechos de uma resposta completa."""
+    parser = SegmentParser()
+    parser.feed(text if text.endswith('\n') else text + '\n')
+    parser.finish()
+    return parser.segments
+
+def cut_at_boundary(text):
+    """Início de uma resposta interrompida até o último parágrafo ou bloco de código completo.
+
+    Sem nenhum trecho completo, corta na última linha completa.
+    """
+    parser = SegmentParser()
+    parser.feed(text)
+    if parser._offset:
+        return text[:parser._offset]
+    return text[:text.rfind('\n') + 1]
@@ -0,0 +1,351 @@
+# Revisão em lote de um diretório pela linha de comando (CI, execuções noturnas)
+#
+# Uso:
+#   python review_cli.py src/ --output revisao.jsonl --workers 4
+#   python review_cli.py src/ --format markdown --output revisao/
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from settings import get_settings
+from groq_client import get_client
+from completion import build_cache_key, complete, prepare_prompt, retry_policy, upstream_breaker
+from rate_limit import RateLimiter
+from resilience import retry_stats
+from response_cache import ResponseCache
+from telemetry import telemetry
+from token_estimator import estimator
+
+DEFAULT_INCLUDE = (
+    '*.py,*.js,*.jsx,*.ts,*.tsx,*.php,*.java,*.kt,*.go,*.rb,*.rs,'
+    '*.c,*.h,*.cpp,*.hpp,*.cs,*.swift,*.scala,*.sql,*.sh'
+)
+DEFAULT_EXCLUDE_DIRS = {
+    '.git', '.hg', '.svn', 'node_modules', 'venv', '.venv', '__pycache__',
+    'vendor', 'dist', 'build', '.cache', '.tox', '.mypy_cache', '.pytest_cache'
+}
+
+def iter_files(root, include, exclude, max_bytes):
+    """Percorre o diretório devolvendo (caminho, caminho relativo) dos arquivos elegíveis."""
+    if os.path.isfile(root):
+        yield root, os.path.basename(root)
+        return
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if d not in DEFAULT_EXCLUDE_DIRS)
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root)
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in include):
+                continue
+            if any(fnmatch.fnmatch(relative, pattern) for pattern in exclude):
+                continue
+            try:
+                if os.path.getsize(path) > max_bytes:
+                    continue
+            except OSError:
+                continue
+            yield path, relative
+
+def load_checkpoint(path):
+    """Lê o checkpoint: caminho relativo -> sha256 dos arquivos já revisados."""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Linha parcial de uma execução interrompida
+                continue
+            done[entry['path']] = entry['sha256']
+    return done
+
+class ResultWriter:
+    """Grava cada resultado assim que fica pronto (JSONL ou um .md por arquivo) e o checkpoint."""
+
+    def __init__(self, output, output_format, checkpoint_path, truncate=False):
+        self.output = output
+        self.output_format = output_format
+        self._lock = threading.Lock()
+        for path in (output if output_format == 'jsonl' else None, checkpoint_path):
+            directory = os.path.dirname(path) if path else ''
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        if output_format == 'markdown':
+            os.makedirs(output, exist_ok=True)
+        # Sem retomar, a saída começa vazia (resultados antigos ficariam misturados aos novos)
+        self._jsonl = open(output, 'w' if truncate else 'a', encoding='utf-8') if output_format == 'jsonl' else None
+        self._checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+
+    def write(self, result):
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps(result, ensure_ascii=False) + "\n")
+                self._jsonl.flush()
+            else:
+                self._write_markdown(result)
+            if self._checkpoint is not None and result['status'] == 'ok':
+                self._checkpoint.write(json.dumps({'path': result['path'], 'sha256': result['sha256']}) + "\n")
+                self._checkpoint.flush()
+
+    def _write_markdown(self, result):
+        target = os.path.join(self.output, result['path'] + '.md')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w', encoding='utf-8') as handle:
+            handle.write(f"# Revisão de `{result['path']}`\n\n")
+            if result['status'] == 'ok':
+                handle.write(result['response'] or '')
+            else:
+                handle.write(f"**Erro:** {result['error']}\n")
+            handle.write("\n")
+
+    def close(self):
+        for handle in (self._jsonl, self._checkpoint):
+            if handle is not None:
+                handle.close()
+
+def review_file(path, relative, settings, client, limiter, cache, profile_name, completion_reserve,
+                policy=None, breaker=None):
+    """Revisa um arquivo com o mesmo prompt do modo 'Corrigir Erros'."""
+    started = time.perf_counter()
+    with open(path, encoding='utf-8', errors='replace') as handle:
+        source = handle.read()
+    result = {
+        'path': relative,
+        'sha256': hashlib.sha256(source.encode('utf-8')).hexdigest(),
+        'model': settings.GROQ_MODEL,
+        'profile': profile_name,
+        'status': 'ok',
+        'response': None,
+        'error': None,
+        'usage': None,
+        'cached': False,
+        'waited': 0.0,
+        'elapsed': 0.0
+    }
+
+    try:
+        prepared = prepare_prompt(settings, 'correct', source, profile_name)
+        cache_key = build_cache_key(
+            prepared.template,
+            settings.GROQ_MODEL,
+            settings.TEMPERATURE,
+            prepared.profile.name,
+            source
+        )
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached is not None:
+            result.update(response=cached['value'], usage=cached.get('usage'), cached=True)
+        else:
+            reserved, waited = limiter.acquire(
+                prepared.prompt_estimate + min(prepared.max_tokens, completion_reserve)
+            )
+            result['waited'] = waited
+            span = telemetry.start('correct', settings.GROQ_MODEL)
+            try:
+                text, usage = complete(
+                    client,
+                    prepared.messages,
+                    settings.GROQ_MODEL,
+                    settings.TEMPERATURE,
+                    prepared.max_tokens,
+                    policy,
+                    breaker
+                )
+            except Exception as e:
+                span.finish(error=e)
+                limiter.settle(reserved, reserved)
+                raise
+            span.finish(usage)
+            limiter.settle(reserved, usage['total_tokens'] if usage else reserved)
+            if usage:
+                estimator.calibrate_messages(prepared.messages, usage['prompt_tokens'])
+            if cache is not None and text:
+                cache.set(cache_key, text, usage)
+            result.update(response=text, usage=usage)
+    except Exception as e:
+        result.update(status='error', error=f"{type(e).__name__}: {e}")
+
+    result['elapsed'] = time.perf_counter() - started
+    return result
+
+def parse_args(argv, settings):
+    parser = argparse.ArgumentParser(
+        description="Revisa os arquivos de um diretório com o prompt de 'Corrigir Erros'."
+    )
+    parser.add_argument('path', help="Diretório (ou arquivo) a revisar")
+    parser.add_argument('--output', '-o', default='revisao.jsonl',
+                        help="Arquivo JSONL ou diretório de saída (markdown)")
+    parser.add_argument('--format', choices=['jsonl', 'markdown'], default=None,
+                        help="Formato da saída (padrão: pelo nome de --output)")
+    parser.add_argument('--workers', '-w', type=int, default=settings.BATCH_WORKERS,
+                        help="Requisições simultâneas")
+    parser.add_argument('--rpm', type=int, default=settings.RATE_LIMIT_RPM,
+                        help="Limite de requisições por minuto (0 = sem limite)")
+    parser.add_argument('--tpm', type=int, default=settings.RATE_LIMIT_TPM,
+                        help="Limite de tokens por minuto (0 = sem limite)")
+    parser.add_argument('--include', default=DEFAULT_INCLUDE,
+                        help="Padrões de nome de arquivo, separados por vírgula")
+    parser.add_argument('--exclude', default='',
+                        help="Padrões de caminho relativo a ignorar, separados por vírgula")
+    parser.add_argument('--max-file-kb', type=int, default=256,
+                        help="Ignora arquivos maiores que este tamanho")
+    parser.add_argument('--profile', default=settings.OUTPUT_PROFILE,
+                        help="Perfil de tamanho da resposta (concise, standard, exhaustive)")
+    parser.add_argument('--completion-reserve', type=int, default=1024,
+                        help="Tokens de saída reservados no limite de TPM antes de cada chamada")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Arquivo de checkpoint (padrão: ao lado da saída)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Ignora o checkpoint e revisa tudo novamente")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Não usa o cache de respostas")
+    args = parser.parse_args(argv)
+
+    if args.format is None:
+        args.format = 'jsonl' if args.output.endswith('.jsonl') else 'markdown'
+    if args.checkpoint is None:
+        if args.format == 'jsonl':
+            args.checkpoint = args.output + '.checkpoint'
+        else:
+            args.checkpoint = os.path.join(args.output, '.checkpoint.jsonl')
+    return args
+
+def main(argv=None):
+    """Executa a revisão em lote e imprime o resumo de desempenho."""
+    settings = get_settings()
+    args = parse_args(argv, settings)
+
+    include = [pattern.strip() for pattern in args.include.split(',') if pattern.strip()]
+    exclude = [pattern.strip() for pattern in args.exclude.split(',') if pattern.strip()]
+    files = list(iter_files(args.path, include, exclude, args.max_file_kb * 1024))
+
+    if args.no_resume and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+
+    pending = []
+    skipped = 0
+    for path, relative in files:
+        if relative in done:
+            with open(path, 'rb') as handle:
+                content = handle.read().decode('utf-8', errors='replace')
+            if hashlib.sha256(content.encode('utf-8')).hexdigest() == done[relative]:
+                skipped += 1
+                continue
+        pending.append((path, relative))
+
+    print(
+        f"{len(files)} arquivos encontrados, {skipped} já revisados (checkpoint), "
+        f"{len(pending)} a revisar com {args.workers} workers.",
+        file=sys.stderr
+    )
+
+    client = get_client(
+        settings.GROQ_API_KEY,
+        settings.GROQ_BASE_URL,
+        timeout=settings.HTTP_TIMEOUT,
+        max_connections=max(settings.HTTP_MAX_CONNECTIONS, args.workers),
+        max_keepalive_connections=max(settings.HTTP_MAX_KEEPALIVE, args.workers),
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    cache = None
+    if settings.CACHE_ENABLED and not args.no_cache:
+        cache = ResponseCache(
+            settings.CACHE_DB_PATH,
+            ttl=settings.CACHE_TTL,
+            memory_entries=settings.CACHE_MEMORY_ENTRIES,
+            disk_max_bytes=settings.CACHE_DISK_MAX_MB * 1024 * 1024
+        )
+    limiter = RateLimiter(args.rpm, args.tpm)
+    telemetry.configure(
+        settings.TELEMETRY_LOG_PATH,
+        settings.TELEMETRY_LOG_MAX_MB * 1024 * 1024,
+        settings.TELEMETRY_LOG_BACKUPS,
+        settings.TELEMETRY_PROM_FILE
+    )
+    policy = retry_policy(settings)
+    breaker = upstream_breaker(settings)
+    writer = ResultWriter(args.output, args.format, args.checkpoint, truncate=args.no_resume)
+
+    started = time.perf_counter()
+    reviewed = errors = cached = 0
+    tokens = 0
+
+    def record(result):
+        nonlocal reviewed, errors, cached, tokens
+        writer.write(result)
+        reviewed += 1
+        if result['status'] != 'ok':
+            errors += 1
+        if result['cached']:
+            cached += 1
+        elif result['usage']:
+            tokens += result['usage']['total_tokens']
+        status = 'erro' if result['status'] != 'ok' else ('cache' if result['cached'] else 'ok')
+        print(
+            f"[{reviewed}/{len(pending)}] {result['path']} ({status}, {result['elapsed']:.1f}s)",
+            file=sys.stderr
+        )
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = [
+                pool.submit(
+                    review_file, path, relative, settings, client, limiter, cache,
+                    args.profile, args.completion_reserve, policy, breaker
+                )
+                for path, relative in pending
+            ]
+            written = set()
+            try:
+                for future in as_completed(futures):
+                    written.add(future)
+                    record(future.result())
+            except KeyboardInterrupt:
+                # Cancela os arquivos na fila e grava os que terminarem (já pagos), para o checkpoint
+                pool.shutdown(wait=False, cancel_futures=True)
+                running = [future for future in futures if future not in written and not future.cancelled()]
+                print(
+                    f"Interrompido; gravando {len(running)} revisões em andamento "
+                    "(Ctrl+C de novo para sair já).",
+                    file=sys.stderr
+                )
+                for future in as_completed(running):
+                    record(future.result())
+                raise
+    except KeyboardInterrupt:
+        print("Interrompido; execute novamente para continuar do checkpoint.", file=sys.stderr)
+        raise
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    files_per_second = reviewed / elapsed if elapsed > 0 else 0.0
+    tokens_per_second = tokens / elapsed if elapsed > 0 else 0.0
+    retries = retry_stats.snapshot()['retries']
+    print(
+        f"Concluído: {reviewed} arquivos ({errors} erros, {cached} do cache) em {elapsed:.1f}s | "
+        f"{files_per_second:.2f} arquivos/s | {tokens:,} tokens ({tokens_per_second:,.0f} tokens/s) | "
+        f"espera por limite de taxa: {limiter.total_wait:.1f}s | {retries} retentativas | "
+        f"circuit breaker: {breaker.snapshot()['state']}",
+        file=sys.stderr
+    )
+    for row in telemetry.summary():
+        latency = row['latency']
+        print(
+            f"Latência ({row['mode']}, {row['requests']} chamadas): p50 {latency[50]:.2f}s | "
+            f"p95 {latency[95]:.2f}s | p99 {latency[99]:.2f}s",
+            file=sys.stderr
+        )
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
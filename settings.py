@@ -0,0 +1,194 @@
+# Configurações do aplicativo, carregadas uma vez por processo
+import os
+import threading
+from types import SimpleNamespace
+from dotenv import dotenv_values, find_dotenv
+
+# APP_ENV_FILE aponta para outro arquivo de configuração (testes de carga, ambientes alternativos)
+ENV_FILE = os.environ.get('APP_ENV_FILE') or find_dotenv()
+
+_settings = None
+_env_mtime = None
+_env_keys = set()
+_lock = threading.Lock()
+
+def get_env_value(key, default, type_func=str):
+    """Obtém valor do ambiente com tipo específico."""
+    try:
+        value = os.environ.get(key)
+        if value is None:
+            return type_func(default)
+        return type_func(value)
+    except (ValueError, TypeError):
+        return type_func(default)
+
+def parse_bool(value):
+    """Converte valores como 'true', '1' ou 'sim' em booleano."""
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'sim', 'on')
+
+def get_env_mtime():
+    """Retorna o mtime do arquivo .env (None se não existir)."""
+    try:
+        return os.path.getmtime(ENV_FILE) if ENV_FILE else None
+    except OSError:
+        return None
+
+def load_environment():
+    """Aplica o .env sobre o ambiente; valores do arquivo têm prioridade."""
+    global _env_keys
+    values = dotenv_values(ENV_FILE) if ENV_FILE and os.path.isfile(ENV_FILE) else {}
+
+    # Remove variáveis que saíram do .env desde a última carga
+    for key in _env_keys - set(values):
+        os.environ.pop(key, None)
+
+    for key, value in values.items():
+        if value is not None:
+            os.environ[key] = value
+    _env_keys = set(values)
+
+def load_settings():
+    """Lê as configurações a partir das variáveis de ambiente."""
+    return SimpleNamespace(
+        # Configurações do App
+        APP_TITLE=get_env_value('APP_TITLE', '🤖 Assistente de Código', str),
+        APP_ICON=get_env_value('APP_ICON', '🤖', str),
+        APP_NAME=get_env_value('APP_NAME', 'AI Code Assistant', str),
+        COMPANY_NAME=get_env_value('COMPANY_NAME', 'Your Company', str),
+
+        # Configurações da API
+        GROQ_API_KEY=get_env_value('GROQ_API_KEY', '', str),
+        GROQ_BASE_URL=get_env_value('GROQ_BASE_URL', '', str),
+        GROQ_MODEL=get_env_value('GROQ_MODEL', 'mixtral-8x7b-32768', str),
+        # Roteamento por requisição entre vários modelos ("modelo:nível,..."; vazio = só GROQ_MODEL)
+        GROQ_MODELS=get_env_value('GROQ_MODELS', '', str),
+        ROUTER_SMALL_INPUT_TOKENS=get_env_value('ROUTER_SMALL_INPUT_TOKENS', 400, int),
+        ROUTER_LARGE_INPUT_TOKENS=get_env_value('ROUTER_LARGE_INPUT_TOKENS', 6000, int),
+        ROUTER_EWMA_ALPHA=get_env_value('ROUTER_EWMA_ALPHA', 0.2, float),
+        ROUTER_MAX_ERROR_RATE=get_env_value('ROUTER_MAX_ERROR_RATE', 0.5, float),
+        ROUTER_ERROR_COOLDOWN=get_env_value('ROUTER_ERROR_COOLDOWN', 60.0, float),
+        # Hedge em streaming: segundo pedido se o 1º token passar do percentil recente (limite por minuto)
+        HEDGE_ENABLED=get_env_value('HEDGE_ENABLED', False, parse_bool),
+        HEDGE_MODES=get_env_value('HEDGE_MODES', 'suggest', str),
+        HEDGE_PERCENTILE=get_env_value('HEDGE_PERCENTILE', 95.0, float),
+        HEDGE_MIN_DELAY=get_env_value('HEDGE_MIN_DELAY', 0.25, float),
+        HEDGE_MIN_SAMPLES=get_env_value('HEDGE_MIN_SAMPLES', 20, int),
+        HEDGE_MAX_PER_MINUTE=get_env_value('HEDGE_MAX_PER_MINUTE', 10, int),
+        HEDGE_MODEL=get_env_value('HEDGE_MODEL', '', str),
+        MAX_TOKENS_CODE=get_env_value('MAX_TOKENS_CODE', 32000, int),
+        # Prazo (s) da geração em streaming; a resposta é cortada no último trecho completo (0 = sem prazo)
+        RESPONSE_TIME_BUDGET=get_env_value('RESPONSE_TIME_BUDGET', 0.0, float),
+        MAX_TOKENS_TEXT=get_env_value('MAX_TOKENS_TEXT', 4000, int),
+        TEMPERATURE=get_env_value('TEMPERATURE', 0.5, float),
+        LANGUAGE=get_env_value('LANGUAGE', 'Portuguese', str),
+
+        # Janela de contexto (0 = valor conhecido do modelo) e política para entradas grandes
+        MODEL_CONTEXT_WINDOW=get_env_value('MODEL_CONTEXT_WINDOW', 0, int),
+        CONTEXT_SAFETY_MARGIN=get_env_value('CONTEXT_SAFETY_MARGIN', 256, int),
+        MIN_COMPLETION_TOKENS=get_env_value('MIN_COMPLETION_TOKENS', 256, int),
+        INPUT_OVERFLOW_POLICY=get_env_value('INPUT_OVERFLOW_POLICY', 'reject', str),
+
+        # Perfis de tamanho da resposta (orçamento de max_tokens de cada um)
+        OUTPUT_PROFILE=get_env_value('OUTPUT_PROFILE', 'standard', str),
+        MAX_TOKENS_CONCISE=get_env_value('MAX_TOKENS_CONCISE', 1500, int),
+        MAX_TOKENS_STANDARD=get_env_value('MAX_TOKENS_STANDARD', 8000, int),
+        MAX_TOKENS_EXHAUSTIVE=get_env_value('MAX_TOKENS_EXHAUSTIVE', get_env_value('MAX_TOKENS_CODE', 32000, int), int),
+
+        # Análise em partes de arquivos grandes (Corrigir Erros)
+        CHUNKED_ANALYSIS=get_env_value('CHUNKED_ANALYSIS', True, parse_bool),
+        CHUNK_MIN_LINES=get_env_value('CHUNK_MIN_LINES', 300, int),
+        CHUNK_MAX_TOKENS=get_env_value('CHUNK_MAX_TOKENS', 2500, int),
+        CHUNK_WORKERS=get_env_value('CHUNK_WORKERS', 4, int),
+
+        # Análise estática local antes de "Corrigir Erros" (pool de processos com limite de tempo)
+        STATIC_ANALYSIS=get_env_value('STATIC_ANALYSIS', True, parse_bool),
+        STATIC_ANALYSIS_WORKERS=get_env_value('STATIC_ANALYSIS_WORKERS', 2, int),
+        STATIC_ANALYSIS_TIMEOUT=get_env_value('STATIC_ANALYSIS_TIMEOUT', 2.0, float),
+        STATIC_CHECK_COMMANDS=get_env_value('STATIC_CHECK_COMMANDS', '', str),
+
+        # Geração em paralelo de projetos com vários arquivos (Sugerir Código)
+        FANOUT_GENERATION=get_env_value('FANOUT_GENERATION', False, parse_bool),
+        FANOUT_MIN_TOKENS=get_env_value('FANOUT_MIN_TOKENS', 8000, int),
+        FANOUT_MAX_FILES=get_env_value('FANOUT_MAX_FILES', 8, int),
+        FANOUT_WORKERS=get_env_value('FANOUT_WORKERS', 4, int),
+
+        # Compactação do código colado antes do prompt (licenças, banners, repetições, blocos de dados)
+        INPUT_COMPACTION=get_env_value('INPUT_COMPACTION', True, parse_bool),
+        COMPACT_MAX_LINE_CHARS=get_env_value('COMPACT_MAX_LINE_CHARS', 400, int),
+
+        # Modo conversa: tokens reservados ao histórico e turnos recentes enviados na íntegra
+        CHAT_HISTORY_TOKENS=get_env_value('CHAT_HISTORY_TOKENS', 3000, int),
+        CHAT_RECENT_TURNS=get_env_value('CHAT_RECENT_TURNS', 4, int),
+
+        # Revisão em lote pela linha de comando (review_cli.py)
+        BATCH_WORKERS=get_env_value('BATCH_WORKERS', 4, int),
+        RATE_LIMIT_RPM=get_env_value('RATE_LIMIT_RPM', 30, int),
+        RATE_LIMIT_TPM=get_env_value('RATE_LIMIT_TPM', 6000, int),
+
+        # Versões de prompt (vazio = versão padrão do registro)
+        PROMPT_VERSION_SUGGEST=get_env_value('PROMPT_VERSION_SUGGEST', '', str),
+        PROMPT_VERSION_CORRECT=get_env_value('PROMPT_VERSION_CORRECT', '', str),
+
+        # Retentativas, prazos e circuit breaker das chamadas à API
+        RETRY_MAX_ATTEMPTS=get_env_value('RETRY_MAX_ATTEMPTS', 4, int),
+        RETRY_BASE_DELAY=get_env_value('RETRY_BASE_DELAY', 0.5, float),
+        RETRY_MAX_DELAY=get_env_value('RETRY_MAX_DELAY', 20.0, float),
+        REQUEST_ATTEMPT_TIMEOUT=get_env_value('REQUEST_ATTEMPT_TIMEOUT', 60.0, float),
+        REQUEST_DEADLINE=get_env_value('REQUEST_DEADLINE', 180.0, float),
+        BREAKER_FAILURE_THRESHOLD=get_env_value('BREAKER_FAILURE_THRESHOLD', 5, int),
+        BREAKER_RESET_TIMEOUT=get_env_value('BREAKER_RESET_TIMEOUT', 30.0, float),
+
+        # Telemetria das chamadas (log JSONL rotativo e exportação Prometheus; vazio desativa)
+        TELEMETRY_LOG_PATH=get_env_value('TELEMETRY_LOG_PATH', '.cache/telemetry.jsonl', str),
+        TELEMETRY_LOG_MAX_MB=get_env_value('TELEMETRY_LOG_MAX_MB', 10, int),
+        TELEMETRY_LOG_BACKUPS=get_env_value('TELEMETRY_LOG_BACKUPS', 5, int),
+        TELEMETRY_PROM_FILE=get_env_value('TELEMETRY_PROM_FILE', '', str),
+
+        # API HTTP assíncrona (api_server.py): chamadas simultâneas ao modelo e espera máxima na fila
+        API_HOST=get_env_value('API_HOST', '127.0.0.1', str),
+        API_PORT=get_env_value('API_PORT', 8000, int),
+        API_MAX_CONCURRENCY=get_env_value('API_MAX_CONCURRENCY', 64, int),
+        API_QUEUE_TIMEOUT=get_env_value('API_QUEUE_TIMEOUT', 30.0, float),
+
+        # Conexão HTTP (pool keep-alive compartilhado)
+        HTTP_TIMEOUT=get_env_value('HTTP_TIMEOUT', 60.0, float),
+        HTTP_MAX_CONNECTIONS=get_env_value('HTTP_MAX_CONNECTIONS', 100, int),
+        HTTP_MAX_KEEPALIVE=get_env_value('HTTP_MAX_KEEPALIVE', 20, int),
+        HTTP_KEEPALIVE_EXPIRY=get_env_value('HTTP_KEEPALIVE_EXPIRY', 30.0, float),
+
+        # Configurações de streaming
+        STREAM_RESPONSES=get_env_value('STREAM_RESPONSES', True, parse_bool),
+        STREAM_REFRESH_INTERVAL=get_env_value('STREAM_REFRESH_INTERVAL', 0.15, float),
+
+        # Gerações em segundo plano: workers compartilhados pelas sessões e tempo (s) que um job terminado fica guardado
+        JOB_WORKERS=get_env_value('JOB_WORKERS', 8, int),
+        JOB_RETENTION=get_env_value('JOB_RETENTION', 600.0, float),
+
+        # Blocos de código da resposta: recolhidos acima de COLLAPSE linhas, paginados acima de PAGE
+        CODE_BLOCK_COLLAPSE_LINES=get_env_value('CODE_BLOCK_COLLAPSE_LINES', 80, int),
+        CODE_BLOCK_PAGE_LINES=get_env_value('CODE_BLOCK_PAGE_LINES', 300, int),
+
+        # Configurações do cache de respostas
+        CACHE_ENABLED=get_env_value('CACHE_ENABLED', True, parse_bool),
+        CACHE_DB_PATH=get_env_value('CACHE_DB_PATH', '.cache/responses.sqlite3', str),
+        CACHE_TTL=get_env_value('CACHE_TTL', 86400, int),
+        CACHE_MEMORY_ENTRIES=get_env_value('CACHE_MEMORY_ENTRIES', 256, int),
+        CACHE_DISK_MAX_MB=get_env_value('CACHE_DISK_MAX_MB', 100, int),
+
+        # Entradas parecidas com outras já respondidas (reuse, diff ou off)
+        SIMILAR_ACTION=get_env_value('SIMILAR_ACTION', 'diff', str).strip().lower(),
+        SIMILAR_THRESHOLD=get_env_value('SIMILAR_THRESHOLD', 0.85, float),
+        SIMILAR_MAX_ENTRIES=get_env_value('SIMILAR_MAX_ENTRIES', 100000, int),
+        SIMILAR_MAX_MB=get_env_value('SIMILAR_MAX_MB', 64, int),
+    )
+
+def get_settings():
+    """Retorna as configurações do processo, recarregando o .env só quando o mtime muda."""
+    global _settings, _env_mtime
+    mtime = get_env_mtime()
+    with _lock:
+        if _settings is None or mtime != _env_mtime:
+            load_environment()
+            _settings = load_settings()
+            _env_mtime = mtime
+        return _settings
@@ -0,0 +1,177 @@
+# Índice local de entradas parecidas (MinHash + LSH) para reaproveitar respostas anteriores
+import difflib
+import re
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Primo de Mersenne usado nas permutações do MinHash
+_MERSENNE_PRIME = (1 << 61) - 1
+_P = np.uint64(_MERSENNE_PRIME)
+
+# Resultado de uma consulta: chave da resposta anterior, semelhança estimada (0-1) e entrada original
+SimilarMatch = namedtuple('SimilarMatch', ['key', 'similarity', 'text'])
+
+_Entry = namedtuple('_Entry', ['namespace', 'signature', 'text', 'size'])
+
+def shingles(text, size=3):
+    """Conjunto de sequências de `size` tokens; espaços e quebras de linha não contam."""
+    tokens = _TOKEN_PATTERN.findall(text)
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[index:index + size]) for index in range(len(tokens) - size + 1)}
+
+def _content_lines(text):
+    return [line.rstrip() for line in text.splitlines() if line.strip()]
+
+def input_diff(previous, current, context=2):
+    """Diferenças (unified diff) entre a entrada anterior e a atual, ignorando linhas em branco."""
+    return "\n".join(difflib.unified_diff(
+        _content_lines(previous),
+        _content_lines(current),
+        fromfile='anterior',
+        tofile='atual',
+        n=context,
+        lineterm=''
+    ))
+
+def _hash_mod_prime(a, b, hashes):
+    """(a * h + b) mod (2^61 - 1), exato em uint64, para a e b < 2^61 e h < 2^32.
+
+    a é dividido em metades de 32 bits (a * h passaria de 64 bits); a parte
+    alta usa 2^61 ≡ 1 (mod p) para multiplicar por 2^32 sem estourar.
+    """
+    a_high = a >> np.uint64(32)
+    a_low = a & np.uint64(0xFFFFFFFF)
+    low = (a_low * hashes) % _P
+    high = a_high * hashes
+    # high * 2^32 = (high >> 29) * 2^61 + (high & (2^29 - 1)) * 2^32
+    high = ((high >> np.uint64(29)) + ((high & np.uint64((1 << 29) - 1)) << np.uint64(32))) % _P
+    return (low + high + b) % _P
+
+class SimilarIndex:
+    """Índice em memória de entradas já respondidas, consultado por semelhança.
+
+    Cada entrada vira uma assinatura MinHash de num_perm valores, dividida em
+    `bands` faixas; entradas que coincidem em alguma faixa são candidatas e a
+    semelhança é estimada pela fração de valores iguais nas assinaturas. Cada
+    faixa guarda no máximo bucket_size chaves, o que limita o custo da consulta
+    mesmo com o índice cheio. Acima de max_entries ou max_bytes de texto, as
+    entradas usadas há mais tempo são descartadas.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.8, max_entries=100_000,
+                 max_bytes=64 * 1024 * 1024, min_shingles=8, bucket_size=32, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.min_shingles = min_shingles
+        self.bucket_size = bucket_size
+        generator = np.random.RandomState(seed)
+        # Coeficientes uniformes em [1, p): com a e b pequenos, a * h + b quase nunca passa de p e as
+        # "permutações" viram funções afins de h, correlacionadas entre si (semelhança enviesada)
+        self._a = generator.randint(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = generator.randint(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def signature(self, text):
+        """Assinatura MinHash do texto (None se ele for curto demais para comparar)."""
+        pieces = shingles(text)
+        if len(pieces) < self.min_shingles:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(piece.encode('utf-8')) for piece in pieces),
+            dtype=np.uint64,
+            count=len(pieces)
+        )
+        permuted = _hash_mod_prime(self._a, self._b, hashes)
+        return (permuted.min(axis=1) & 0xFFFFFFFF).astype(np.uint32)
+
+    def _band_keys(self, namespace, signature):
+        return [
+            (namespace, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(self, namespace, key, text):
+        """Indexa a entrada `text`, respondida e guardada no cache sob `key`."""
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(namespace, signature, text, size)
+            self._bytes += size
+            for bucket, band_key in zip(self._buckets, self._band_keys(namespace, signature)):
+                keys = bucket.setdefault(band_key, [])
+                keys.append(key)
+                if len(keys) > self.bucket_size:
+                    del keys[0]
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for bucket, band_key in zip(self._buckets, self._band_keys(entry.namespace, entry.signature)):
+            keys = bucket.get(band_key)
+            if keys is None:
+                continue
+            if key in keys:
+                keys.remove(key)
+            if not keys:
+                del bucket[band_key]
+
+    def discard(self, key):
+        """Remove a entrada (ex.: a resposta saiu do cache)."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def query(self, namespace, text, signature=None):
+        """Entrada anterior mais parecida com `text` acima de threshold, ou None."""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, self._band_keys(namespace, signature)):
+                candidates.update(bucket.get(band_key, ()))
+            best_key, best_similarity = None, 0.0
+            for key in candidates:
+                similarity = float(np.count_nonzero(self._entries[key].signature == signature)) / self.num_perm
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+            if best_key is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return SimilarMatch(best_key, best_similarity, self._entries[best_key].text)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
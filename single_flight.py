@@ -0,0 +1,187 @@
+# Coalescência de requisições idênticas em andamento (single-flight)
+import asyncio
+import threading
+
+class FlightAbandoned(RuntimeError):
+    """O líder parou antes de terminar (rerun, sessão fechada); quem acompanhava refaz a chamada."""
+
+class Flight:
+    """Chamada em andamento: guarda os trechos já recebidos para quem chegar depois.
+
+    O líder publica cada trecho com publish() e encerra com finish(); os
+    seguidores recebem, por follow(), tudo desde o início e depois o restante
+    conforme chega. Versão para threads (sessões do Streamlit).
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.parts = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self._changed = threading.Condition()
+
+    def publish(self, part):
+        with self._changed:
+            self.parts.append(part)
+            self._changed.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self._changed:
+            if self.done:
+                return
+            self.result = result
+            self.error = error
+            self.done = True
+            self._changed.notify_all()
+
+    def follow(self):
+        """Gera os trechos publicados até o fim; repassa o erro do líder, se houver."""
+        index = 0
+        while True:
+            with self._changed:
+                while index >= len(self.parts) and not self.done:
+                    self._changed.wait()
+                parts = self.parts[index:]
+                done = self.done
+            for part in parts:
+                yield part
+            index += len(parts)
+            if done and index >= len(self.parts):
+                break
+        if self.error is not None:
+            raise self.error
+
+    def wait(self):
+        """Aguarda o resultado do líder."""
+        for _ in self.follow():
+            pass
+        return self.result
+
+class AsyncFlight(Flight):
+    """Versão de Flight para seguidores em um event loop (api_server.py)."""
+
+    def __init__(self, key):
+        super().__init__(key)
+        self._event = asyncio.Event()
+
+    def _wake(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    def publish(self, part):
+        self.parts.append(part)
+        self._wake()
+
+    def finish(self, result=None, error=None):
+        if self.done:
+            return
+        self.result = result
+        self.error = error
+        self.done = True
+        self._wake()
+
+    async def follow(self):
+        index = 0
+        while True:
+            event = self._event
+            while index < len(self.parts):
+                yield self.parts[index]
+                index += 1
+            if self.done:
+                break
+            await event.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def wait(self):
+        async for _ in self.follow():
+            pass
+        return self.result
+
+class SingleFlight:
+    """Registro das chamadas em andamento por chave, com contadores para as métricas."""
+
+    def __init__(self, flight_class=Flight):
+        self.flight_class = flight_class
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def join(self, key):
+        """Retorna (flight, líder): o líder faz a chamada; os demais acompanham a dele."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.coalesced += 1
+                return flight, False
+            flight = self.flight_class(key)
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def finish(self, flight, result=None, error=None):
+        """Encerra a chamada do líder; novas requisições passam a abrir outra."""
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.finish(result, error)
+
+    def abandon(self, flight):
+        """O líder foi interrompido: os seguidores recebem FlightAbandoned e refazem a chamada."""
+        if flight.done:
+            return
+        with self._lock:
+            if flight.followers:
+                self.abandoned += 1
+        self.finish(flight, error=FlightAbandoned("A requisição original foi interrompida."))
+
+    def call(self, key, operation):
+        """Executa operation() uma vez por chave entre as threads. Retorna (resultado, coalescido)."""
+        while True:
+            flight, leader = self.join(key)
+            if not leader:
+                try:
+                    return flight.wait(), True
+                except FlightAbandoned:
+                    continue
+            try:
+                result = operation()
+            except Exception as e:
+                self.finish(flight, error=e)
+                raise
+            except BaseException:
+                self.abandon(flight)
+                raise
+            self.finish(flight, result)
+            return result, False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'abandoned': self.abandoned,
+                'in_flight': len(self._flights)
+            }
+
+    def render_prometheus(self):
+        """Contadores no formato texto do Prometheus."""
+        stats = self.snapshot()
+        return "\n".join([
+            "# HELP assistant_single_flight_total Requisições por papel na coalescência (líder chama o modelo).",
+            "# TYPE assistant_single_flight_total counter",
+            f'assistant_single_flight_total{{role="leader"}} {stats["leaders"]}',
+            f'assistant_single_flight_total{{role="follower"}} {stats["coalesced"]}',
+            f'assistant_single_flight_total{{role="abandoned"}} {stats["abandoned"]}',
+            "# HELP assistant_single_flight_in_flight Chamadas distintas em andamento.",
+            "# TYPE assistant_single_flight_in_flight gauge",
+            f"assistant_single_flight_in_flight {stats['in_flight']}"
+        ]) + "\n"
+
+# Registro único do processo, compartilhado pelas sessões do app
+single_flight = SingleFlight()
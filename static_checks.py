@@ -0,0 +1,481 @@
+# Análise estática local, antes da chamada ao modelo: sintaxe, nomes indefinidos e imports sem uso
+import ast
+import builtins
+import difflib
+import json
+import os
+import re
+import shlex
+import shutil
+import signal
+import subprocess
+import symtable
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from code_chunks import build_shared_header, split_units
+
+# Problema encontrado: linhas 1-based; fix é a linha que substitui `line` ('' remove a linha; None = sem correção local),
+# sugerida nos avisos do prompt (format_lint_notes)
+Finding = namedtuple('Finding', ['line', 'end_line', 'kind', 'message', 'fix'])
+
+# Resultado da análise de uma entrada; elapsed em segundos
+Analysis = namedtuple('Analysis', ['language', 'findings', 'elapsed'])
+
+# Problemas que a análise local explica sozinha; os demais vão ao modelo num prompt direcionado
+TRIVIAL_KINDS = ('syntax',)
+
+# Avisos de estilo: não substituem a revisão, só acompanham a entrada no prompt completo
+LINT_KINDS = ('unused-import',)
+
+FINDING_LABELS = {
+    'syntax': 'erro de sintaxe',
+    'undefined-name': 'nome não definido',
+    'unused-import': 'import sem uso'
+}
+
+# Nomes que todo módulo Python tem além dos builtins
+_MODULE_NAMES = {'__name__', '__file__', '__doc__', '__package__', '__spec__', '__loader__', '__builtins__',
+                 '__path__', '__annotations__', '__dict__', '__debug__'}
+
+_PYTHON_LINE = re.compile(r"^\s*(def |class |elif |except\b|import \w|from [\w.]+ import |@\w|async def )")
+_BRACE_LINE = re.compile(r"[{};]\s*$")
+
+# Sinais fortes de Python em código que não compila: def/class terminando em ":" e imports no formato do Python
+_PYTHON_SIGNAL = re.compile(
+    r"^\s*(?:(?:async\s+)?def\s+\w+.*|class\s+\w+.*):\s*(?:#.*)?$"
+    r"|^\s*import\s+[\w.]+(?:\s+as\s+\w+)?(?:\s*,\s*[\w.]+(?:\s+as\s+\w+)?)*\s*$"
+    r"|^\s*from\s+\.*[\w.]*\s+import\s+[\w(*]",
+    re.M
+)
+# Marcadores de bloco de outras linguagens (Ruby, Elixir, JavaScript, PHP...)
+_FOREIGN_BLOCK = re.compile(r"^\s*end\b|;\s*$|=>|\bdo\b\s*(?:\|[^|]*\|)?\s*$", re.M)
+
+# Linguagens reconhecidas para os verificadores externos: extensão do arquivo temporário e padrão típico.
+# A ordem importa: as mais específicas primeiro
+LANGUAGE_HINTS = (
+    ('php', '.php', re.compile(r"<\?php")),
+    ('go', '.go', re.compile(r"^\s*package\s+\w+\s*$|^\s*func\s+(\(\w+ \*?\w+\)\s*)?\w+\(", re.M)),
+    ('java', '.java', re.compile(r"\bpublic\s+(static\s+)?(final\s+)?(class|void|interface)\b")),
+    ('typescript', '.ts', re.compile(r"\binterface\s+\w+\s*\{|:\s*(string|number|boolean)\b")),
+    ('javascript', '.js', re.compile(r"\bfunction\s+\w+\s*\(|\b(const|let)\s+\w+\s*=|=>|\brequire\(|console\.log")),
+    ('ruby', '.rb', re.compile(r"^\s*(require\s+['\"]|def\s+\w+[^:]*$|end\s*$)", re.M)),
+)
+
+def looks_like_python(source):
+    """Python válido, ou com cara de Python mesmo sem compilar (para apontar o erro de sintaxe)."""
+    try:
+        ast.parse(source)
+        return True
+    except (SyntaxError, ValueError):
+        pass
+    lines = source.splitlines()
+    python_lines = sum(1 for line in lines if _PYTHON_LINE.match(line))
+    brace_lines = sum(1 for line in lines if _BRACE_LINE.search(line))
+    return python_lines > 0 and python_lines >= brace_lines
+
+def parses_as_python(source):
+    """O código é Python sintaticamente válido (só então os problemas apontados são confiáveis)."""
+    try:
+        ast.parse(source)
+        return True
+    except (SyntaxError, ValueError, RecursionError):
+        return False
+
+def has_python_signals(source):
+    """Código que não compila mas é Python com erro de sintaxe, e não outra linguagem parecida."""
+    return bool(_PYTHON_SIGNAL.search(source)) and not _FOREIGN_BLOCK.search(source)
+
+def guess_language(source, languages=()):
+    """'python' ou a primeira das `languages` (com verificador configurado) cujo padrão aparece no código."""
+    if looks_like_python(source):
+        return 'python'
+    for language, _, pattern in LANGUAGE_HINTS:
+        if language in languages and pattern.search(source):
+            return language
+    return None
+
+def _syntax_finding(error):
+    line = error.lineno or 1
+    return Finding(line, error.end_lineno or line, 'syntax', error.msg, None)
+
+def _walk_tables(table):
+    yield table
+    for child in table.get_children():
+        yield from _walk_tables(child)
+
+def _rebuild_import(node, keep, indent):
+    """Texto do import só com os nomes mantidos ('' quando nenhum sobra)."""
+    if not keep:
+        return ''
+    names = ", ".join(alias.name + (f" as {alias.asname}" if alias.asname else '') for alias in keep)
+    if isinstance(node, ast.Import):
+        return f"{indent}import {names}"
+    return f"{indent}from {'.' * node.level}{node.module or ''} import {names}"
+
+def _unused_imports(tree, lines):
+    """Imports cujo nome não aparece em nenhum outro lugar do código (nem em strings, como em __all__)."""
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            used.update(re.findall(r"[A-Za-z_]\w*", node.value))
+
+    findings = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        if isinstance(node, ast.ImportFrom) and (node.module == '__future__' or any(a.name == '*' for a in node.names)):
+            continue
+        unused = [
+            alias for alias in node.names
+            if (alias.asname or alias.name.split('.')[0]) not in used
+        ]
+        if not unused:
+            continue
+        fix = None
+        line = lines[node.lineno - 1]
+        # Só corrige imports de uma linha, sozinhos na linha
+        if node.lineno == node.end_lineno and ';' not in line and '#' not in line:
+            indent = line[:len(line) - len(line.lstrip())]
+            fix = _rebuild_import(node, [alias for alias in node.names if alias not in unused], indent)
+        names = ", ".join(f"`{alias.asname or alias.name}`" for alias in unused)
+        findings.append(Finding(node.lineno, node.end_lineno, 'unused-import', names, fix))
+    return findings
+
+def _undefined_names(tree, source):
+    """Nomes lidos que não são definidos no módulo nem são builtins, com sugestão para erros de digitação."""
+    if any(isinstance(node, ast.ImportFrom) and any(a.name == '*' for a in node.names) for node in ast.walk(tree)):
+        # Com "import *" não dá para saber o que foi definido
+        return []
+    table = symtable.symtable(source, '<entrada>', 'exec')
+    defined = {symbol.get_name() for symbol in table.get_symbols() if symbol.is_local()}
+    referenced = set()
+    for scope in _walk_tables(table):
+        for symbol in scope.get_symbols():
+            if symbol.is_declared_global() and symbol.is_assigned():
+                defined.add(symbol.get_name())
+            if symbol.is_referenced() and symbol.is_global():
+                referenced.add(symbol.get_name())
+    known = defined | set(dir(builtins)) | _MODULE_NAMES
+    missing = referenced - known
+    if not missing:
+        return []
+
+    first_use = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in missing and isinstance(node.ctx, ast.Load):
+            if node.id not in first_use or node.lineno < first_use[node.id]:
+                first_use[node.id] = node.lineno
+    findings = []
+    for name in sorted(missing, key=lambda item: first_use.get(item, 0)):
+        message = f"`{name}`"
+        close = difflib.get_close_matches(name, known, n=1, cutoff=0.8)
+        if close:
+            message += f" (talvez `{close[0]}`?)"
+        line = first_use.get(name, 1)
+        findings.append(Finding(line, line, 'undefined-name', message, None))
+    return findings
+
+def check_python(source):
+    """Erros de sintaxe (ast + compile); sem eles, nomes indefinidos e imports sem uso."""
+    try:
+        tree = ast.parse(source)
+        # compile aponta o que o parser aceita mas o compilador não (ex.: return fora de função)
+        compile(tree, '<entrada>', 'exec')
+    except SyntaxError as e:
+        return [_syntax_finding(e)]
+    except ValueError:
+        return []
+    return _undefined_names(tree, source) + _unused_imports(tree, source.splitlines())
+
+def check_command(source, command, suffix, timeout):
+    """Roda um verificador externo (ex.: "node --check {path}") sobre o código salvo em arquivo temporário.
+
+    Saída com erro vira um problema de sintaxe na linha citada pelo verificador.
+    """
+    arguments = shlex.split(command)
+    if not arguments or shutil.which(arguments[0]) is None:
+        return []
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write(source)
+        if '{path}' in arguments:
+            arguments = [path if argument == '{path}' else argument for argument in arguments]
+        else:
+            arguments.append(path)
+        try:
+            result = subprocess.run(arguments, capture_output=True, text=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return []
+    finally:
+        os.unlink(path)
+    if result.returncode == 0:
+        return []
+    output = (result.stderr or result.stdout).replace(path, '<entrada>')
+    message = next((line.strip() for line in output.splitlines() if line.strip()), 'erro')
+    match = re.search(r"(?:line |<entrada>:)(\d+)", output)
+    line = int(match.group(1)) if match else 1
+    return [Finding(line, line, 'syntax', message[:300], None)]
+
+# Verificadores embutidos por linguagem; as demais usam os comandos de STATIC_CHECK_COMMANDS
+CHECKERS = {'python': check_python}
+
+def run_checks(source, commands=None, timeout=2.0):
+    """Detecta a linguagem e roda o verificador dela. Retorna (linguagem, problemas).
+
+    O verificador embutido de Python roda em código que o parser aceita ou,
+    se ele falhar, só com sinais fortes de Python (has_python_signals): Ruby,
+    JavaScript sem ponto e vírgula ou Elixir também têm linhas com cara de
+    Python, e um "erro de sintaxe" neles seria falso. O restante usa os
+    comandos configurados; sem comando para a linguagem, volta (None, []).
+    Roda nos processos do pool de StaticAnalyzer; commands é {linguagem: comando}.
+    """
+    commands = commands or {}
+    if parses_as_python(source) or has_python_signals(source):
+        return 'python', CHECKERS['python'](source)
+    language = next(
+        (name for name, _, pattern in LANGUAGE_HINTS if name in commands and pattern.search(source)), None
+    )
+    if language is None:
+        return None, []
+    suffix = next(extension for name, extension, _ in LANGUAGE_HINTS if name == language)
+    return language, check_command(source, commands[language], suffix, timeout)
+
+def parse_commands(value):
+    """Lê "linguagem=comando;linguagem=comando" (STATIC_CHECK_COMMANDS)."""
+    commands = {}
+    for item in (value or '').split(';'):
+        language, _, command = item.partition('=')
+        if language.strip() and command.strip():
+            commands[language.strip().lower()] = command.strip()
+    return commands
+
+def is_trivial(findings):
+    """Só problemas que a análise local resolve sozinha: resposta imediata, sem o modelo."""
+    return bool(findings) and all(finding.kind in TRIVIAL_KINDS for finding in findings)
+
+def is_lint_only(findings):
+    """Só avisos de estilo: o código vai ao prompt completo, com os avisos junto (format_lint_notes)."""
+    return bool(findings) and all(finding.kind in LINT_KINDS for finding in findings)
+
+def _suggested_fix(finding):
+    if finding.fix is None:
+        return ''
+    return " (remova a linha)" if not finding.fix else f" (sugestão: `{finding.fix.strip()}`)"
+
+def format_lint_notes(findings):
+    """Avisos da análise local para o fim da entrada do prompt completo, com a correção local quando há."""
+    notes = [
+        f"- Linha {finding.line}: {FINDING_LABELS.get(finding.kind, finding.kind)}: {finding.message}"
+        + _suggested_fix(finding)
+        for finding in findings
+    ]
+    return "Avisos da análise estática local (revise também o restante do código):\n" + "\n".join(notes)
+
+def _numbered(lines, start, end):
+    width = len(str(end))
+    return "\n".join(f"{number:>{width}} | {lines[number - 1]}" for number in range(start, end + 1))
+
+def format_local_report(source, analysis):
+    """Resposta imediata em markdown para problemas triviais."""
+    lines = source.splitlines()
+    fence = analysis.language or ''
+    parts = [f"**Análise local** ({analysis.elapsed * 1000:.0f} ms, sem chamada ao modelo):"]
+    for finding in analysis.findings:
+        parts.append(f"- **Linha {finding.line}** — {FINDING_LABELS.get(finding.kind, finding.kind)}: {finding.message}")
+    for finding in analysis.findings:
+        if finding.kind == 'syntax' and 1 <= finding.line <= len(lines):
+            start = max(1, finding.line - 2)
+            parts.append(f"Trecho da linha {finding.line}:\n```{fence}\n{_numbered(lines, start, finding.line)}\n```")
+    parts.append(
+        "_Nenhum outro problema foi detectado localmente. Para uma revisão completa pelo modelo, "
+        "desmarque \"Análise local antes do modelo\" na sidebar._"
+    )
+    return "\n\n".join(parts)
+
+def _finding_ranges(source, findings, context, max_unit_lines):
+    """Trechos a enviar: a função/classe que contém cada problema (se curta) ou `context` linhas em volta."""
+    lines = source.splitlines()
+    try:
+        units = split_units(source)
+    except (SyntaxError, ValueError, RecursionError):
+        units = []
+    ranges = []
+    for finding in findings:
+        unit = next((unit for unit in units if unit.start_line <= finding.line <= unit.end_line), None)
+        if unit is not None and unit.kind != 'statements' and unit.end_line - unit.start_line < max_unit_lines:
+            start, end = unit.start_line, unit.end_line
+        else:
+            start, end = finding.line - context, finding.end_line + context
+        ranges.append((max(1, start), min(len(lines), end)))
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def build_targeted_input(source, analysis, context=6, max_unit_lines=60):
+    """Entrada do prompt direcionado: os problemas, o cabeçalho do arquivo e só os trechos afetados."""
+    lines = source.splitlines()
+    fence = analysis.language or ''
+    parts = ["Problemas apontados pela análise estática:"]
+    for finding in analysis.findings:
+        parts.append(f"- Linha {finding.line}: {FINDING_LABELS.get(finding.kind, finding.kind)} {finding.message}")
+    try:
+        header = build_shared_header(source, split_units(source))
+    except (SyntaxError, ValueError, RecursionError):
+        header = ''
+    if header:
+        parts.append(f"Cabeçalho do arquivo (imports e assinaturas):\n```{fence}\n{header}\n```")
+    for start, end in _finding_ranges(source, analysis.findings, context, max_unit_lines):
+        parts.append(f"Linhas {start}-{end} de {len(lines)}:\n```{fence}\n{_numbered(lines, start, end)}\n```")
+    return "\n\n".join(parts)
+
+class _Worker:
+    """Processo verificador de longa duração: recebe uma entrada por linha JSON e responde outra."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            # Grupo de processos próprio: kill() também encerra os verificadores externos em andamento
+            start_new_session=True
+        )
+
+    def request(self, payload, timeout):
+        """Envia a entrada e aguarda a resposta por até `timeout` segundos (None se esgotar)."""
+        self.process.stdin.write(json.dumps(payload) + "\n")
+        self.process.stdin.flush()
+        # Leitura numa thread: espera com limite de tempo que também funciona no Windows
+        lines = []
+        reader = threading.Thread(target=lambda: lines.append(self.process.stdout.readline()), daemon=True)
+        reader.start()
+        reader.join(timeout)
+        if not lines:
+            return None
+        if not lines[0]:
+            raise RuntimeError("o verificador local terminou inesperadamente")
+        return json.loads(lines[0])
+
+    def kill(self):
+        """Encerra o processo (e, fora do Windows, os verificadores externos que ele iniciou)."""
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except OSError:
+            pass
+        self.process.wait()
+
+class StaticAnalyzer:
+    """Roda os verificadores num pool de processos, com limite de tempo por entrada.
+
+    Os processos ficam abertos entre as análises (sem custo de inicialização
+    por requisição). Um verificador travado (entrada patológica, comando
+    externo lento) não segura a requisição: passado o limite, o processo é
+    encerrado, outro é criado quando preciso e a entrada segue para o modelo
+    como antes. Os processos rodam este arquivo diretamente, e não via
+    multiprocessing, que no Streamlit executaria o script do app de novo.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.workers = 2
+        self.timeout = 2.0
+        self.commands = {}
+        self._idle = []
+        self._started = 0
+        self._available = threading.Condition()
+
+    def configure(self, enabled=True, workers=2, timeout=2.0, commands=None):
+        with self._available:
+            self.enabled = enabled
+            self.workers = max(1, workers)
+            self.timeout = timeout
+            self.commands = dict(commands or {})
+            if enabled and not self._started:
+                # Sobe um processo já na configuração: a primeira análise não paga o custo de iniciá-lo
+                self._idle.append(_Worker())
+                self._started = 1
+
+    def _acquire(self, deadline):
+        with self._available:
+            while not self._idle and self._started >= self.workers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _Worker()
+        except OSError:
+            self._release(None)
+            raise
+
+    def _release(self, worker):
+        with self._available:
+            if worker is None:
+                self._started -= 1
+            else:
+                self._idle.append(worker)
+            self._available.notify()
+
+    def analyze(self, source):
+        """Analysis da entrada, ou None (desativado, linguagem sem verificador, tempo esgotado ou falha)."""
+        if not self.enabled or not source.strip():
+            return None
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        try:
+            worker = self._acquire(deadline)
+        except OSError:
+            return None
+        if worker is None:
+            return None
+        payload = {'source': source, 'commands': self.commands, 'timeout': self.timeout}
+        try:
+            result = worker.request(payload, max(deadline - time.monotonic(), 0.0))
+        except (OSError, ValueError, RuntimeError):
+            result = None
+        if result is None:
+            worker.kill()
+            self._release(None)
+            return None
+        self._release(worker)
+        language, findings = result
+        if language is None:
+            # Linguagem sem verificador: nada a dizer localmente
+            return None
+        return Analysis(language, [Finding(*finding) for finding in findings], time.perf_counter() - start)
+
+def _worker_loop():
+    """Laço dos processos verificadores: uma entrada JSON por linha no stdin, uma resposta por linha no stdout."""
+    for line in sys.stdin:
+        payload = json.loads(line)
+        try:
+            language, findings = run_checks(payload['source'], payload['commands'], payload['timeout'])
+        except Exception:
+            language, findings = None, []
+        sys.stdout.write(json.dumps([language, [list(finding) for finding in findings]]) + "\n")
+        sys.stdout.flush()
+
+# Analisador único do processo (os processos verificadores são compartilhados pelas sessões)
+static_analyzer = StaticAnalyzer()
+
+if __name__ == '__main__' and '--worker' in sys.argv:
+    _worker_loop()
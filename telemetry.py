@@ -0,0 +1,259 @@
+# Telemetria das chamadas ao modelo: histogramas, percentis, Prometheus e log JSONL
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from logging.handlers import RotatingFileHandler
+
+# Limites superiores dos buckets (o bucket +Inf é implícito)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+TOKENS_PER_SECOND_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800, 1600)
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus, com estimativa de percentis."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """Estima o percentil q (0-100) por interpolação linear dentro do bucket."""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                if upper <= lower:
+                    return upper
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+class RequestSpan:
+    """Medição de uma chamada: criada antes do envio e encerrada com o resultado."""
+
+    def __init__(self, telemetry, mode, model, streaming):
+        self.telemetry = telemetry
+        self.mode = mode
+        self.model = model
+        self.streaming = streaming
+        self.started = time.perf_counter()
+        self.ttft = None
+
+    def first_token(self):
+        """Marca a chegada do primeiro token (só a primeira chamada conta)."""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+
+    def finish(self, usage=None, error=None, cancelled=False):
+        """Registra a chamada e devolve o registro gravado.
+
+        Chamadas canceladas pelo usuário contam tokens, mas não entram nos
+        histogramas nem na taxa de erro (a latência delas foi cortada).
+        """
+        latency = time.perf_counter() - self.started
+        completion_tokens = (usage or {}).get('completion_tokens', 0)
+        # Em streaming, a vazão considera só o tempo de geração (após o primeiro token)
+        generation_time = latency - self.ttft if self.ttft is not None else latency
+        record = {
+            'timestamp': time.time(),
+            'mode': self.mode,
+            'model': self.model,
+            'streaming': self.streaming,
+            'status': 'error' if error is not None else 'cancelled' if cancelled else 'ok',
+            'error': type(error).__name__ if error is not None else None,
+            'latency': latency,
+            'ttft': self.ttft,
+            'prompt_tokens': (usage or {}).get('prompt_tokens', 0),
+            'completion_tokens': completion_tokens,
+            'tokens_per_second': (
+                completion_tokens / generation_time if completion_tokens and generation_time > 0 else None
+            )
+        }
+        self.telemetry.record(record)
+        return record
+
+class Telemetry:
+    """Agrega as chamadas de todas as sessões do processo por modo e modelo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._requests = {}
+        self._tokens = {}
+        self._logger = None
+        self._log_path = None
+        self._listeners = []
+        self.prometheus_file = None
+
+    def configure(self, log_path='', log_max_bytes=10 * 1024 * 1024, log_backups=5, prometheus_file=''):
+        """Define o log JSONL rotativo e o arquivo de exportação Prometheus ('' desativa)."""
+        with self._lock:
+            self.prometheus_file = prometheus_file or None
+            if log_path == self._log_path:
+                return
+            if self._logger is not None:
+                for handler in list(self._logger.handlers):
+                    self._logger.removeHandler(handler)
+                    handler.close()
+                self._logger = None
+            self._log_path = log_path
+            if not log_path:
+                return
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = RotatingFileHandler(
+                log_path, maxBytes=log_max_bytes, backupCount=log_backups, encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger(f"{__name__}.requests")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            self._logger = logger
+
+    def add_listener(self, callback):
+        """Registra callback(record), chamado a cada chamada registrada (ex.: roteamento de modelos)."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def start(self, mode, model, streaming=False):
+        """Inicia a medição de uma chamada."""
+        return RequestSpan(self, mode, model, streaming)
+
+    def record(self, record):
+        """Acumula o registro nos histogramas e grava no log."""
+        key = (record['mode'], record['model'])
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {
+                    'latency': Histogram(LATENCY_BUCKETS),
+                    'ttft': Histogram(TTFT_BUCKETS),
+                    'tokens_per_second': Histogram(TOKENS_PER_SECOND_BUCKETS)
+                }
+                self._series[key] = series
+            if record['status'] != 'cancelled':
+                series['latency'].observe(record['latency'])
+                if record['ttft'] is not None:
+                    series['ttft'].observe(record['ttft'])
+                if record['tokens_per_second'] is not None:
+                    series['tokens_per_second'].observe(record['tokens_per_second'])
+
+            request_key = key + (record['status'], record['error'] or '')
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+            for kind in ('prompt', 'completion'):
+                token_key = key + (kind,)
+                self._tokens[token_key] = self._tokens.get(token_key, 0) + (record[f'{kind}_tokens'] or 0)
+            logger = self._logger
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener(record)
+        if logger is not None:
+            logger.info(json.dumps(record, ensure_ascii=False))
+        if self.prometheus_file:
+            self.write_prometheus(self.prometheus_file)
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Resumo por modo e modelo: requisições, taxa de sucesso e percentis."""
+        with self._lock:
+            rows = []
+            for (mode, model), series in sorted(self._series.items()):
+                requests = {
+                    status: count for (m, mo, status, _), count in self._requests.items()
+                    if (m, mo) == (mode, model)
+                }
+                cancelled = requests.get('cancelled', 0)
+                total = sum(requests.values())
+                finished = total - cancelled
+                rows.append({
+                    'mode': mode,
+                    'model': model,
+                    'requests': total,
+                    'cancelled': cancelled,
+                    'errors': finished - requests.get('ok', 0),
+                    'success_rate': requests.get('ok', 0) / finished if finished else None,
+                    **{
+                        name: {q: histogram.percentile(q) for q in percentiles}
+                        for name, histogram in series.items()
+                    }
+                })
+            return rows
+
+    def render_prometheus(self):
+        """Exporta as métricas no formato texto do Prometheus."""
+        lines = [
+            "# HELP assistant_requests_total Chamadas ao modelo por modo, modelo e resultado.",
+            "# TYPE assistant_requests_total counter"
+        ]
+        with self._lock:
+            for (mode, model, status, error), count in sorted(self._requests.items()):
+                labels = _format_labels(mode=mode, model=model, status=status, error=error)
+                lines.append(f"assistant_requests_total{{{labels}}} {count}")
+
+            lines.append("# HELP assistant_tokens_total Tokens consumidos por modo, modelo e tipo.")
+            lines.append("# TYPE assistant_tokens_total counter")
+            for (mode, model, kind), count in sorted(self._tokens.items()):
+                labels = _format_labels(mode=mode, model=model, kind=kind)
+                lines.append(f"assistant_tokens_total{{{labels}}} {count}")
+
+            for name, help_text in (
+                ('latency', 'Latência total da chamada, em segundos.'),
+                ('ttft', 'Tempo até o primeiro token, em segundos.'),
+                ('tokens_per_second', 'Tokens de saída por segundo.')
+            ):
+                metric = f"assistant_request_{name}" + ('_seconds' if name != 'tokens_per_second' else '')
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (mode, model), series in sorted(self._series.items()):
+                    histogram = series[name]
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += bucket_count
+                        labels = _format_labels(mode=mode, model=model, le=bound)
+                        lines.append(f"{metric}_bucket{{{labels}}} {cumulative}")
+                    labels = _format_labels(mode=mode, model=model)
+                    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Grava a exportação de forma atômica (para o textfile collector do node_exporter)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            handle.write(self.render_prometheus())
+        os.replace(temporary, path)
+
+def _format_labels(**labels):
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return ",".join(parts)
+
+# Telemetria única do processo
+telemetry = Telemetry()
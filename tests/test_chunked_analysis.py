@@ -0,0 +1,62 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import settings
+from mock_server import MockConfig, MockGroqServer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+def _large_source(functions=60):
+    """Arquivo Python com mais de 300 linhas, para a análise em partes."""
+    blocks = ["import os\nimport sys\n"]
+    for index in range(functions):
+        blocks.append(
+            f"def funcao_{index}(valor):\n"
+            f"    \"\"\"Função de exemplo {index}.\"\"\"\n"
+            f"    total = 0\n"
+            f"    for item in range(valor):\n"
+            f"        total += item * {index}\n"
+            f"    return total\n"
+        )
+    return "\n".join(blocks)
+
+
+@pytest.fixture
+def mock_server(tmp_path, monkeypatch):
+    with MockGroqServer(MockConfig(latency=0.0, tokens_per_second=0.0, response_tokens=20)) as server:
+        env_file = tmp_path / '.env'
+        env_file.write_text(
+            f"GROQ_API_KEY=mock\nGROQ_BASE_URL={server.url}\nGROQ_MODEL=mock\n"
+            "CACHE_ENABLED=false\nTELEMETRY_LOG_PATH=\nSTATIC_ANALYSIS=false\nSIMILAR_ACTION=off\n"
+            "CHUNKED_ANALYSIS=true\nCHUNK_MIN_LINES=100\nCHUNK_MAX_TOKENS=300\n"
+        )
+        monkeypatch.setenv('APP_ENV_FILE', str(env_file))
+        monkeypatch.setattr(settings, 'ENV_FILE', str(env_file))
+        yield server
+
+
+def _correct(app, source):
+    app.text_area[0].input(source)
+    app.button[1].click().run()
+    assert not app.exception, app.exception
+
+
+def test_editing_one_function_only_sends_its_group(mock_server):
+    app = AppTest.from_file(APP_PATH, default_timeout=60).run()
+    source = _large_source()
+    assert len(source.splitlines()) > 300
+    _correct(app, source)
+    first = mock_server.stats.snapshot()['requests']
+    assert first > 3
+
+    # Assinatura e corpo novos: o cabeçalho de assinaturas muda, as demais funções não
+    edited = source.replace(
+        "def funcao_30(valor):\n    \"\"\"Função de exemplo 30.\"\"\"\n    total = 0\n",
+        "def funcao_30(valor, inicio=1):\n    \"\"\"Função de exemplo 30.\"\"\"\n    total = inicio\n"
+    )
+    assert edited != source
+    _correct(app, edited)
+    assert mock_server.stats.snapshot()['requests'] - first == 1
@@ -0,0 +1,47 @@
+import threading
+import time
+
+import pytest
+
+from hedging import Hedger, HedgeCancelled
+from jobs import Job
+
+
+class SilentStream:
+    """Stream que nunca manda o primeiro token; só termina quando é fechado."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        self.closed.wait(5)
+        raise RuntimeError("stream fechado")
+
+    def close(self):
+        self.closed.set()
+
+
+def test_stop_during_first_token_wait_closes_both_requests():
+    hedger = Hedger()
+    hedger.configure(enabled=True, modes=['suggest'], min_delay=0.05, min_samples=1, max_per_minute=10)
+    hedger.observe('suggest', 'm', 0.05)
+    streams = []
+    opened = threading.Semaphore(0)
+
+    def open_stream(model):
+        stream = SilentStream()
+        streams.append(stream)
+        opened.release()
+        return stream
+
+    job = Job('hedge')
+    job._start()
+    # Para o job depois que os dois pedidos (original e hedge) já saíram
+    threading.Thread(target=lambda: (opened.acquire(), opened.acquire(), job.cancel()), daemon=True).start()
+
+    started = time.perf_counter()
+    with pytest.raises(HedgeCancelled):
+        hedger.open(open_stream, 'suggest', 'm', job)
+    assert time.perf_counter() - started < 2
+    assert len(streams) == 2
+    assert all(stream.closed.wait(1) for stream in streams)
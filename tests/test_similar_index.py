@@ -0,0 +1,22 @@
+import random
+
+import numpy as np
+
+from similar_index import shingles, SimilarIndex
+
+
+def _pair(seed, keep):
+    """Duas entradas de 300 palavras em que cada palavra da segunda é mantida com probabilidade `keep`."""
+    generator = random.Random(seed)
+    words = [f"w{generator.randrange(10 ** 6)}" for _ in range(300)]
+    changed = [word if generator.random() < keep else f"x{generator.randrange(10 ** 6)}" for word in words]
+    return " ".join(words), " ".join(changed)
+
+
+def test_minhash_estimate_matches_exact_jaccard():
+    index = SimilarIndex(num_perm=256, bands=16)
+    for seed, keep in [(1, 0.97), (2, 0.9), (3, 0.85), (4, 0.75), (5, 0.6)]:
+        first, second = _pair(seed, keep)
+        exact = len(shingles(first) & shingles(second)) / len(shingles(first) | shingles(second))
+        estimate = np.count_nonzero(index.signature(first) == index.signature(second)) / index.num_perm
+        assert abs(estimate - exact) <= 0.08, (keep, exact, estimate)
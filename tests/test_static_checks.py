@@ -0,0 +1,13 @@
+from static_checks import is_trivial, run_checks
+
+
+def test_broken_python_function_is_a_trivial_syntax_error():
+    language, findings = run_checks("def f(x:\n    return x\n")
+    assert language == 'python'
+    assert [(finding.line, finding.kind) for finding in findings] == [(1, 'syntax')]
+    assert is_trivial(findings)
+
+
+def test_ruby_snippet_is_not_checked_as_python():
+    source = "def soma(a, b)\n  a + b\nend\n\nputs soma(1, 2)\n"
+    assert run_checks(source) == (None, [])
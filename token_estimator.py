@@ -0,0 +1,149 @@
+# Estimativa local de tokens (sem rede) e ajuste de max_tokens ao contexto do modelo
+import math
+import re
+import threading
+
+# Janela de contexto conhecida de cada modelo
+MODEL_CONTEXT_WINDOWS = {
+    'mixtral-8x7b-32768': 32768,
+    'llama-3.3-70b-versatile': 131072,
+    'llama-3.1-70b-versatile': 131072,
+    'llama-3.1-8b-instant': 131072,
+    'llama3-70b-8192': 8192,
+    'llama3-8b-8192': 8192,
+    'llama2-70b-4096': 4096,
+    'gemma-7b-it': 8192,
+    'gemma2-9b-it': 8192
+}
+
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Custo fixo aproximado de cada mensagem no formato de chat
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+_PIECE_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\W\d_A-Za-z]+|\s+|[^\w\s]|_")
+
+class InputTooLargeError(ValueError):
+    """A entrada não cabe na janela de contexto do modelo."""
+
+def get_context_window(model, override=0):
+    """Retorna a janela de contexto do modelo (override > 0 tem prioridade)."""
+    if override and override > 0:
+        return override
+    if model in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model]
+    # Muitos modelos trazem o tamanho do contexto no nome (ex.: llama3-8b-8192)
+    match = re.search(r"-(\d{4,6})$", model or '')
+    if match:
+        return int(match.group(1))
+    return DEFAULT_CONTEXT_WINDOW
+
+def _raw_estimate(text):
+    """Aproximação de um tokenizer BPE: palavras longas e texto não ASCII custam mais."""
+    if not text:
+        return 0
+    total = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        first = piece[0]
+        if first.isspace():
+            # Quebras de linha e indentação longa viram tokens próprios
+            total += piece.count('\n') + len(piece.replace('\n', '')) // 4
+        elif first.isascii() and first.isalpha():
+            total += max(1, math.ceil(len(piece) / 4))
+        elif first.isdigit():
+            total += math.ceil(len(piece) / 3)
+        elif first.isascii():
+            total += 1
+        else:
+            # Letras acentuadas e outros scripts: ~2 caracteres por token
+            total += max(1, math.ceil(len(piece) / 2))
+    return total
+
+class TokenEstimator:
+    """Estimador de tokens calibrado pelos prompt_tokens reais devolvidos pela API."""
+
+    def __init__(self, smoothing=0.2):
+        self.smoothing = smoothing
+        self.ratio = 1.0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def estimate(self, text):
+        """Estima a quantidade de tokens de um texto."""
+        return int(math.ceil(_raw_estimate(text) * self.ratio))
+
+    def estimate_messages(self, messages):
+        """Estima os tokens de prompt de uma lista de mensagens de chat."""
+        total = REPLY_OVERHEAD_TOKENS
+        for message in messages:
+            total += MESSAGE_OVERHEAD_TOKENS + self.estimate(message.get('content', ''))
+        return total
+
+    def calibrate(self, estimated, actual):
+        """Ajusta o fator de correção (média móvel) com um par estimado/real."""
+        if not estimated or not actual or estimated <= 0 or actual <= 0:
+            return
+        with self._lock:
+            observed = self.ratio * actual / estimated
+            if self.samples == 0:
+                self.ratio = observed
+            else:
+                self.ratio += self.smoothing * (observed - self.ratio)
+            self.samples += 1
+
+    def calibrate_messages(self, messages, actual):
+        """Calibra com as mensagens enviadas, reestimadas com o fator atual.
+
+        Com chamadas simultâneas o fator muda entre a estimativa e a resposta;
+        reaproveitar a estimativa antiga faria as correções se acumularem.
+        """
+        self.calibrate(self.estimate_messages(messages), actual)
+
+# Estimador compartilhado pelo processo
+estimator = TokenEstimator()
+
+def fit_max_tokens(prompt_tokens, requested, context_window, safety_margin=256, min_completion=256):
+    """Limita max_tokens ao espaço livre da janela de contexto.
+
+    Retorna o max_tokens ajustado ou None quando sobra menos que min_completion.
+    """
+    available = context_window - prompt_tokens - safety_margin
+    if available < min_completion:
+        return None
+    return max(min_completion, min(requested, available))
+
+def trim_to_tokens(text, max_tokens, estimate=None):
+    """Reduz o texto ao limite de tokens, mantendo o início e o fim (por linhas)."""
+    estimate = estimate or estimator.estimate
+    if estimate(text) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    head_budget = max_tokens * 2 // 3
+    tail_budget = max_tokens - head_budget
+
+    head, used = [], 0
+    for line in lines:
+        cost = estimate(line) + 1
+        if used + cost > head_budget:
+            break
+        head.append(line)
+        used += cost
+
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        cost = estimate(line) + 1
+        if used + cost > tail_budget:
+            break
+        tail.append(line)
+        used += cost
+    tail.reverse()
+
+    if not head and not tail:
+        # Linha única muito longa: corta por caracteres
+        return text[:max_tokens * 3] + "\n... [conteúdo truncado para caber no contexto do modelo] ..."
+
+    omitted = len(lines) - len(head) - len(tail)
+    marker = f"... [{omitted} linhas omitidas para caber no contexto do modelo] ..."
+    return "\n".join(head + [marker] + tail)